@@ -0,0 +1,265 @@
+"""Flujos aleatorios reproducibles para los juegos.
+
+Cada hilo de trabajo recibe su propio flujo PCG32 (XSH-RR 64/32): un
+generador pequeño y rapido que no se comparte, asi que no hace falta
+bloquearlo. Todos los flujos salen de una semilla maestra y de un id de
+flujo unico (un ID de identificadores.py, que no se repite entre procesos
+ni entre arranques).
+
+Cada partida guarda el id del flujo y el contador (numeros de 32 bits
+consumidos) antes de resolverla. Con la semilla maestra, el flujo se
+reconstruye y salta a ese contador en O(log n), y el resultado se puede
+recalcular exactamente (ver reproducir_resultado()).
+
+La semilla maestra se lee de `aleatoriedad.semilla` en config.json o, si es
+null, del archivo `aleatoriedad.ruta_semilla`, que se crea la primera vez.
+Es secreta: quien la conozca puede predecir los resultados.
+
+Rendimiento: los numeros se pregeneran por bloques de TAMANO_BLOQUE. Con
+numpy (opcional) el bloque se calcula vectorizado, a unos 0,1 us por
+numero; sin numpy, en un bucle de Python, a unos 0,7 us. Aun asi el flujo es
+mas lento que random.Random, que esta escrito en C: medido con timeit,
+randint(1, 6) tarda ~1 us con numpy (2-4 veces lo de random.Random) y
+random() unas 20 veces mas. Una partida consume solo unos pocos numeros,
+asi que el coste es pequeño al lado de guardarla en el almacen.
+"""
+import hashlib
+import os
+import random
+import secrets
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # opcional: sin numpy los bloques se generan en Python
+    np = None
+
+from Funciones.configuracion import obtener_seccion
+from Funciones.identificadores import nuevo_id_usuario
+from juegos.motores import MOTORES, Apuesta
+
+MASCARA64 = (1 << 64) - 1
+MULTIPLICADOR_PCG = 6364136223846793005
+TAMANO_BLOQUE = 256  # numeros de 32 bits que se pregeneran de una vez
+
+
+def _constantes_bloque():
+    """El estado i del bloque es MULT[i] * estado + SUMA[i] * incremento
+    (mod 2**64); MULT y SUMA no dependen del flujo. Devuelve los arrays
+    de numpy y el par (mult, suma) que lleva al estado siguiente al bloque."""
+    mult, suma = [1], [0]
+    for _ in range(TAMANO_BLOQUE):
+        mult.append((mult[-1] * MULTIPLICADOR_PCG) & MASCARA64)
+        suma.append((suma[-1] * MULTIPLICADOR_PCG + 1) & MASCARA64)
+    return (np.array(mult[:-1], dtype=np.uint64), np.array(suma[:-1], dtype=np.uint64),
+            mult[-1], suma[-1])
+
+if np is not None:
+    _MULT_BLOQUE, _SUMA_BLOQUE, _MULT_SALTO, _SUMA_SALTO = _constantes_bloque()
+
+
+def _estado_inicial(semilla, flujo):
+    resumen = hashlib.sha256(f"{semilla}:{flujo}".encode("utf-8")).digest()
+    return int.from_bytes(resumen[:8], "little")
+
+
+class FlujoPCG(random.Random):
+    """Flujo PCG32 con la interfaz de random.Random (randint, choice, ...).
+
+    random() y getrandbits() se calculan a partir de numeros de 32 bits
+    del PCG; el resto de metodos de Random se apoya en ellos. Los numeros se
+    generan por bloques de TAMANO_BLOQUE en un bucle con variables locales y
+    se sirven desde ese bloque; `contador` solo cuenta los ya consumidos.
+    """
+
+    def __init__(self, semilla, flujo, contador=0):
+        self.flujo = str(flujo)
+        self._incremento = ((int(flujo) << 1) | 1) & MASCARA64
+        super().__init__()
+        # Inicializacion de referencia de PCG: paso, sumar estado inicial, paso
+        estado = self._incremento
+        estado = (estado + _estado_inicial(semilla, self.flujo)) & MASCARA64
+        self._estado = (estado * MULTIPLICADOR_PCG + self._incremento) & MASCARA64  # siguiente a generar
+        self._bloque = []
+        self._indice = 0
+        self.contador = 0
+        if contador:
+            self.avanzar(contador)
+
+    def seed(self, *args, **kwargs):
+        # Random.__init__ llama a seed(); el estado lo fija __init__
+        pass
+
+    def _rellenar(self):
+        estado, incremento = self._estado, self._incremento
+        if np is not None:
+            # Todos los estados del bloque de una vez
+            with np.errstate(over="ignore"):
+                estados = _MULT_BLOQUE * np.uint64(estado) + _SUMA_BLOQUE * np.uint64(incremento)
+            desplazado = (((estados >> np.uint64(18)) ^ estados) >> np.uint64(27)).astype(np.uint32)
+            rotacion = (estados >> np.uint64(59)).astype(np.uint32)
+            salida = (desplazado >> rotacion) | (desplazado << ((np.uint32(32) - rotacion) & np.uint32(31)))
+            self._bloque = salida.tolist()
+            self._estado = (_MULT_SALTO * estado + _SUMA_SALTO * incremento) & MASCARA64
+            self._indice = 0
+            return
+        bloque = []
+        for _ in range(TAMANO_BLOQUE):
+            desplazado = (((estado >> 18) ^ estado) >> 27) & 0xFFFFFFFF
+            rotacion = estado >> 59
+            bloque.append(((desplazado >> rotacion) | (desplazado << (-rotacion & 31))) & 0xFFFFFFFF)
+            estado = (estado * MULTIPLICADOR_PCG + incremento) & MASCARA64
+        self._estado = estado
+        self._bloque = bloque
+        self._indice = 0
+
+    def _siguiente32(self):
+        if self._indice == len(self._bloque):
+            self._rellenar()
+        valor = self._bloque[self._indice]
+        self._indice += 1
+        self.contador += 1
+        return valor
+
+    def getrandbits(self, k):
+        if k < 0:
+            raise ValueError("k no puede ser negativo")
+        if 0 < k <= 32:
+            # randint() y choice() piden pocos bits: un solo numero
+            return self._siguiente32() >> (32 - k)
+        palabras = (k + 31) // 32
+        valor = 0
+        for _ in range(palabras):
+            valor = (valor << 32) | self._siguiente32()
+        return valor >> (palabras * 32 - k)
+
+    def randint(self, a, b):
+        # Atajo del caso habitual (dados, ruleta); el resultado es el mismo que con randrange()
+        if type(a) is int and type(b) is int and b >= a:
+            return a + self._randbelow(b - a + 1)
+        return super().randint(a, b)
+
+    def _randbelow(self, n):
+        # Lo que usan randint(), randrange() y choice(). Mismo algoritmo que
+        # Random._randbelow_with_getrandbits, leyendo el bloque directamente
+        k = n.bit_length()
+        if not 0 < k <= 32:
+            return super()._randbelow_with_getrandbits(n)
+        desplazamiento = 32 - k
+        while True:
+            if self._indice == len(self._bloque):
+                self._rellenar()
+            r = self._bloque[self._indice] >> desplazamiento
+            self._indice += 1
+            self.contador += 1
+            if r < n:
+                return r
+
+    def random(self):
+        # 53 bits, como random.Random
+        if self._indice + 2 > len(self._bloque):
+            a = self._siguiente32() >> 5
+            b = self._siguiente32() >> 6
+        else:
+            a = self._bloque[self._indice] >> 5
+            b = self._bloque[self._indice + 1] >> 6
+            self._indice += 2
+            self.contador += 2
+        return (a * 67108864 + b) / 9007199254740992
+
+    def avanzar(self, pasos):
+        """Salta `pasos` numeros sin generarlos (salto de la LCG en O(log pasos))."""
+        self.contador += pasos
+        # Primero los que ya estan en el bloque; el estado va detras del bloque
+        en_bloque = min(pasos, len(self._bloque) - self._indice)
+        self._indice += en_bloque
+        pasos -= en_bloque
+        if not pasos:
+            return
+        mult_acum, suma_acum = 1, 0
+        mult, suma = MULTIPLICADOR_PCG, self._incremento
+        restantes = pasos
+        while restantes > 0:
+            if restantes & 1:
+                mult_acum = (mult_acum * mult) & MASCARA64
+                suma_acum = (suma_acum * mult + suma) & MASCARA64
+            suma = ((mult + 1) * suma) & MASCARA64
+            mult = (mult * mult) & MASCARA64
+            restantes >>= 1
+        self._estado = (mult_acum * self._estado + suma_acum) & MASCARA64
+        self._bloque = []
+        self._indice = 0
+
+    def posicion(self):
+        """Lo que se guarda en la partida para poder reproducirla."""
+        return {"flujo": self.flujo, "contador": self.contador}
+
+
+class ServicioAleatorio:
+    """Reparte un flujo propio a cada hilo (y a cada proceso tras un fork)."""
+
+    def __init__(self, semilla):
+        self.semilla = semilla
+        self._local = threading.local()
+
+    def flujo(self):
+        actual = getattr(self._local, "flujo", None)
+        if actual is None or self._local.pid != os.getpid():
+            actual = FlujoPCG(self.semilla, nuevo_id_usuario())
+            self._local.flujo = actual
+            self._local.pid = os.getpid()
+        return actual
+
+    def reproducir(self, flujo, contador):
+        """Flujo `flujo` colocado en `contador`, tal como estaba al jugar."""
+        return FlujoPCG(self.semilla, flujo, contador)
+
+
+def leer_o_crear_secreto(ruta):
+    """Lee el secreto guardado en `ruta` o lo crea (64 hex aleatorios) si no existe."""
+    if not os.path.exists(ruta):
+        # Se escribe aparte y se enlaza: si dos procesos arrancan a la vez
+        # solo uno crea el archivo y el otro lee ese mismo secreto
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(secrets.token_hex(32) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.link(temporal, ruta)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temporal)
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def _leer_semilla(config):
+    if config.get("semilla") is not None:
+        return str(config["semilla"])
+    return leer_o_crear_secreto(config.get("ruta_semilla", "base_data/semilla_rng"))
+
+
+_servicio = None
+_lock_servicio = threading.Lock()
+
+def obtener_aleatoriedad():
+    """Servicio compartido por el proceso, creado la primera vez que se pide."""
+    global _servicio
+    with _lock_servicio:
+        if _servicio is None:
+            _servicio = ServicioAleatorio(_leer_semilla(obtener_seccion("aleatoriedad")))
+    return _servicio
+
+
+def reproducir_resultado(partida, servicio=None):
+    """Vuelve a resolver una partida del historial con su flujo y contador.
+    Devuelve el motores.Resultado, o None si la partida no guardo su flujo."""
+    azar = partida.get("azar")
+    if azar is None or partida.get("juego") not in MOTORES:
+        return None
+    servicio = servicio or obtener_aleatoriedad()
+    rng = servicio.reproducir(azar["flujo"], azar["contador"])
+    apuesta = Apuesta(partida["apuesta"], **partida.get("opciones", {}))
+    return MOTORES[partida["juego"]].resolver(apuesta, rng)
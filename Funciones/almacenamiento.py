@@ -0,0 +1,646 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from Funciones.persistencia_json import cargar_json, guardar_json
+from Funciones.bote import aplicar_cambios
+from Funciones.diario import DiarioPartidas, marca_tiempo
+from Funciones.configuracion import obtener_seccion
+from Funciones.archivo import con_archivo
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+USUARIOS_PATH = "base_data/users.json"
+HISTORIAL_PATH = "base_data/historial.json"
+DIARIO_PATH = "base_data/historial.jsonl"
+SQLITE_PATH = "base_data/casino.db"
+
+
+class AlmacenJSON:
+    """Backend heredado: users.json se lee y reescribe completo en cada
+    operacion. El historial va a un diario de solo append (ver diario.py);
+    historial.json solo se lee para importarlo la primera vez."""
+
+    nombre = "json"
+
+    def __init__(self, ruta_usuarios=USUARIOS_PATH, ruta_historial=HISTORIAL_PATH, ruta_diario=DIARIO_PATH):
+        self.ruta_usuarios = ruta_usuarios
+        self.ruta_bote = ruta_usuarios + ".bote"
+        self.ruta_revocadas = ruta_usuarios + ".revocadas"
+        self.ruta_historial = ruta_historial
+        self.diario = DiarioPartidas(ruta_diario)
+        self._diario_listo = False
+        self._lock = threading.Lock()
+
+    # --- Usuarios ---
+
+    def cargar_usuarios(self):
+        return cargar_json(self.ruta_usuarios)
+
+    def obtener_usuario(self, uid):
+        return self.cargar_usuarios().get(str(uid))
+
+    def guardar_usuario(self, uid, datos, sincronizar=False):
+        return self.guardar_usuarios({str(uid): datos}, sincronizar)
+
+    def guardar_usuarios(self, usuarios, sincronizar=False):
+        """Inserta o actualiza los usuarios recibidos sin borrar el resto.
+        Devuelve (version_anterior, version_nueva) del archivo."""
+        with self._lock:
+            anterior = self.version()
+            actuales = cargar_json(self.ruta_usuarios)
+            actuales.update(usuarios)
+            guardar_json(self.ruta_usuarios, actuales, sincronizar)
+            return anterior, self.version()
+
+    def crear_usuario(self, uid, datos, sincronizar=False):
+        """Inserta el usuario solo si su id no existe. Devuelve (version_anterior,
+        version_nueva), o None si ya existia. Sin bloqueo entre procesos."""
+        with self._lock:
+            anterior = self.version()
+            actuales = cargar_json(self.ruta_usuarios)
+            if str(uid) in actuales:
+                return None
+            actuales[str(uid)] = datos
+            guardar_json(self.ruta_usuarios, actuales, sincronizar)
+            return anterior, self.version()
+
+    def asignar_nodo(self):
+        """Numero de nodo nuevo para el generador de IDs (identificadores.py):
+        un contador en users.json.nodos que cada proceso incrementa al arrancar."""
+        return self._actualizar_nodos(lambda valor: valor + 1)
+
+    def reservar_nodos(self, hasta):
+        """Ningun nodo por debajo de `hasta` se volvera a asignar (migracion).
+        Devuelve el siguiente nodo que se asignara."""
+        return max(self._actualizar_nodos(lambda valor: max(valor, hasta)), hasta)
+
+    def _actualizar_nodos(self, siguiente):
+        # Devuelve el valor que habia; el contador pasa a siguiente(valor)
+        with open(self.ruta_usuarios + ".nodos", 'a+', encoding='utf-8') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            valor = int(f.read().strip() or 0)
+            f.seek(0)
+            f.truncate()
+            f.write(str(siguiente(valor)))
+            f.flush()
+            os.fsync(f.fileno())
+        return valor
+
+    def version(self):
+        """Cambia cada vez que alguien (este u otro proceso) reescribe users.json."""
+        try:
+            info = os.stat(self.ruta_usuarios)
+        except FileNotFoundError:
+            return None
+        return (info.st_mtime_ns, info.st_size)
+
+    # --- Historial ---
+
+    def _preparar_diario(self):
+        """La primera vez vuelca historial.json al diario, de la mas antigua a la mas reciente."""
+        with self._lock:
+            if self._diario_listo:
+                return
+            if not os.path.exists(self.diario.ruta):
+                filas = []
+                for uid, info in cargar_json(self.ruta_historial).items():
+                    for partida in info.get("partidas", []):
+                        filas.append((uid, info.get("usuario", ""), partida))
+                filas.sort(key=lambda fila: marca_tiempo(fila[2]))
+                if filas:
+                    self.diario.registrar(filas)
+            self._diario_listo = True
+
+    def registrar_partida(self, uid, nombre, partida):
+        self.registrar_partidas([(uid, nombre, partida)])
+
+    def registrar_partidas(self, filas, sincronizar=False):
+        """Recibe tuplas (uid, nombre, partida) en orden cronologico."""
+        self._preparar_diario()
+        self.diario.registrar(filas, sincronizar)
+
+    def confirmar(self, usuarios, partidas, sincronizar=False, bote=None):
+        """Guarda partidas, usuarios y cambios del bote (ver bote.py) en una
+        sola llamada. Con varios archivos no hay atomicidad real: primero se
+        añade al diario (cada partida lleva fichas_despues), despues se
+        reescribe users.json de una vez y por ultimo users.json.bote, asi
+        que si se corta a medias el premio ya esta en el saldo."""
+        if partidas:
+            self.registrar_partidas(partidas, sincronizar)
+        if usuarios:
+            versiones = self.guardar_usuarios(usuarios, sincronizar)
+        else:
+            version = self.version()
+            versiones = version, version
+        if bote is not None:
+            with self._lock:
+                guardar_json(self.ruta_bote, aplicar_cambios(cargar_json(self.ruta_bote) or None, bote), sincronizar)
+        return versiones
+
+    def cargar_bote(self):
+        """Bote guardado, o None si aun no hay."""
+        return cargar_json(self.ruta_bote) or None
+
+    def iniciar_bote(self, datos):
+        """Guarda `datos` como bote si aun no hay ninguno. Devuelve el bote
+        guardado. Sin bloqueo entre procesos."""
+        with self._lock:
+            actual = cargar_json(self.ruta_bote)
+            if not actual:
+                guardar_json(self.ruta_bote, datos, True)
+                actual = datos
+            return actual
+
+    # --- Sesiones ---
+
+    def revocar_sesion(self, nonce, caduca, ahora):
+        """Anota la sesion `nonce` como cerrada hasta `caduca` y borra las ya
+        caducadas. Sin bloqueo entre procesos."""
+        with self._lock:
+            revocadas = {n: c for n, c in cargar_json(self.ruta_revocadas).items() if c > ahora}
+            revocadas[nonce] = caduca
+            guardar_json(self.ruta_revocadas, revocadas, True)
+
+    def sesion_revocada(self, nonce):
+        return nonce in cargar_json(self.ruta_revocadas)
+
+    def sesiones_revocadas(self, ahora):
+        """{valor aleatorio: caduca} de las sesiones revocadas que aun no han caducado."""
+        return {n: c for n, c in cargar_json(self.ruta_revocadas).items() if c > ahora}
+
+    def obtener_partidas(self, uid, limite=None):
+        self._preparar_diario()
+        return self.diario.leer(uid, limite)
+
+    def contar_partidas(self, uid):
+        self._preparar_diario()
+        return self.diario.contar(uid)
+
+    def buscar_partidas(self, desde=None, hasta=None, juego=None, resultado=None):
+        """Partidas con desde <= ts < hasta, filtradas por juego y resultado,
+        como tuplas (uid, nombre, partida) en orden cronologico."""
+        self._preparar_diario()
+        return self.diario.buscar(desde, hasta, juego, resultado)
+
+    def usuarios_con_partidas(self, despues=None, limite=None):
+        """Ids de usuarios con historial en orden, para paginar por cursor."""
+        self._preparar_diario()
+        return self.diario.usuarios(despues, limite)
+
+    # --- Retencion (ver archivo.py) ---
+
+    def corrida_compactacion(self):
+        self._preparar_diario()
+        return self.diario.numero_compactacion()
+
+    def retirar_partidas(self, retener, corrida, archivar):
+        """Deja las ultimas `retener` partidas por usuario; las demas pasan
+        antes por archivar(filas). El diario reescrito lleva el numero de corrida."""
+        self._preparar_diario()
+        return self.diario.compactar(retener, corrida, archivar)
+
+    def iterar_partidas(self):
+        """Todas las partidas como tuplas (uid, nombre, partida) en orden
+        cronologico, leidas del diario linea a linea."""
+        self._preparar_diario()
+        for registro in self.diario.iterar():
+            yield registro["uid"], registro["usuario"], registro["partida"]
+
+    def cargar_historial(self):
+        self._preparar_diario()
+        historial = {}
+        for registro in self.diario.iterar():
+            info = historial.setdefault(registro["uid"], {"usuario": registro["usuario"], "partidas": []})
+            info["usuario"] = registro["usuario"]
+            info["partidas"].append(registro["partida"])
+        for info in historial.values():
+            info["partidas"].reverse()
+        return historial
+
+    def cerrar(self):
+        pass
+
+
+class AlmacenSQLite:
+    """Backend SQLite en modo WAL. Cada usuario y cada partida es una fila,
+    asi que leer o actualizar un jugador no toca al resto."""
+
+    nombre = "sqlite"
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id TEXT PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            datos TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS partidas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id TEXT NOT NULL,
+            nombre TEXT NOT NULL,
+            datos TEXT NOT NULL,
+            ts REAL NOT NULL DEFAULT 0,
+            juego TEXT NOT NULL DEFAULT '',
+            resultado TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_partidas_usuario ON partidas(usuario_id, id);
+        CREATE TABLE IF NOT EXISTS meta (
+            clave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta (clave, valor) VALUES ('version_usuarios', 0);
+        INSERT OR IGNORE INTO meta (clave, valor) VALUES ('compactacion', 0);
+        INSERT OR IGNORE INTO meta (clave, valor) VALUES ('siguiente_nodo', 0);
+        CREATE TABLE IF NOT EXISTS bote (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            datos TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sesiones_revocadas (
+            nonce TEXT PRIMARY KEY,
+            caduca INTEGER NOT NULL
+        );
+    """
+
+    # Columnas añadidas despues de la primera version del esquema
+    COLUMNAS_PARTIDAS = {
+        "ts": "REAL NOT NULL DEFAULT 0",
+        "juego": "TEXT NOT NULL DEFAULT ''",
+        "resultado": "TEXT NOT NULL DEFAULT ''",
+    }
+
+    INDICES = """
+        CREATE INDEX IF NOT EXISTS idx_partidas_ts ON partidas(ts);
+        CREATE INDEX IF NOT EXISTS idx_partidas_juego ON partidas(juego, ts);
+    """
+
+    def __init__(self, ruta=SQLITE_PATH):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock = threading.Lock()
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        con = self._conexion()
+        con.executescript(self.ESQUEMA)
+        self._actualizar_esquema(con)
+        con.executescript(self.INDICES)
+
+    def _actualizar_esquema(self, con):
+        """Bases creadas antes de indexar por fecha y juego: se añaden las
+        columnas y se rellenan a partir del JSON de cada partida."""
+        existentes = {fila[1] for fila in con.execute("PRAGMA table_info(partidas)")}
+        faltan = [c for c in self.COLUMNAS_PARTIDAS if c not in existentes]
+        if not faltan:
+            return
+        with con:
+            for columna in faltan:
+                con.execute(f"ALTER TABLE partidas ADD COLUMN {columna} {self.COLUMNAS_PARTIDAS[columna]}")
+            filas = con.execute("SELECT id, datos FROM partidas").fetchall()
+            con.executemany(
+                "UPDATE partidas SET ts = ?, juego = ?, resultado = ? WHERE id = ?",
+                [self._columnas_partida(json.loads(datos)) + (pid,) for pid, datos in filas],
+            )
+
+    @staticmethod
+    def _columnas_partida(partida):
+        return (marca_tiempo(partida), partida.get("juego", ""), partida.get("resultado", ""))
+
+    def _conexion(self):
+        """Una conexion por hilo; WAL permite lectores concurrentes con un escritor."""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=30, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+            with self._lock:
+                self._conexiones.append(con)
+        return con
+
+    # --- Usuarios ---
+
+    def cargar_usuarios(self):
+        filas = self._conexion().execute("SELECT id, datos FROM usuarios")
+        return {uid: json.loads(datos) for uid, datos in filas}
+
+    def obtener_usuario(self, uid):
+        fila = self._conexion().execute(
+            "SELECT datos FROM usuarios WHERE id = ?", (str(uid),)
+        ).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def guardar_usuario(self, uid, datos, sincronizar=False):
+        return self.guardar_usuarios({str(uid): datos}, sincronizar)
+
+    def guardar_usuarios(self, usuarios, sincronizar=False):
+        """Upsert de los usuarios recibidos. Devuelve (version_anterior, version_nueva)."""
+        return self.confirmar(usuarios, [], sincronizar)
+
+    def confirmar(self, usuarios, partidas, sincronizar=False, bote=None):
+        """Upsert de usuarios, insercion de partidas y suma de los cambios del
+        bote (ver bote.py) en una unica transaccion: o se guarda todo o nada.
+        Devuelve (version_anterior, version_nueva) de los usuarios. Con
+        sincronizar=True el commit espera al fsync."""
+        con = self._conexion()
+        con.execute(f"PRAGMA synchronous={'FULL' if sincronizar else 'NORMAL'}")
+        with con:
+            # BEGIN IMMEDIATE: la version leida no puede cambiar hasta el commit
+            con.execute("BEGIN IMMEDIATE")
+            anterior = con.execute(
+                "SELECT valor FROM meta WHERE clave = 'version_usuarios'"
+            ).fetchone()[0]
+            if partidas:
+                con.executemany(
+                    "INSERT INTO partidas (usuario_id, nombre, datos, ts, juego, resultado) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(str(uid), nombre, json.dumps(p, ensure_ascii=False)) + self._columnas_partida(p)
+                     for uid, nombre, p in partidas],
+                )
+            if bote is not None:
+                fila = con.execute("SELECT datos FROM bote WHERE id = 1").fetchone()
+                con.execute(
+                    "INSERT INTO bote (id, datos) VALUES (1, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET datos = excluded.datos",
+                    (json.dumps(aplicar_cambios(json.loads(fila[0]) if fila else None, bote), ensure_ascii=False),),
+                )
+            if not usuarios:
+                return anterior, anterior
+            con.executemany(
+                "INSERT INTO usuarios (id, nombre, datos) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET nombre = excluded.nombre, datos = excluded.datos",
+                [(str(uid), datos.get("nombre", ""), json.dumps(datos, ensure_ascii=False))
+                 for uid, datos in usuarios.items()],
+            )
+            con.execute("UPDATE meta SET valor = ? WHERE clave = 'version_usuarios'", (anterior + 1,))
+        return anterior, anterior + 1
+
+    def crear_usuario(self, uid, datos, sincronizar=False):
+        """Inserta el usuario solo si su id no existe. Devuelve (version_anterior,
+        version_nueva), o None si ya existia."""
+        con = self._conexion()
+        con.execute(f"PRAGMA synchronous={'FULL' if sincronizar else 'NORMAL'}")
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            anterior = con.execute(
+                "SELECT valor FROM meta WHERE clave = 'version_usuarios'"
+            ).fetchone()[0]
+            insertado = con.execute(
+                "INSERT OR IGNORE INTO usuarios (id, nombre, datos) VALUES (?, ?, ?)",
+                (str(uid), datos.get("nombre", ""), json.dumps(datos, ensure_ascii=False)),
+            ).rowcount
+            if not insertado:
+                return None
+            con.execute("UPDATE meta SET valor = ? WHERE clave = 'version_usuarios'", (anterior + 1,))
+        return anterior, anterior + 1
+
+    def asignar_nodo(self):
+        """Numero de nodo nuevo para el generador de IDs (identificadores.py):
+        un contador en la tabla meta que cada proceso incrementa al arrancar."""
+        con = self._conexion()
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            valor = con.execute("SELECT valor FROM meta WHERE clave = 'siguiente_nodo'").fetchone()[0]
+            con.execute("UPDATE meta SET valor = ? WHERE clave = 'siguiente_nodo'", (valor + 1,))
+        return valor
+
+    def reservar_nodos(self, hasta):
+        """Ningun nodo por debajo de `hasta` se volvera a asignar (migracion).
+        Devuelve el siguiente nodo que se asignara."""
+        con = self._conexion()
+        with con:
+            con.execute("UPDATE meta SET valor = MAX(valor, ?) WHERE clave = 'siguiente_nodo'", (hasta,))
+            return con.execute("SELECT valor FROM meta WHERE clave = 'siguiente_nodo'").fetchone()[0]
+
+    def cargar_bote(self):
+        """Bote guardado, o None si aun no hay."""
+        fila = self._conexion().execute("SELECT datos FROM bote WHERE id = 1").fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def iniciar_bote(self, datos):
+        """Guarda `datos` como bote si aun no hay ninguno. Devuelve el bote guardado."""
+        con = self._conexion()
+        with con:
+            con.execute("INSERT OR IGNORE INTO bote (id, datos) VALUES (1, ?)",
+                        (json.dumps(datos, ensure_ascii=False),))
+            return json.loads(con.execute("SELECT datos FROM bote WHERE id = 1").fetchone()[0])
+
+    def revocar_sesion(self, nonce, caduca, ahora):
+        """Anota la sesion `nonce` como cerrada hasta `caduca` y borra las ya caducadas."""
+        con = self._conexion()
+        with con:
+            con.execute("DELETE FROM sesiones_revocadas WHERE caduca <= ?", (ahora,))
+            con.execute("INSERT OR REPLACE INTO sesiones_revocadas (nonce, caduca) VALUES (?, ?)",
+                        (nonce, caduca))
+
+    def sesion_revocada(self, nonce):
+        return self._conexion().execute(
+            "SELECT 1 FROM sesiones_revocadas WHERE nonce = ?", (nonce,)
+        ).fetchone() is not None
+
+    def sesiones_revocadas(self, ahora):
+        """{valor aleatorio: caduca} de las sesiones revocadas que aun no han caducado."""
+        return dict(self._conexion().execute(
+            "SELECT nonce, caduca FROM sesiones_revocadas WHERE caduca > ?", (ahora,)))
+
+    def version(self):
+        """Contador que aumenta con cada escritura de usuarios, de este u otro proceso."""
+        return self._conexion().execute(
+            "SELECT valor FROM meta WHERE clave = 'version_usuarios'"
+        ).fetchone()[0]
+
+    # --- Historial ---
+
+    def registrar_partida(self, uid, nombre, partida):
+        self.registrar_partidas([(uid, nombre, partida)])
+
+    def registrar_partidas(self, filas, sincronizar=False):
+        """Recibe tuplas (uid, nombre, partida) en orden cronologico."""
+        self.confirmar({}, filas, sincronizar)
+
+    def obtener_partidas(self, uid, limite=None):
+        filas = self._conexion().execute(
+            "SELECT nombre, datos FROM partidas WHERE usuario_id = ? ORDER BY id DESC LIMIT ?",
+            (str(uid), limite if limite else -1),
+        ).fetchall()
+        if not filas:
+            return None
+        return {"usuario": filas[0][0], "partidas": [json.loads(d) for _, d in filas]}
+
+    def contar_partidas(self, uid):
+        fila = self._conexion().execute(
+            "SELECT COUNT(*) FROM partidas WHERE usuario_id = ?", (str(uid),)
+        ).fetchone()
+        return fila[0]
+
+    def buscar_partidas(self, desde=None, hasta=None, juego=None, resultado=None):
+        """Partidas con desde <= ts < hasta, filtradas por juego y resultado,
+        como tuplas (uid, nombre, partida) en orden cronologico. Usa los
+        indices idx_partidas_ts / idx_partidas_juego."""
+        condiciones, parametros = [], []
+        for condicion, valor in (("ts >= ?", desde), ("ts < ?", hasta),
+                                 ("juego = ?", juego), ("resultado = ?", resultado)):
+            if valor is not None:
+                condiciones.append(condicion)
+                parametros.append(valor)
+        donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        filas = self._conexion().execute(
+            f"SELECT usuario_id, nombre, datos FROM partidas {donde} ORDER BY ts, id", parametros
+        )
+        return [(uid, nombre, json.loads(datos)) for uid, nombre, datos in filas]
+
+    def usuarios_con_partidas(self, despues=None, limite=None):
+        """Ids de usuarios con historial en orden, para paginar por cursor."""
+        filas = self._conexion().execute(
+            "SELECT DISTINCT usuario_id FROM partidas WHERE usuario_id > ? ORDER BY usuario_id LIMIT ?",
+            (despues if despues is not None else "", limite if limite else -1),
+        )
+        return [uid for (uid,) in filas]
+
+    # --- Retencion (ver archivo.py) ---
+
+    def corrida_compactacion(self):
+        return self._conexion().execute(
+            "SELECT valor FROM meta WHERE clave = 'compactacion'"
+        ).fetchone()[0]
+
+    def retirar_partidas(self, retener, corrida, archivar):
+        """Deja las ultimas `retener` partidas por usuario; las demas pasan
+        antes por archivar(filas). El borrado y el numero de corrida se
+        confirman en la misma transaccion."""
+        con = self._conexion()
+        # Solo la compactacion borra partidas, asi que la seleccion no cambia
+        # aunque entren partidas nuevas mientras se archiva
+        filas = con.execute(
+            "SELECT id, usuario_id, nombre, datos FROM ("
+            "  SELECT id, usuario_id, nombre, datos,"
+            "         ROW_NUMBER() OVER (PARTITION BY usuario_id ORDER BY id DESC) AS n"
+            "  FROM partidas"
+            ") WHERE n > ? ORDER BY id",
+            (retener,),
+        ).fetchall()
+        if not filas:
+            return 0
+
+        archivar([(uid, nombre, json.loads(datos)) for _, uid, nombre, datos in filas])
+
+        con.execute("PRAGMA synchronous=FULL")
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            con.executemany("DELETE FROM partidas WHERE id = ?", [(pid,) for pid, *_ in filas])
+            con.execute("UPDATE meta SET valor = ? WHERE clave = 'compactacion'", (corrida,))
+        return len(filas)
+
+    def iterar_partidas(self, tamano_bloque=500):
+        """Todas las partidas como tuplas (uid, nombre, partida) en orden
+        cronologico. Se leen por bloques de id para no mantener un cursor
+        abierto entre llamadas (el consumidor puede cambiar de hilo)."""
+        ultimo = 0
+        while True:
+            filas = self._conexion().execute(
+                "SELECT id, usuario_id, nombre, datos FROM partidas WHERE id > ? ORDER BY id LIMIT ?",
+                (ultimo, tamano_bloque),
+            ).fetchall()
+            if not filas:
+                return
+            for pid, uid, nombre, datos in filas:
+                yield uid, nombre, json.loads(datos)
+            ultimo = filas[-1][0]
+
+    def cargar_historial(self):
+        historial = {}
+        filas = self._conexion().execute(
+            "SELECT usuario_id, nombre, datos FROM partidas ORDER BY id DESC"
+        )
+        for uid, nombre, datos in filas:
+            info = historial.setdefault(uid, {"usuario": nombre, "partidas": []})
+            info["partidas"].append(json.loads(datos))
+        return historial
+
+    def cerrar(self):
+        with self._lock:
+            for con in self._conexiones:
+                con.close()
+            self._conexiones = []
+        self._local = threading.local()
+
+
+def migrar(origen, destino, forzar=False):
+    """Copia usuarios, historial, bote, contador de nodos y sesiones
+    revocadas de un backend a otro en una sola pasada.
+
+    Si el destino ya tiene exactamente los usuarios del origen (lo importo
+    crear_almacen() al abrir la base por primera vez) no se copia nada."""
+    usuarios = origen.cargar_usuarios()
+    existentes = destino.cargar_usuarios()
+    if not forzar and existentes:
+        if existentes == usuarios:
+            return {"usuarios": 0, "partidas": 0, "ya_migrado": True}
+        raise ValueError(f"El backend destino ({destino.nombre}) ya contiene usuarios")
+
+    if usuarios:
+        destino.guardar_usuarios(usuarios)
+
+    filas = []
+    for uid, info in origen.cargar_historial().items():
+        # El historial se guarda de la mas reciente a la mas antigua
+        for partida in reversed(info.get("partidas", [])):
+            filas.append((uid, info.get("usuario", ""), partida))
+    if filas:
+        destino.registrar_partidas(filas)
+
+    # Un bote que ya exista en el destino no se pisa
+    bote = origen.cargar_bote()
+    if bote is not None:
+        destino.iniciar_bote(bote)
+    # Los nodos ya repartidos por el origen no se vuelven a asignar
+    # (reservar_nodos(0) no cambia el contador: solo lo lee)
+    destino.reservar_nodos(origen.reservar_nodos(0))
+    ahora = time.time()
+    for nonce, caduca in origen.sesiones_revocadas(ahora).items():
+        destino.revocar_sesion(nonce, caduca, ahora)
+
+    return {"usuarios": len(usuarios), "partidas": len(filas), "ya_migrado": False}
+
+
+def crear_almacen(backend=None, importar_legado=True):
+    """Construye el backend indicado, o el de config.json / CACINHUB_BACKEND.
+    Si la base SQLite no existe todavia se importan los JSON heredados
+    (salvo con importar_legado=False, p. ej. desde la CLI de migracion)."""
+    config = obtener_seccion("almacenamiento")
+    backend = backend or os.environ.get("CACINHUB_BACKEND") or config.get("backend", "sqlite")
+
+    legado = AlmacenJSON(
+        config.get("ruta_usuarios", USUARIOS_PATH),
+        config.get("ruta_historial", HISTORIAL_PATH),
+        config.get("ruta_diario", DIARIO_PATH),
+    )
+    if backend == "json":
+        return con_archivo(legado)
+
+    if backend == "sqlite":
+        ruta = config.get("ruta_sqlite", SQLITE_PATH)
+        nueva = not os.path.exists(ruta)
+        almacen = AlmacenSQLite(ruta)
+        if nueva and importar_legado:
+            migrar(con_archivo(legado), almacen)
+        return con_archivo(almacen)
+
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
+
+
+_almacen = None
+
+def obtener_almacen():
+    """Backend compartido por el proceso (API y CLI)."""
+    global _almacen
+    if _almacen is None:
+        _almacen = crear_almacen()
+    return _almacen
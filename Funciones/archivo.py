@@ -0,0 +1,363 @@
+"""Archivo historico de partidas y retencion del historial caliente.
+
+El almacen (SQLite o diario JSON) solo conserva las ultimas N partidas de
+cada usuario (limites.historial_limite_default). Al compactar, las mas
+antiguas pasan a segmentos NDJSON comprimidos con gzip, uno por mes y por
+compactacion, con un indice pequeño (indice.json) que resume cada segmento:
+rango de fechas, juegos y partidas por usuario. Asi el camino caliente no
+crece y el historial completo sigue disponible para auditoria.
+
+Compactar a mano:
+    python -m Funciones.archivo
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from Funciones.configuracion import obtener_seccion
+from Funciones.diario import marca_tiempo
+from Funciones.persistencia_json import cargar_json, guardar_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_PATH = "base_data/archivo"
+EXTENSION = ".ndjson.gz"
+
+
+def _corrida(nombre):
+    # "2026-03.c000007.ndjson.gz" -> 7
+    return int(nombre.split(".")[1][1:])
+
+
+class ArchivoPartidas:
+    """Segmentos comprimidos de partidas retiradas del almacen.
+
+    Cada compactacion tiene un numero (corrida) que el almacen confirma en
+    la misma operacion en la que borra las partidas. Los segmentos de una
+    corrida que el almacen no llego a confirmar (caida a mitad) se descartan
+    al abrir, asi ninguna partida queda duplicada ni perdida.
+    """
+
+    def __init__(self, carpeta=ARCHIVO_PATH):
+        self.carpeta = carpeta
+        self.ruta_indice = os.path.join(carpeta, "indice.json")
+        os.makedirs(carpeta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._segmentos = cargar_json(self.ruta_indice)  # nombre -> resumen
+        self._confirmada = 0
+
+    @contextmanager
+    def bloqueo(self):
+        """Excluye a otros procesos mientras se compacta o se limpia el archivo."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.carpeta, ".compactacion.lock"), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def abrir(self, confirmada):
+        """Alinea el archivo con la ultima compactacion confirmada por el
+        almacen. Borra segmentos, asi que se llama dentro de bloqueo()."""
+        with self._lock:
+            self._confirmada = confirmada
+            self._segmentos = cargar_json(self.ruta_indice)
+            presentes = {f for f in os.listdir(self.carpeta) if f.endswith(EXTENSION)}
+            cambios = False
+            for nombre in list(self._segmentos):
+                if nombre not in presentes:
+                    del self._segmentos[nombre]
+                    cambios = True
+            for nombre in sorted(presentes):
+                if _corrida(nombre) > confirmada:
+                    os.remove(os.path.join(self.carpeta, nombre))
+                    self._segmentos.pop(nombre, None)
+                    cambios = True
+                elif nombre not in self._segmentos:
+                    # Caida entre escribir el segmento y actualizar el indice
+                    self._segmentos[nombre] = self._resumir(nombre, list(self._leer_segmento(nombre)))
+                    cambios = True
+            if cambios:
+                guardar_json(self.ruta_indice, self._segmentos)
+
+    def actualizar(self, confirmada):
+        """Si otro proceso ha compactado, relee el indice (sin borrar nada)."""
+        with self._lock:
+            if confirmada != self._confirmada:
+                self._segmentos = cargar_json(self.ruta_indice)
+                self._confirmada = confirmada
+
+    # --- Escritura ---
+
+    def escribir(self, corrida, filas):
+        """Guarda las filas (uid, nombre, partida) de una compactacion,
+        repartidas en un segmento por mes. No son visibles hasta confirmar()."""
+        por_periodo = {}
+        for uid, nombre, partida in filas:
+            periodo = datetime.fromtimestamp(marca_tiempo(partida)).strftime("%Y-%m")
+            por_periodo.setdefault(periodo, []).append(
+                {"uid": str(uid), "usuario": nombre, "partida": partida}
+            )
+
+        with self._lock:
+            for periodo, registros in por_periodo.items():
+                nombre = f"{periodo}.c{corrida:06d}{EXTENSION}"
+                ruta = os.path.join(self.carpeta, nombre)
+                with open(ruta + ".tmp", 'wb') as f:
+                    with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+                        for registro in registros:
+                            gz.write((json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(ruta + ".tmp", ruta)
+                self._segmentos[nombre] = self._resumir(nombre, registros)
+            guardar_json(self.ruta_indice, self._segmentos, sincronizar=True)
+
+    def confirmar(self, corrida):
+        with self._lock:
+            self._confirmada = corrida
+
+    def descartar(self, corrida):
+        """Borra los segmentos de una compactacion que no se pudo confirmar."""
+        with self._lock:
+            for nombre in [n for n in self._segmentos if _corrida(n) == corrida]:
+                del self._segmentos[nombre]
+                os.remove(os.path.join(self.carpeta, nombre))
+            guardar_json(self.ruta_indice, self._segmentos)
+
+    # --- Lectura ---
+
+    @staticmethod
+    def _resumir(nombre, registros):
+        usuarios = {}
+        for registro in registros:
+            usuarios[registro["uid"]] = usuarios.get(registro["uid"], 0) + 1
+        marcas = [marca_tiempo(r["partida"]) for r in registros] or [0.0]
+        return {
+            "corrida": _corrida(nombre),
+            "desde": min(marcas),
+            "hasta": max(marcas),
+            "partidas": len(registros),
+            "juegos": sorted({r["partida"].get("juego", "") for r in registros}),
+            "usuarios": usuarios,
+        }
+
+    def _leer_segmento(self, nombre):
+        with gzip.open(os.path.join(self.carpeta, nombre), 'rb') as f:
+            for linea in f:
+                yield json.loads(linea)
+
+    def _visibles(self):
+        """Segmentos confirmados en orden cronologico: dentro de un usuario,
+        una corrida posterior siempre contiene partidas posteriores."""
+        with self._lock:
+            return sorted(
+                ((nombre, info) for nombre, info in self._segmentos.items()
+                 if info["corrida"] <= self._confirmada),
+                key=lambda s: (s[1]["corrida"], s[0]),
+            )
+
+    def contar(self, uid):
+        return sum(info["usuarios"].get(str(uid), 0) for _, info in self._visibles())
+
+    def usuarios(self):
+        uids = set()
+        for _, info in self._visibles():
+            uids.update(info["usuarios"])
+        return uids
+
+    def leer(self, uid):
+        """Partidas archivadas del usuario, la mas reciente primero (None si no hay)."""
+        uid = str(uid)
+        registros = []
+        for nombre, info in self._visibles():
+            if uid in info["usuarios"]:
+                registros.extend(r for r in self._leer_segmento(nombre) if r["uid"] == uid)
+        if not registros:
+            return None
+        registros.reverse()
+        return {"usuario": registros[0]["usuario"], "partidas": [r["partida"] for r in registros]}
+
+    def buscar(self, desde=None, hasta=None, juego=None, resultado=None):
+        """Como DiarioPartidas.buscar, abriendo solo los segmentos cuyo resumen
+        se solapa con el rango y contiene el juego pedido."""
+        filas = []
+        for nombre, info in self._visibles():
+            if desde is not None and info["hasta"] < desde:
+                continue
+            if hasta is not None and info["desde"] >= hasta:
+                continue
+            if juego and juego not in info["juegos"]:
+                continue
+            for registro in self._leer_segmento(nombre):
+                partida = registro["partida"]
+                ts = marca_tiempo(partida)
+                if (desde is not None and ts < desde) or (hasta is not None and ts >= hasta):
+                    continue
+                if (juego and partida.get("juego") != juego) or (resultado and partida.get("resultado") != resultado):
+                    continue
+                filas.append((registro["uid"], registro["usuario"], partida))
+        filas.sort(key=lambda fila: marca_tiempo(fila[2]))
+        return filas
+
+    def iterar(self):
+        for nombre, _ in self._visibles():
+            for registro in self._leer_segmento(nombre):
+                yield registro["uid"], registro["usuario"], registro["partida"]
+
+
+class AlmacenConArchivo:
+    """Envuelve un almacen (JSON o SQLite) y le añade el archivo historico.
+
+    Escrituras y usuarios pasan tal cual al almacen; las lecturas de
+    historial combinan las partidas calientes con las archivadas solo cuando
+    hace falta (p. ej. obtener_partidas con un limite mayor que lo retenido).
+    """
+
+    def __init__(self, almacen, archivo, retener):
+        self.almacen = almacen
+        self.archivo = archivo
+        self.retener = retener
+        self._lock_compactacion = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = None
+        with archivo.bloqueo():
+            archivo.abrir(almacen.corrida_compactacion())
+
+    def __getattr__(self, nombre):
+        return getattr(self.almacen, nombre)
+
+    # --- Compactacion ---
+
+    def compactar(self):
+        """Mueve al archivo las partidas que exceden la retencion. Devuelve cuantas."""
+        with self._lock_compactacion, self.archivo.bloqueo():
+            # Otro proceso puede haber compactado: se parte de lo que diga el almacen
+            confirmada = self.almacen.corrida_compactacion()
+            self.archivo.abrir(confirmada)
+            corrida = confirmada + 1
+            try:
+                movidas = self.almacen.retirar_partidas(
+                    self.retener, corrida, lambda filas: self.archivo.escribir(corrida, filas)
+                )
+            except Exception:
+                self.archivo.descartar(corrida)
+                raise
+            if movidas:
+                self.archivo.confirmar(corrida)
+            return movidas
+
+    def iniciar_compactacion(self, intervalo):
+        """Compacta en segundo plano cada `intervalo` segundos."""
+        if self._hilo is not None or not intervalo:
+            return
+
+        def bucle():
+            while not self._parar.wait(intervalo):
+                try:
+                    self.compactar()
+                except Exception:
+                    logger.exception("No se pudo compactar el historial")
+
+        self._hilo = threading.Thread(target=bucle, name="compactacion-historial", daemon=True)
+        self._hilo.start()
+
+    def detener_compactacion(self):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        self._parar.clear()
+
+    def cerrar(self):
+        self.detener_compactacion()
+        self.almacen.cerrar()
+
+    # --- Historial ---
+
+    def _archivo(self):
+        self.archivo.actualizar(self.almacen.corrida_compactacion())
+        return self.archivo
+
+    def contar_partidas(self, uid):
+        return self.almacen.contar_partidas(uid) + self._archivo().contar(uid)
+
+    def obtener_partidas(self, uid, limite=None):
+        info = self.almacen.obtener_partidas(uid, limite)
+        if limite is not None and info is not None and len(info["partidas"]) >= limite:
+            return info  # caso habitual: basta con las calientes
+        antiguas = self._archivo().leer(uid)
+        if antiguas is None:
+            return info
+        if info is None:
+            info = {"usuario": antiguas["usuario"], "partidas": []}
+        partidas = info["partidas"] + antiguas["partidas"]
+        return {"usuario": info["usuario"], "partidas": partidas[:limite] if limite else partidas}
+
+    def buscar_partidas(self, desde=None, hasta=None, juego=None, resultado=None):
+        filas = self._archivo().buscar(desde, hasta, juego, resultado)
+        filas.extend(self.almacen.buscar_partidas(desde, hasta, juego, resultado))
+        filas.sort(key=lambda fila: marca_tiempo(fila[2]))
+        return filas
+
+    def usuarios_con_partidas(self, despues=None, limite=None):
+        calientes = self.almacen.usuarios_con_partidas(despues, limite)
+        archivados = sorted(u for u in self._archivo().usuarios() if despues is None or u > despues)
+        uids = sorted(set(calientes) | set(archivados[:limite] if limite else archivados))
+        return uids[:limite] if limite else uids
+
+    def iterar_partidas(self):
+        """Primero lo archivado y despues lo caliente."""
+        yield from self._archivo().iterar()
+        yield from self.almacen.iterar_partidas()
+
+    def cargar_historial(self):
+        historial = self.almacen.cargar_historial()
+        antiguas = {}
+        for uid, nombre, partida in self._archivo().iterar():
+            antiguas.setdefault(uid, (nombre, []))[1].append(partida)
+        for uid, (nombre, partidas) in antiguas.items():
+            info = historial.setdefault(uid, {"usuario": nombre, "partidas": []})
+            info["partidas"].extend(reversed(partidas))
+        return historial
+
+
+def con_archivo(almacen):
+    """Añade al almacen el archivo y la retencion configurados en config.json.
+    Cada backend tiene su carpeta: el numero de compactacion vive en el almacen."""
+    retener = obtener_seccion("limites").get("historial_limite_default")
+    if not retener:
+        return almacen
+    carpeta = os.path.join(obtener_seccion("retencion").get("ruta_archivo", ARCHIVO_PATH), almacen.nombre)
+    return AlmacenConArchivo(almacen, ArchivoPartidas(carpeta), retener)
+
+
+def main():
+    from Funciones.almacenamiento import obtener_almacen
+
+    almacen = obtener_almacen()
+    if not isinstance(almacen, AlmacenConArchivo):
+        print("La retencion no esta configurada (limites.historial_limite_default).")
+        return 1
+    try:
+        movidas = almacen.compactar()
+    finally:
+        almacen.cerrar()
+    print(f"Archivadas {movidas} partidas (se conservan las ultimas {almacen.retener} por usuario).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
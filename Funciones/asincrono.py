@@ -0,0 +1,64 @@
+"""Camino asincrono de la API: la E/S bloqueante sale del bucle de eventos.
+
+Los endpoints son `async def`. Lo que toca el almacen (leer o guardar
+usuarios y partidas, liquidar con el bloqueo del usuario) es codigo
+bloqueante, asi que se ejecuta en un ThreadPoolExecutor propio con un
+numero fijo de hilos (`concurrencia.hilos_almacen`). Las peticiones que
+esperan turno son corrutinas en la cola del ejecutor, no hilos: miles de
+peticiones a la vez no crean miles de hilos ni agotan el pool por defecto
+de FastAPI.
+
+El decorador @asincrono convierte una funcion normal en una corrutina que
+la ejecuta en ese ejecutor; conserva la firma, asi que FastAPI sigue
+leyendo los parametros de la funcion original.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from Funciones.configuracion import obtener_seccion
+
+
+class EjecutorAlmacen:
+    def __init__(self, hilos=32):
+        self.hilos = hilos
+        self._ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="almacen")
+
+    async def ejecutar(self, funcion, *args, **kwargs):
+        """Ejecuta funcion(*args, **kwargs) en un hilo del almacen y espera el resultado."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._ejecutor, functools.partial(funcion, *args, **kwargs))
+
+    def cerrar(self):
+        self._ejecutor.shutdown(wait=True)
+
+
+_ejecutor = None
+_lock_ejecutor = threading.Lock()
+
+def obtener_ejecutor():
+    """Ejecutor compartido por el proceso, creado la primera vez que se pide."""
+    global _ejecutor
+    with _lock_ejecutor:
+        if _ejecutor is None:
+            _ejecutor = EjecutorAlmacen(obtener_seccion("concurrencia").get("hilos_almacen", 32))
+    return _ejecutor
+
+
+def cerrar_ejecutor():
+    """Espera a lo que este en curso y cierra el ejecutor (apagado de la API).
+    Si despues se vuelve a pedir se crea uno nuevo."""
+    global _ejecutor
+    with _lock_ejecutor:
+        ejecutor, _ejecutor = _ejecutor, None
+    if ejecutor is not None:
+        ejecutor.cerrar()
+
+
+def asincrono(funcion):
+    """Endpoint async que ejecuta `funcion` (bloqueante) en el ejecutor del almacen."""
+    @functools.wraps(funcion)
+    async def envoltura(*args, **kwargs):
+        return await obtener_ejecutor().ejecutar(funcion, *args, **kwargs)
+    return envoltura
@@ -0,0 +1,44 @@
+import threading
+import zlib
+from contextlib import ExitStack, contextmanager
+
+from Funciones.configuracion import obtener_seccion
+
+
+class BloqueosPorUsuario:
+    """Bloqueos repartidos en franjas por usuario.
+
+    Cada uid cae siempre en la misma franja, asi que dos apuestas del mismo
+    usuario se ejecutan una detras de otra, mientras que usuarios de franjas
+    distintas avanzan en paralelo. Con pocas franjas fijas no hace falta
+    crear ni limpiar un lock por usuario.
+    """
+
+    def __init__(self, franjas=64):
+        self._franjas = [threading.RLock() for _ in range(franjas)]
+
+    def franja(self, uid):
+        return zlib.crc32(str(uid).encode("utf-8")) % len(self._franjas)
+
+    def para(self, uid):
+        return self._franjas[self.franja(uid)]
+
+    def varios(self, uids):
+        """Locks de las franjas de `uids`, sin repetir y siempre en el mismo
+        orden: asi dos operaciones con usuarios en comun no se bloquean entre si."""
+        return [self._franjas[f] for f in sorted({self.franja(uid) for uid in uids})]
+
+
+bloqueos_usuarios = BloqueosPorUsuario(obtener_seccion("concurrencia").get("franjas_bloqueo", 64))
+
+def bloqueo_usuario(uid):
+    """Lock (reentrante) que protege la lectura, apuesta y guardado de un usuario."""
+    return bloqueos_usuarios.para(uid)
+
+@contextmanager
+def bloqueo_usuarios(uids):
+    """Bloquea a la vez a todos los usuarios de `uids` (p. ej. al liquidar una ronda)."""
+    with ExitStack() as pila:
+        for lock in bloqueos_usuarios.varios(uids):
+            pila.enter_context(lock)
+        yield
@@ -0,0 +1,268 @@
+"""Bote progresivo alimentado por un porcentaje de cada apuesta.
+
+Un unico contador compartido que se actualiza en cada apuesta seria un lock
+caliente. Por eso cada hilo de trabajo acumula sus aportaciones en su propio
+fragmento (con un lock que solo comparte con la consolidacion, asi que casi
+nunca espera) y un hilo en segundo plano las suma periodicamente al bote
+central. Al pagar un premio se consolidan antes todos los fragmentos, de
+modo que el ganador cobra el bote exacto.
+
+Las cantidades se llevan en enteros de diezmilesimas de ficha (UNIDAD), sin
+redondeos: el premio son las fichas enteras del bote y el resto se queda
+para el siguiente. Se cumple siempre:
+
+    bote = sembrado + aportado - pagado
+
+El bote se guarda en el almacen (ver cargar_bote() y el parametro `bote`
+de confirmar() en almacenamiento.py) como cambios que se suman a lo
+guardado: {"aportado", "apuestas", "sembrado", "pagado", "premios"}. El
+premio se cobra dentro de la liquidacion de la apuesta (ver
+juegos/liquidacion.py) y sus cambios viajan en la misma unidad de trabajo
+y la misma transaccion que el saldo y la partida del ganador, tambien en
+modo diferido: o se guardan todos o ninguno, y si la confirmacion falla el
+premio vuelve al bote con devolver(). Como son sumas, dos transacciones
+pueden confirmarse en cualquier orden.
+
+Las aportaciones se guardan en cada consolidacion con cambios (o con el
+siguiente premio); lo aportado desde entonces se pierde si el proceso se
+cae.
+"""
+import logging
+import os
+import random
+import threading
+
+from Funciones.configuracion import obtener_seccion
+from Funciones.persistencia_json import cargar_json
+
+logger = logging.getLogger(__name__)
+
+UNIDAD = 10_000  # diezmilesimas de ficha
+MAX_PREMIOS = 10
+CONTADORES = ("aportado", "apuestas", "sembrado", "pagado")
+
+
+def combinar_cambios(anteriores, nuevos):
+    """Suma dos cambios del bote (cualquiera puede ser None)."""
+    if anteriores is None:
+        return nuevos
+    if nuevos is None:
+        return anteriores
+    combinados = {c: anteriores.get(c, 0) + nuevos.get(c, 0) for c in CONTADORES}
+    combinados["premios"] = (nuevos.get("premios", []) + anteriores.get("premios", []))[:MAX_PREMIOS]
+    return combinados
+
+
+def aplicar_cambios(datos, cambios):
+    """Estado guardado del bote (o None si aun no hay) tras sumarle `cambios`."""
+    return combinar_cambios(datos or {c: 0 for c in CONTADORES}, cambios)
+
+
+class _Fragmento:
+    __slots__ = ("lock", "unidades", "apuestas")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.unidades = 0
+        self.apuestas = 0
+
+
+class BoteProgresivo:
+    def __init__(self, porcentaje=1.0, juegos=("tragamonedas",), semilla=500, probabilidad=1_000_000,
+                 almacen=None, azar=None, heredado=None):
+        """Con `almacen` el bote se carga de el y las aportaciones se guardan
+        en el al consolidar; sin el solo vive en memoria. Si el almacen aun
+        no tiene bote se empieza por `heredado` (el estado de un bote.json
+        de versiones anteriores) o por la semilla."""
+        self.puntos_basicos = round(porcentaje * 100)  # aportacion por ficha, en UNIDAD
+        self.juegos = frozenset(juegos)
+        self.semilla = int(semilla) * UNIDAD
+        self.probabilidad = probabilidad  # 1 premio cada `probabilidad` fichas apostadas
+        self.almacen = almacen
+        self.azar = azar or random.SystemRandom()
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._fragmentos = []
+        self.bote = self.semilla
+        self.sembrado = self.semilla
+        self.aportado = 0
+        self.pagado = 0
+        self.apuestas = 0
+        self.premios = []  # ultimos premios: {"uid", "juego", "fichas"}
+        self._sin_guardar = {"aportado": 0, "apuestas": 0}  # consolidado pero aun no en el almacen
+        self._hilo = None
+        self._parar = threading.Event()
+        if almacen is not None:
+            self._cargar(almacen.iniciar_bote(aplicar_cambios(None, heredado or {"sembrado": self.semilla})))
+
+    def participa(self, nombre_juego):
+        return nombre_juego in self.juegos
+
+    # --- Aportaciones (sin lock compartido) ---
+
+    def _fragmento(self):
+        fragmento = getattr(self._local, "fragmento", None)
+        if fragmento is None or self._local.pid != os.getpid():
+            fragmento = _Fragmento()
+            with self._lock:
+                self._fragmentos.append(fragmento)
+            self._local.fragmento = fragmento
+            self._local.pid = os.getpid()
+        return fragmento
+
+    def aportar(self, apuesta):
+        fragmento = self._fragmento()
+        with fragmento.lock:
+            fragmento.unidades += apuesta * self.puntos_basicos
+            fragmento.apuestas += 1
+
+    def consolidar(self):
+        """Suma los fragmentos al bote central y guarda en el almacen lo aportado."""
+        with self._lock:
+            self._consolidar()
+            cambios = self._tomar_sin_guardar()
+        if cambios and self.almacen is not None:
+            try:
+                self.almacen.confirmar({}, [], bote=cambios)
+            except Exception:
+                with self._lock:
+                    self._devolver_sin_guardar(cambios)
+                raise
+
+    def _consolidar(self):
+        # Con self._lock tomado
+        for fragmento in self._fragmentos:
+            with fragmento.lock:
+                unidades, apuestas = fragmento.unidades, fragmento.apuestas
+                fragmento.unidades = fragmento.apuestas = 0
+            if apuestas:
+                self.bote += unidades
+                self.aportado += unidades
+                self.apuestas += apuestas
+                self._sin_guardar["aportado"] += unidades
+                self._sin_guardar["apuestas"] += apuestas
+
+    def _tomar_sin_guardar(self):
+        # Con self._lock tomado. Cambios con lo aportado sin guardar, o None
+        if not self._sin_guardar["apuestas"]:
+            return None
+        cambios, self._sin_guardar = self._sin_guardar, {"aportado": 0, "apuestas": 0}
+        return cambios
+
+    def _devolver_sin_guardar(self, cambios):
+        # Con self._lock tomado: lo aportado de unos cambios que no se guardaron
+        self._sin_guardar["aportado"] += cambios.get("aportado", 0)
+        self._sin_guardar["apuestas"] += cambios.get("apuestas", 0)
+
+    # --- Premio ---
+
+    def jugar(self, uid, nombre_juego, apuesta):
+        """Aporta la parte de `apuesta` al bote y sortea el premio. Devuelve
+        (fichas ganadas, cambios a guardar con el saldo); casi siempre
+        (0, None). Se llama con el usuario bloqueado."""
+        self.aportar(apuesta)
+        if self.azar.random() * self.probabilidad >= apuesta:
+            return 0, None
+        return self.cobrar(uid, nombre_juego)
+
+    def cobrar(self, uid, nombre_juego):
+        """Paga el bote a `uid`. Devuelve (fichas, cambios): los cambios
+        llevan tambien lo aportado sin guardar y se guardan con el saldo del
+        ganador; si no se pueden guardar hay que llamar a devolver(cambios)."""
+        with self._lock:
+            self._consolidar()
+            fichas = self.bote // UNIDAD
+            self.pagado += fichas * UNIDAD
+            # La casa vuelve a sembrar el bote; el resto fraccionario se queda
+            self.bote = self.bote - fichas * UNIDAD + self.semilla
+            self.sembrado += self.semilla
+            premio = {"uid": str(uid), "juego": nombre_juego, "fichas": fichas}
+            self.premios = [premio] + self.premios[:MAX_PREMIOS - 1]
+            cambios = combinar_cambios(self._tomar_sin_guardar(), {
+                "sembrado": self.semilla, "pagado": fichas * UNIDAD, "premios": [premio],
+            })
+        return fichas, cambios
+
+    def devolver(self, cambios):
+        """Deshace un cobrar() cuyos cambios no se pudieron guardar."""
+        with self._lock:
+            pagado = cambios["pagado"]
+            self.bote += pagado - cambios["sembrado"]
+            self.pagado -= pagado
+            self.sembrado -= cambios["sembrado"]
+            for premio in cambios["premios"]:
+                if premio in self.premios:
+                    self.premios.remove(premio)
+            self._devolver_sin_guardar(cambios)
+
+    # --- Estado ---
+
+    def estado(self):
+        with self._lock:
+            self._consolidar()
+            return {
+                "bote": self.bote / UNIDAD,
+                "porcentaje": self.puntos_basicos / 100,
+                "juegos": sorted(self.juegos),
+                "apuestas": self.apuestas,
+                "aportado": self.aportado / UNIDAD,
+                "sembrado": self.sembrado / UNIDAD,
+                "pagado": self.pagado / UNIDAD,
+                "ultimos_premios": list(self.premios),
+            }
+
+    def _cargar(self, datos):
+        self.sembrado = datos["sembrado"]
+        self.aportado = datos["aportado"]
+        self.pagado = datos["pagado"]
+        self.bote = self.sembrado + self.aportado - self.pagado
+        self.apuestas = datos.get("apuestas", 0)
+        self.premios = datos.get("premios", [])
+
+    def iniciar_consolidacion(self, intervalo):
+        """Consolida en segundo plano cada `intervalo` segundos."""
+        if self._hilo is not None or not intervalo:
+            return
+
+        def bucle():
+            while not self._parar.wait(intervalo):
+                try:
+                    self.consolidar()
+                except Exception:
+                    logger.exception("No se pudo consolidar el bote")
+
+        self._hilo = threading.Thread(target=bucle, name="consolidacion-bote", daemon=True)
+        self._hilo.start()
+
+    def detener_consolidacion(self):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        self.consolidar()
+
+
+_bote = None
+_lock_bote = threading.Lock()
+
+def obtener_bote():
+    """Bote compartido por el proceso (None si esta desactivado en config.json)."""
+    global _bote
+    config = obtener_seccion("bote")
+    if not config.get("activo", False):
+        return None
+    with _lock_bote:
+        if _bote is None:
+            from Funciones.almacenamiento import obtener_almacen
+            # bote.json de versiones anteriores: se importa si el almacen aun no tiene bote
+            ruta = config.get("ruta", "base_data/bote.json")
+            _bote = BoteProgresivo(
+                porcentaje=config.get("porcentaje", 1.0),
+                juegos=config.get("juegos", ["tragamonedas"]),
+                semilla=config.get("semilla", 500),
+                probabilidad=config.get("probabilidad", 1_000_000),
+                almacen=obtener_almacen(),
+                heredado=cargar_json(ruta) if os.path.exists(ruta) else None,
+            )
+    return _bote
@@ -0,0 +1,15 @@
+from Funciones.persistencia_json import cargar_json
+
+CONFIG_PATH = "base_data/config.json"
+
+_config = None
+
+def cargar_config():
+    """Lee config.json una sola vez y lo reutiliza en el resto del proceso."""
+    global _config
+    if _config is None:
+        _config = cargar_json(CONFIG_PATH)
+    return _config
+
+def obtener_seccion(nombre):
+    return cargar_config().get(nombre, {})
@@ -0,0 +1,326 @@
+import bisect
+import json
+import os
+import threading
+from datetime import datetime
+
+FORMATO_FECHA = "%d/%m/%Y %H:%M:%S"
+
+
+def marca_tiempo(partida):
+    """Segundos desde epoch de la partida. Las antiguas no guardaban "ts" y
+    se calcula a partir de la fecha en texto (0.0 si no se puede leer)."""
+    if "ts" in partida:
+        return float(partida["ts"])
+    try:
+        return datetime.strptime(partida.get("fecha", ""), FORMATO_FECHA).timestamp()
+    except (ValueError, OverflowError):
+        return 0.0
+
+
+class DiarioPartidas:
+    """Diario de partidas de solo escritura al final: una linea JSON por partida.
+
+    Registrar una partida es un unico append. Junto al diario se guarda un
+    indice (ruta + ".idx", tambien de solo append) con la posicion de cada
+    linea por usuario, de modo que leer las ultimas N partidas de un jugador
+    son N lecturas directas sin recorrer el archivo.
+
+    El indice tambien guarda la marca de tiempo y el juego de cada linea; en
+    memoria se mantienen listas ordenadas por tiempo (global y por juego) para
+    responder consultas por rango de fechas con busqueda binaria.
+
+    compactar() reescribe el diario dejando solo las partidas recientes de
+    cada usuario (ver archivo.py). El diario reescrito empieza con una linea
+    {"compactacion": N} y el indice con "#compactacion\tN"; si tras una caida
+    no coinciden, el indice se reconstruye a partir del diario.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.ruta_indice = ruta + ".idx"
+        self._lock = threading.Lock()
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._cargar_indice()
+
+    # --- Indice ---
+
+    def _leer_compactacion(self):
+        """Numero de la cabecera del diario (0 si nunca se ha compactado)."""
+        if not os.path.exists(self.ruta):
+            return 0
+        with open(self.ruta, 'rb') as f:
+            linea = f.readline()
+        if not linea.endswith(b"\n"):
+            return 0
+        return json.loads(linea).get("compactacion", 0)
+
+    def _cargar_indice(self):
+        self._indice = {}     # uid -> [(offset, longitud), ...] en orden cronologico
+        self._por_fecha = []  # [(ts, offset, longitud), ...] ordenada por ts
+        self._por_juego = {}  # juego -> [(ts, offset, longitud), ...] ordenada por ts
+        self._entradas = {}   # offset -> (uid, offset, longitud, ts, juego)
+        self._fin = 0         # byte hasta el que el diario esta indexado
+        self._inodo = os.stat(self.ruta).st_ino if os.path.exists(self.ruta) else None
+        self.compactacion = self._leer_compactacion()
+
+        lineas = []
+        if os.path.exists(self.ruta_indice):
+            with open(self.ruta_indice, 'r', encoding='utf-8') as f:
+                lineas = f.readlines()
+        cabecera = 0
+        if lineas and lineas[0].startswith("#compactacion\t") and lineas[0].endswith("\n"):
+            cabecera = int(lineas.pop(0).split("\t")[1])
+        if cabecera != self.compactacion:
+            lineas = []  # indice de antes de la ultima compactacion: no vale
+
+        entradas = []
+        sin_fecha = []  # lineas de indices antiguos (solo uid, offset, longitud)
+        vistos = set()
+        for linea in lineas:
+            partes = linea.rstrip("\n").split("\t")
+            if not linea.endswith("\n") or len(partes) not in (3, 5):
+                continue  # linea a medio escribir
+            uid, offset, longitud = partes[0], int(partes[1]), int(partes[2])
+            if offset in vistos:
+                continue
+            vistos.add(offset)
+            if len(partes) == 5:
+                entradas.append((uid, offset, longitud, float(partes[3]), partes[4]))
+            else:
+                sin_fecha.append((uid, offset, longitud))
+            self._fin = max(self._fin, offset + longitud)
+
+        if sin_fecha:
+            with open(self.ruta, 'rb') as f:
+                for uid, offset, longitud in sin_fecha:
+                    f.seek(offset)
+                    partida = json.loads(f.read(longitud))["partida"]
+                    entradas.append((uid, offset, longitud, marca_tiempo(partida), partida.get("juego", "")))
+
+        entradas.sort(key=lambda e: e[1])
+        for entrada in entradas:
+            self._indexar(*entrada)
+
+        # Lineas que llegaron al diario pero no al indice (caida entre ambos
+        # appends, o indice descartado): se indexan leyendo el diario
+        nuevas = self._sincronizar(reparar=True)
+        if cabecera != self.compactacion:
+            self._reescribir_indice()
+        elif nuevas:
+            self._anotar_indice(nuevas)
+
+    def _sincronizar(self, reparar=False):
+        """Indexa las lineas escritas tras self._fin (por una caida o por otro proceso).
+        Con reparar=True se recorta una ultima linea incompleta."""
+        if not os.path.exists(self.ruta):
+            return []
+        info = os.stat(self.ruta)
+        if self._inodo is not None and info.st_ino != self._inodo:
+            self._cargar_indice()  # otro proceso ha compactado y sustituido el diario
+            return []
+        self._inodo = info.st_ino
+        if info.st_size <= self._fin:
+            return []
+
+        nuevas = []
+        with open(self.ruta, 'rb') as f:
+            f.seek(self._fin)
+            offset = self._fin
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break  # ultima linea incompleta: se descarta
+                registro = json.loads(linea)
+                if "uid" in registro:  # la cabecera de compactacion no se indexa
+                    partida = registro["partida"]
+                    entrada = (registro["uid"], offset, len(linea), marca_tiempo(partida), partida.get("juego", ""))
+                    nuevas.append(entrada)
+                    self._indexar(*entrada)
+                offset += len(linea)
+
+        if reparar and os.path.getsize(self.ruta) > offset:
+            with open(self.ruta, 'r+b') as f:
+                f.truncate(offset)
+        self._fin = offset
+        return nuevas
+
+    def _indexar(self, uid, offset, longitud, ts, juego):
+        self._indice.setdefault(uid, []).append((offset, longitud))
+        self._entradas[offset] = (uid, offset, longitud, ts, juego)
+        # Casi siempre se añade al final; insort solo desplaza si el reloj retrocedio
+        bisect.insort(self._por_fecha, (ts, offset, longitud))
+        bisect.insort(self._por_juego.setdefault(juego, []), (ts, offset, longitud))
+
+    @staticmethod
+    def _lineas_indice(entradas):
+        return "".join(f"{uid}\t{offset}\t{longitud}\t{ts!r}\t{juego}\n"
+                       for uid, offset, longitud, ts, juego in entradas)
+
+    def _anotar_indice(self, entradas, sincronizar=False):
+        with open(self.ruta_indice, 'a', encoding='utf-8') as f:
+            f.write(self._lineas_indice(entradas))
+            if sincronizar:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _reescribir_indice(self):
+        temporal = self.ruta_indice + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(f"#compactacion\t{self.compactacion}\n")
+            f.write(self._lineas_indice(self._entradas[o] for o in sorted(self._entradas)))
+        os.replace(temporal, self.ruta_indice)
+
+    # --- Escritura ---
+
+    def registrar(self, filas, sincronizar=False):
+        """Recibe tuplas (uid, nombre, partida) en orden cronologico. Todas se
+        escriben con un solo append; con sincronizar=True se hace fsync."""
+        with self._lock:
+            self._sincronizar()
+            bloque = []
+            entradas = []
+            offset = self._fin
+            for uid, nombre, partida in filas:
+                linea = (json.dumps({"uid": str(uid), "usuario": nombre, "partida": partida},
+                                    ensure_ascii=False) + "\n").encode("utf-8")
+                bloque.append(linea)
+                entradas.append((str(uid), offset, len(linea), marca_tiempo(partida), partida.get("juego", "")))
+                offset += len(linea)
+
+            with open(self.ruta, 'ab') as f:
+                f.write(b"".join(bloque))
+                if sincronizar:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._anotar_indice(entradas, sincronizar)
+
+            for entrada in entradas:
+                self._indexar(*entrada)
+            self._fin = offset
+
+    def compactar(self, retener, compactacion, archivar):
+        """Deja en el diario solo las ultimas `retener` partidas de cada usuario.
+
+        Las que salen se entregan antes a archivar(filas), como tuplas (uid,
+        nombre, partida) en orden cronologico. El diario nuevo se escribe
+        aparte y sustituye al actual con os.replace: ese renombrado es el
+        punto de confirmacion y su cabecera lleva el numero `compactacion`.
+        Devuelve cuantas partidas se han retirado.
+        """
+        with self._lock:
+            self._sincronizar()
+            retirar = set()
+            for posiciones in self._indice.values():
+                sobran = len(posiciones) - retener
+                if sobran > 0:
+                    retirar.update(offset for offset, _ in posiciones[:sobran])
+            if not retirar:
+                return 0
+
+            filas = []
+            temporal = self.ruta + ".tmp"
+            with open(self.ruta, 'rb') as origen, open(temporal, 'wb') as destino:
+                destino.write((json.dumps({"compactacion": compactacion}) + "\n").encode("utf-8"))
+                offset = 0
+                for linea in origen:
+                    if offset >= self._fin:
+                        break
+                    if offset in retirar:
+                        registro = json.loads(linea)
+                        filas.append((registro["uid"], registro["usuario"], registro["partida"]))
+                    elif offset in self._entradas:
+                        destino.write(linea)
+                    offset += len(linea)
+
+                archivar(filas)
+
+                # Lo que otro proceso haya añadido mientras tanto se conserva
+                origen.seek(offset)
+                cola = origen.read()
+                destino.write(cola[:cola.rfind(b"\n") + 1])
+                destino.flush()
+                os.fsync(destino.fileno())
+            os.replace(temporal, self.ruta)
+            self._cargar_indice()
+            return len(filas)
+
+    # --- Lectura ---
+
+    def _abrir(self):
+        """Abre el diario con self._lock tomado. Los offsets del indice son de
+        este archivo: si despues un compactar() lo sustituye con os.replace,
+        el descriptor sigue apuntando al diario viejo y la lectura cuadra."""
+        return open(self.ruta, 'rb')
+
+    def numero_compactacion(self):
+        with self._lock:
+            self._sincronizar()
+            return self.compactacion
+
+    def contar(self, uid):
+        with self._lock:
+            self._sincronizar()
+            return len(self._indice.get(str(uid), []))
+
+    def leer(self, uid, limite=None):
+        """Ultimas `limite` partidas del usuario (la mas reciente primero)."""
+        with self._lock:
+            self._sincronizar()
+            posiciones = self._indice.get(str(uid), [])
+            seleccion = posiciones[-limite:] if limite else list(posiciones)
+            if not seleccion:
+                return None
+            f = self._abrir()
+
+        registros = []
+        with f:
+            for offset, longitud in reversed(seleccion):
+                f.seek(offset)
+                registros.append(json.loads(f.read(longitud)))
+
+        return {"usuario": registros[0]["usuario"], "partidas": [r["partida"] for r in registros]}
+
+    def usuarios(self, despues=None, limite=None):
+        """Ids de usuario con partidas en orden, a partir del siguiente a `despues`."""
+        with self._lock:
+            self._sincronizar()
+            uids = sorted(self._indice)
+        inicio = bisect.bisect_right(uids, despues) if despues is not None else 0
+        return uids[inicio:inicio + limite] if limite else uids[inicio:]
+
+    def buscar(self, desde=None, hasta=None, juego=None, resultado=None):
+        """Partidas con desde <= ts < hasta (extremos opcionales), del juego y
+        resultado indicados, en orden cronologico como tuplas (uid, nombre, partida).
+        El rango se localiza con busqueda binaria sobre el indice por tiempo."""
+        with self._lock:
+            self._sincronizar()
+            lista = self._por_juego.get(juego, []) if juego else self._por_fecha
+            inicio = bisect.bisect_left(lista, (desde,)) if desde is not None else 0
+            fin = bisect.bisect_left(lista, (hasta,)) if hasta is not None else len(lista)
+            seleccion = lista[inicio:fin]
+            if not seleccion:
+                return []
+            f = self._abrir()
+
+        filas = []
+        with f:
+            for _, offset, longitud in seleccion:
+                f.seek(offset)
+                registro = json.loads(f.read(longitud))
+                if resultado and registro["partida"].get("resultado") != resultado:
+                    continue
+                filas.append((registro["uid"], registro["usuario"], registro["partida"]))
+        return filas
+
+    def iterar(self):
+        """Recorre el diario completo en orden cronologico sin cargarlo en memoria."""
+        if not os.path.exists(self.ruta):
+            return
+        with open(self.ruta, 'rb') as f:
+            for linea in f:
+                if linea.endswith(b"\n"):
+                    registro = json.loads(linea)
+                    if "uid" in registro:
+                        yield registro
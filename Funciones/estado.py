@@ -0,0 +1,309 @@
+import atexit
+import copy
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from Funciones.configuracion import obtener_seccion
+from Funciones.almacenamiento import obtener_almacen
+from Funciones.bote import combinar_cambios
+
+logger = logging.getLogger(__name__)
+
+MODOS = ("inmediata", "diferida")
+DURABILIDADES = ("lote", "commit")
+
+
+class EstadoCerrado(Exception):
+    """Con durabilidad "commit": el estado se cerro antes de confirmar el cambio."""
+
+
+class EstadoCasino:
+    """Estado de los usuarios en memoria, compartido por todo el proceso.
+
+    Se carga una vez del almacen y las lecturas se sirven desde memoria.
+    Las lecturas devuelven copias y las escrituras guardan una copia despues
+    de confirmar: una apuesta que se aplica sobre el diccionario leido y
+    luego falla al guardarse no deja en memoria un saldo sin confirmar.
+    Como mucho una vez cada `intervalo_verificacion` segundos se compara la
+    version del almacen con la ultima conocida, y si otro proceso (p. ej. la
+    CLI de main.py) ha escrito usuarios se recarga todo.
+
+    Modos de persistencia:
+    - "inmediata": cada escritura va al almacen en el momento (write-through).
+    - "diferida": los usuarios modificados se marcan como sucios y un hilo
+      los vuelca juntos cada `intervalo_vaciado` segundos o al reunir
+      `tamano_lote` usuarios (write-behind).
+
+    Durabilidad:
+    - "lote": quien guarda no espera; cada lote se sincroniza (fsync) al volcarse.
+    - "commit": quien guarda espera a que su cambio este sincronizado en disco.
+      En modo diferido las esperas se agrupan en un mismo fsync (group commit).
+    """
+
+    def __init__(self, almacen, intervalo_verificacion=1.0, modo="inmediata",
+                 intervalo_vaciado=0.05, tamano_lote=200, durabilidad="lote"):
+        if modo not in MODOS:
+            raise ValueError(f"Modo de persistencia desconocido: {modo}")
+        if durabilidad not in DURABILIDADES:
+            raise ValueError(f"Durabilidad desconocida: {durabilidad}")
+
+        self.almacen = almacen
+        self.intervalo_verificacion = intervalo_verificacion
+        self.modo = modo
+        self.intervalo_vaciado = intervalo_vaciado
+        self.tamano_lote = tamano_lote
+        self.durabilidad = durabilidad
+
+        self._lock = threading.RLock()
+        self._usuarios = {}
+        self._version = None
+        self._transiciones = {}
+        self._ultima_verificacion = 0.0
+        self._escribiendo = 0  # escrituras directas al almacen aun sin encadenar
+
+        # Write-behind: usuarios pendientes de volcar y numeracion de lotes
+        self._lock_vaciado = threading.Lock()
+        self._pendientes = threading.Condition()
+        self._sucios = {}
+        self._partidas_pendientes = []
+        self._bote_pendiente = None  # cambios del bote sumados (ver bote.py)
+        self._lote_abierto = 1
+        self._lote_confirmado = 0
+        self._parar = False
+        self._cerrado = False  # cerrar() ya hizo el ultimo volcado
+        self._hilo = None
+
+        self.recargar()
+
+        if self.modo == "diferida":
+            self._hilo = threading.Thread(target=self._bucle_vaciado, name="vaciado-estado", daemon=True)
+            self._hilo.start()
+
+    def recargar(self):
+        # Lo pendiente se vuelca antes para no perderlo al sustituir la copia en memoria
+        self.vaciar()
+        with self._lock:
+            # La version se lee antes: si cambia durante la carga se recargara otra vez
+            self._version = self.almacen.version()
+            self._usuarios = self.almacen.cargar_usuarios()
+            self._transiciones = {}
+            self._ultima_verificacion = time.monotonic()
+
+    def _verificar(self):
+        ahora = time.monotonic()
+        if ahora - self._ultima_verificacion < self.intervalo_verificacion:
+            return
+        # Una escritura propia a medias (ya en el almacen pero sin encadenar
+        # su version) pareceria ajena: el lock de vaciado cubre los volcados
+        # diferidos y _escribiendo las escrituras directas. Con alguna en
+        # curso se deja la comprobacion para la siguiente lectura.
+        with self._lock_vaciado, self._lock:
+            if self._escribiendo:
+                return
+            self._ultima_verificacion = ahora
+            cambiado = self.almacen.version() != self._version
+        if cambiado:
+            try:
+                self.recargar()
+            except Exception:
+                # En modo diferido recargar() vuelca antes lo pendiente; si
+                # falla se sigue sirviendo la memoria y se reintenta despues
+                logger.exception("No se pudo recargar el estado")
+
+    @contextmanager
+    def _escritura_directa(self):
+        """Marca una escritura directa al almacen hasta encadenar su version."""
+        with self._lock:
+            self._escribiendo += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._escribiendo -= 1
+
+    # --- Lecturas (sin E/S salvo la verificacion periodica) ---
+
+    def usuario(self, uid):
+        self._verificar()
+        with self._lock:
+            return copy.deepcopy(self._usuarios.get(str(uid)))
+
+    def usuarios(self):
+        """Copia: se puede recorrer y modificar aunque otro hilo cree usuarios."""
+        self._verificar()
+        with self._lock:
+            return copy.deepcopy(self._usuarios)
+
+    # --- Escrituras ---
+
+    def guardar_usuarios(self, usuarios):
+        if self.modo == "diferida":
+            self._marcar_sucios(usuarios)
+            return
+
+        # La escritura en el almacen se hace fuera del lock del estado para
+        # que usuarios distintos no se esperen entre si (ver bloqueos.py)
+        with self._escritura_directa():
+            anterior, nueva = self.almacen.guardar_usuarios(
+                usuarios, sincronizar=self.durabilidad == "commit"
+            )
+            with self._lock:
+                for uid, datos in usuarios.items():
+                    self._usuarios[str(uid)] = copy.deepcopy(datos)
+                self._encadenar_version(anterior, nueva)
+
+    def guardar_usuario(self, uid, datos):
+        self.guardar_usuarios({str(uid): datos})
+
+    def crear_usuario(self, uid, datos):
+        """Inserta un usuario nuevo si su id no existe. Devuelve False si ya
+        existia. Va directo al almacen tambien en modo diferido: la
+        comprobacion y la insercion tienen que ser una sola operacion."""
+        uid = str(uid)
+        with self._lock:
+            if uid in self._usuarios:
+                return False
+        with self._escritura_directa():
+            versiones = self.almacen.crear_usuario(uid, datos, sincronizar=self.durabilidad == "commit")
+            if versiones is None:
+                return False
+            with self._lock:
+                self._usuarios[uid] = copy.deepcopy(datos)
+                self._encadenar_version(*versiones)
+        return True
+
+    def confirmar(self, usuarios, partidas, bote=None):
+        """Guarda usuarios, partidas y cambios del bote juntos (ver
+        unidad_trabajo.py). En modo diferido viajan en el mismo lote del volcado."""
+        if self.modo == "diferida":
+            self._marcar_sucios(usuarios, partidas, bote)
+            return
+
+        with self._escritura_directa():
+            anterior, nueva = self.almacen.confirmar(
+                usuarios, partidas, sincronizar=self.durabilidad == "commit", bote=bote
+            )
+            with self._lock:
+                for uid, datos in usuarios.items():
+                    self._usuarios[str(uid)] = copy.deepcopy(datos)
+                if usuarios:
+                    self._encadenar_version(anterior, nueva)
+
+    def _encadenar_version(self, anterior, nueva):
+        # Las escrituras propias pueden terminar en cualquier orden: se
+        # encadenan las transiciones de version. Si queda un hueco es que
+        # escribio otro proceso y _verificar() recargara.
+        self._transiciones[anterior] = nueva
+        while self._version in self._transiciones:
+            self._version = self._transiciones.pop(self._version)
+
+    # --- Write-behind ---
+
+    def _marcar_sucios(self, usuarios, partidas=(), bote=None):
+        with self._lock:
+            for uid, datos in usuarios.items():
+                self._usuarios[str(uid)] = copy.deepcopy(datos)
+
+        with self._pendientes:
+            # Copia del registro: el volcado no debe ver una apuesta a medio aplicar
+            for uid, datos in usuarios.items():
+                self._sucios[str(uid)] = copy.deepcopy(datos)
+            self._partidas_pendientes.extend(partidas)
+            self._bote_pendiente = combinar_cambios(self._bote_pendiente, bote)
+            lote = self._lote_abierto
+            if self.durabilidad == "commit" or self._pendientes_volcar() >= self.tamano_lote:
+                self._pendientes.notify_all()
+            if self.durabilidad == "commit":
+                # Al cerrar se espera al ultimo volcado: si tampoco entra, el cambio no esta en disco
+                self._pendientes.wait_for(lambda: self._lote_confirmado >= lote or self._cerrado)
+                if self._lote_confirmado < lote:
+                    raise EstadoCerrado("El estado se cerró sin llegar a guardar el cambio")
+
+    def _bucle_vaciado(self):
+        while True:
+            with self._pendientes:
+                self._pendientes.wait_for(
+                    lambda: self._parar or self._pendientes_volcar() >= self.tamano_lote
+                    or (self.durabilidad == "commit" and self._pendientes_volcar() > 0),
+                    timeout=self.intervalo_vaciado,
+                )
+                if self._parar:
+                    return
+            try:
+                self.vaciar()
+            except Exception:
+                # Los usuarios vuelven a la cola y se reintenta en el siguiente ciclo
+                logger.exception("No se pudo volcar el estado")
+                time.sleep(self.intervalo_vaciado)
+
+    def _pendientes_volcar(self):
+        return len(self._sucios) + len(self._partidas_pendientes) + (self._bote_pendiente is not None)
+
+    def vaciar(self):
+        """Escribe en el almacen todos los usuarios sucios, las partidas
+        pendientes y los cambios del bote en una sola operacion."""
+        with self._lock_vaciado:
+            with self._pendientes:
+                if not self._pendientes_volcar():
+                    return
+                lote = self._lote_abierto
+                sucios, self._sucios = self._sucios, {}
+                partidas, self._partidas_pendientes = self._partidas_pendientes, []
+                bote, self._bote_pendiente = self._bote_pendiente, None
+                self._lote_abierto += 1
+
+            try:
+                anterior, nueva = self.almacen.confirmar(sucios, partidas, sincronizar=True, bote=bote)
+            except Exception:
+                # Sin pisar cambios que hayan llegado mientras tanto
+                with self._pendientes:
+                    for uid, datos in sucios.items():
+                        self._sucios.setdefault(uid, datos)
+                    self._partidas_pendientes[:0] = partidas
+                    self._bote_pendiente = combinar_cambios(bote, self._bote_pendiente)
+                raise
+
+            if sucios:
+                with self._lock:
+                    self._encadenar_version(anterior, nueva)
+
+            with self._pendientes:
+                self._lote_confirmado = lote
+                self._pendientes.notify_all()
+
+    def cerrar(self):
+        """Detiene el hilo de vaciado y vuelca lo pendiente (apagado limpio)."""
+        with self._pendientes:
+            self._parar = True
+            self._pendientes.notify_all()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        try:
+            self.vaciar()
+        finally:
+            with self._pendientes:
+                self._cerrado = True
+                self._pendientes.notify_all()
+
+
+_estado = None
+
+def obtener_estado():
+    """Estado compartido del proceso, creado la primera vez que se pide."""
+    global _estado
+    if _estado is None:
+        config = obtener_seccion("almacenamiento")
+        persistencia = obtener_seccion("persistencia")
+        _estado = EstadoCasino(
+            obtener_almacen(),
+            intervalo_verificacion=config.get("intervalo_verificacion", 1.0),
+            modo=persistencia.get("modo", "inmediata"),
+            intervalo_vaciado=persistencia.get("intervalo_vaciado", 0.05),
+            tamano_lote=persistencia.get("tamano_lote", 200),
+            durabilidad=persistencia.get("durabilidad", "lote"),
+        )
+        atexit.register(_estado.cerrar)
+    return _estado
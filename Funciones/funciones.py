@@ -1,13 +1,15 @@
-import random
 import json
 from datetime import datetime
 
+from Funciones.identificadores import nuevo_id_usuario
+from Funciones.seguridad import es_hash, hashear_contrasena, verificar_contrasena
+
 class Usuario:
     def __init__(self, nombre, contrasena, fecha_nacimiento, id_usuario=None, fichas=100, fecha_reg=None, stats=None):
         self.nombre = nombre
         self.contrasena = contrasena
         self.fecha_nacimiento = fecha_nacimiento
-        self.id = id_usuario if id_usuario else str(random.randint(1000, 9999))
+        self.id = id_usuario if id_usuario else nuevo_id_usuario()
         self._fichas = fichas
         self.fecha_registro = fecha_reg if fecha_reg else datetime.now().strftime("%d/%m/%Y %H:%M:%S")
         self.stats = stats if stats else {
@@ -58,10 +60,7 @@ def crear_usuario(usuarios_db, nombre, contrasena):
         print(f"Acceso denegado: Tienes {edad} años. Solo mayores de 18.")
         return usuarios_db
 
-    while True:
-        nuevo_user = Usuario(nombre, contrasena, fecha_nac)
-        if nuevo_user.id not in usuarios_db:
-            break
+    nuevo_user = Usuario(nombre, hashear_contrasena(contrasena), fecha_nac)
     
     usuarios_db[nuevo_user.id] = nuevo_user.to_dict()
     print(f"\nUsuario creado: {nuevo_user.nombre}")
@@ -69,9 +68,16 @@ def crear_usuario(usuarios_db, nombre, contrasena):
     print(f"Registro: {nuevo_user.fecha_registro}")
     return usuarios_db
 
-def iniciar_sesion(usuarios_db, usuario_id, contrasena):
+def iniciar_sesion(usuarios_db, usuario_id, contrasena, guardar_datos=None):
+    """Comprueba la contraseña. Si estaba en texto plano la pasa a hash y,
+    con `guardar_datos`, la guarda."""
     if usuario_id in usuarios_db:
-        if usuarios_db[usuario_id]["contrasena"] == contrasena:
+        if verificar_contrasena(usuarios_db[usuario_id]["contrasena"], contrasena):
+            # Las contraseñas antiguas en texto plano pasan a hash al entrar
+            if not es_hash(usuarios_db[usuario_id]["contrasena"]):
+                usuarios_db[usuario_id]["contrasena"] = hashear_contrasena(contrasena)
+                if guardar_datos is not None:
+                    guardar_datos(usuarios_db)
             print(f"\n¡Hola de nuevo, {usuarios_db[usuario_id]['nombre']}!")
             return True
         print("\nContraseña incorrecta.")
@@ -1,39 +1,149 @@
+"""Gacha de chistes con rarezas, pity y tirada multiple.
+
+Los chistes y el peso de cada rareza se leen una sola vez de
+`gacha.ruta_chistes` (base_data/chistes.json); la ultima rareza es la mas
+alta. La rareza de cada tirada se sortea con un MuestreoPonderado
+precalculado y despues se elige un chiste de esa rareza.
+
+Cada usuario guarda en `usuarios[uid]["gacha"]`:
+
+* pity: tiradas seguidas sin la rareza mas alta. Al llegar a `gacha.pity`
+  la siguiente tirada la garantiza.
+* vistos: bitset (en hexadecimal) con un bit por chiste ya recibido, para
+  no repetir chistes sin recorrer el historial. Cuando se han visto todos
+  los de una rareza se vuelven a poner en juego.
+
+Como el saldo, ese estado se lee del usuario releido dentro de
+bloqueo_usuario y se escribe en el mismo registro, asi que dos tiradas
+seguidas no pierden el pity ni los chistes vistos de la otra.
+"""
 import random
 
+from Funciones.bloqueos import bloqueo_usuario
+from Funciones.configuracion import obtener_seccion
+from Funciones.persistencia_json import cargar_json
+from juegos.muestreo import MuestreoPonderado
+
+
+class MotorChistes:
+    """Reglas del gacha, sin estado: se crea una vez y se comparte."""
+
+    def __init__(self, rarezas, costo=5, pity=40, tirada_multiple=10):
+        """`rarezas` es una lista de {"nombre", "peso", "chistes"}, de la mas
+        comun a la mas rara."""
+        self.costo = costo  # Coste por chiste
+        self.pity = pity
+        self.tirada_multiple = tirada_multiple
+        self.rarezas = tuple(r["nombre"] for r in rarezas)
+        self.maxima = self.rarezas[-1]
+        self.muestreo = MuestreoPonderado({r["nombre"]: r["peso"] for r in rarezas})
+
+        # Todos los chistes en una tupla; cada rareza es un rango de indices
+        self.chistes = tuple(c for r in rarezas for c in r["chistes"])
+        self.indices = {chiste: i for i, chiste in enumerate(self.chistes)}
+        self.rareza_de = tuple(r["nombre"] for r in rarezas for _ in r["chistes"])
+        self.por_rareza = {}
+        self.mascaras = {}
+        inicio = 0
+        for r in rarezas:
+            fin = inicio + len(r["chistes"])
+            if fin == inicio:
+                raise ValueError(f"La rareza {r['nombre']} no tiene chistes")
+            self.por_rareza[r["nombre"]] = range(inicio, fin)
+            self.mascaras[r["nombre"]] = ((1 << fin) - 1) ^ ((1 << inicio) - 1)
+            inicio = fin
+
+    @classmethod
+    def desde_archivo(cls, ruta, **opciones):
+        return cls(cargar_json(ruta)["rarezas"], **opciones)
+
+    def _rareza(self, sorteada, pity):
+        if self.pity and pity + 1 >= self.pity:
+            return self.maxima
+        return sorteada
+
+    def _chiste(self, rareza, vistos, rng):
+        """Elige un chiste no visto de `rareza`. Devuelve (indice, vistos)."""
+        mascara = self.mascaras[rareza]
+        if vistos & mascara == mascara:
+            vistos &= ~mascara  # Ya los ha visto todos: vuelven a salir
+        candidatos = [self.chistes[i] for i in self.por_rareza[rareza] if not vistos >> i & 1]
+        indice = self.indices[rng.choice(candidatos)]
+        return indice, vistos | 1 << indice
+
+    def resolver_varias(self, n, estado, rng=random):
+        """Resuelve `n` tiradas seguidas a partir del estado del usuario
+        ({"pity", "vistos"}). Devuelve (tiradas, estado nuevo); cada tirada
+        es {"chiste", "rareza"}."""
+        pity = estado.get("pity", 0)
+        vistos = int(estado.get("vistos", "0"), 16)
+        tiradas = []
+        for sorteada in self.muestreo.muestrear_lote(n, rng):
+            indice, vistos = self._chiste(self._rareza(sorteada, pity), vistos, rng)
+            rareza = self.rareza_de[indice]
+            pity = 0 if rareza == self.maxima else pity + 1
+            tiradas.append({"chiste": self.chistes[indice], "rareza": rareza})
+        return tiradas, {"pity": pity, "vistos": format(vistos, "x")}
+
+    def resolver(self, estado, rng=random):
+        tiradas, estado = self.resolver_varias(1, estado, rng)
+        return tiradas[0], estado
+
+
+_config = obtener_seccion("gacha")
+motor_chistes = MotorChistes.desde_archivo(
+    _config.get("ruta_chistes", "base_data/chistes.json"),
+    costo=_config.get("costo", 5),
+    pity=_config.get("pity", 40),
+    tirada_multiple=_config.get("tirada_multiple", 10),
+)
+
+
 class GachaChistes:
-    def __init__(self, usuarios, uid, guardar_datos):
+    def __init__(self, usuarios, uid, guardar_datos, motor=motor_chistes, cargar_datos=None):
         self.usuarios = usuarios
         self.uid = str(uid)
         self.guardar_datos = guardar_datos
-        self.costo = 5  # Coste por chiste
-        
-        self.lista_chistes = [
-            "¿Qué hace una abeja en el gimnasio? ¡Zumba!",
-            "¿Cómo se dice pañuelo en japonés? Saka-moko.",
-            "¿Qué le dice un jaguar a otro jaguar? Jaguar you?",
-            "¿Cómo se queda un mago después de comer? Magordi.",
-            "¿Cuál es el café más peligroso del mundo? El ex-preso.",
-            "¿Por qué los pájaros no usan Facebook? Porque ya tienen Twitter.",
-            "¿Qué hace un perro con un taladro? Ta-drando.",
-            "¿Cómo se dice 'perdí el autobús' en alemán? Suban-estrujen-bajen.",
-            "¿Qué le dice una impresora a otra? ¿Esa copia es tuya o es impresión mía?",
-            "¿Por qué el libro de matemáticas se suicidó? Porque tenía muchos problemas."
-        ]
+        # Opcional: cargar_datos(uid) -> {uid: datos}, para releer el usuario dentro del bloqueo
+        self.cargar_datos = cargar_datos
+        self.motor = motor
+        self.costo = motor.costo
 
-    def tirar_gacha(self):
-        """Lógica para cobrar fichas y devolver un chiste aleatorio"""
-        if self.usuarios[self.uid]["fichas"] < self.costo:
-            return {"error": "Fichas insuficientes", "costo": self.costo}
+    def _tirar(self, n):
+        """Cobra `n` chistes, los resuelve y guarda una sola vez."""
+        costo = self.costo * n
+        with bloqueo_usuario(self.uid):
+            # Releer dentro del bloqueo: una apuesta liquidada justo antes no se pisa
+            if self.cargar_datos is not None:
+                self.usuarios = self.cargar_datos(self.uid)
+            if self.uid not in self.usuarios:
+                return {"error": "Usuario no encontrado"}
+            usuario = self.usuarios[self.uid]
+            if usuario["fichas"] < costo:
+                return {"error": "Fichas insuficientes", "costo": costo}
 
-        self.usuarios[self.uid]["fichas"] -= self.costo
-        
-        chiste = random.choice(self.lista_chistes)
+            tiradas, estado = self.motor.resolver_varias(n, usuario.get("gacha", {}), random)
+            usuario["fichas"] -= costo
+            usuario["gacha"] = estado
 
-        self.guardar_datos(self.usuarios)
+            self.guardar_datos(self.usuarios)
 
         return {
             "resultado": "éxito",
-            "chiste": chiste,
-            "costo": self.costo,
-            "fichas_restantes": self.usuarios[self.uid]["fichas"]
-        }
\ No newline at end of file
+            "tiradas": tiradas,
+            "costo": costo,
+            "pity": estado["pity"],
+            "fichas_restantes": usuario["fichas"]
+        }
+
+    def tirar_gacha(self):
+        """Lógica para cobrar fichas y devolver un chiste aleatorio"""
+        resultado = self._tirar(1)
+        if "error" in resultado:
+            return resultado
+        tirada = resultado.pop("tiradas")[0]
+        return {**resultado, "chiste": tirada["chiste"], "rareza": tirada["rareza"]}
+
+    def tirar_varias(self):
+        """Tirada múltiple: `motor.tirada_multiple` chistes con un solo cobro y un solo guardado."""
+        return self._tirar(self.motor.tirada_multiple)
@@ -1,35 +1,20 @@
-import json
-import os
 from datetime import datetime
 
-HISTORIAL_PATH = "base_data/historial.json"
-
-def cargar_json(ruta):
-    if not os.path.exists(ruta):
-        return {}
-    try:
-        with open(ruta, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return {}
-
-def guardar_json(ruta, datos):
-    os.makedirs(os.path.dirname(ruta), exist_ok=True)
-    with open(ruta, 'w', encoding='utf-8') as f:
-        json.dump(datos, f, indent=4, ensure_ascii=False)
-
-def registrar_partida(user_id, nombre, juego, apuesta, detalles, resultado, ganancia, antes, despues):
-    historial = cargar_json(HISTORIAL_PATH)
-    user_id = str(user_id)
+from Funciones.persistencia_json import cargar_json, guardar_json
+from Funciones.almacenamiento import obtener_almacen
+from Funciones.diario import FORMATO_FECHA
 
-    if user_id not in historial:
-        historial[user_id] = {
-            "usuario": nombre,
-            "partidas": []
-        }
+HISTORIAL_PATH = "base_data/historial.json"
 
+def registrar_partida(user_id, nombre, juego, apuesta, detalles, resultado, ganancia, antes, despues, unidad=None,
+                      extra=None):
+    """Con `unidad` (ver unidad_trabajo.py) la partida queda pendiente y se
+    guarda junto al saldo al confirmar; sin ella se escribe en el momento.
+    `extra` añade campos a la partida (p. ej. el flujo aleatorio usado)."""
+    ahora = datetime.now()
     nueva_entrada = {
-        "fecha": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+        "fecha": ahora.strftime(FORMATO_FECHA),
+        "ts": ahora.timestamp(),
         "juego": juego,
         "apuesta": apuesta,
         "detalles": detalles,
@@ -38,29 +23,32 @@ def registrar_partida(user_id, nombre, juego, apuesta, detalles, resultado, gana
         "fichas_antes": antes,
         "fichas_despues": despues
     }
+    if extra:
+        nueva_entrada.update(extra)
 
-    historial[user_id]["partidas"].insert(0, nueva_entrada)
-    historial[user_id]["partidas"] = historial[user_id]["partidas"][:5]
-
-    guardar_json(HISTORIAL_PATH, historial)
+    if unidad is not None:
+        unidad.registrar_partida(user_id, nombre, nueva_entrada)
+    else:
+        obtener_almacen().registrar_partida(str(user_id), nombre, nueva_entrada)
 
-def obtener_historial_usuario(user_id):
-    historial = cargar_json(HISTORIAL_PATH)
-    user_id = str(user_id)
+def obtener_historial_usuario(user_id, limite=5):
+    """Devuelve las ultimas `limite` partidas del usuario (None = todas)."""
+    almacen = obtener_almacen()
+    info = almacen.obtener_partidas(str(user_id), limite=limite)
 
-    if user_id not in historial:
+    if info is None:
         return None
 
-    partidas = historial[user_id]["partidas"]
+    partidas = info["partidas"]
     
     stats = {
-        "partidas_totales": len(partidas),
+        "partidas_totales": almacen.contar_partidas(str(user_id)),
         "fichas_actuales": partidas[0]["fichas_despues"] if partidas else 0
     }
 
     return {
-        "usuario": historial[user_id]["usuario"],
+        "usuario": info["usuario"],
         "fichas_actuales": stats["fichas_actuales"],
         "stats": stats,
         "ultimas_partidas": partidas 
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+
+from Funciones.configuracion import obtener_seccion
+
+# 2024-01-01 00:00:00 UTC en milisegundos: deja ~69 años de margen en 41 bits
+EPOCA_MS = 1704067200000
+
+BITS_NODO = 10
+BITS_SECUENCIA = 12
+MAX_NODO = (1 << BITS_NODO) - 1
+MAX_SECUENCIA = (1 << BITS_SECUENCIA) - 1
+
+# 63 bits caben en 19 cifras; con ancho fijo el orden de texto es el de creacion
+ANCHO_ID = 19
+
+
+class NodoNoDisponible(Exception):
+    """No se ha podido reservar un numero de nodo para generar IDs."""
+
+
+class GeneradorIds:
+    """IDs de usuario unicos y ordenables por tiempo (estilo Snowflake).
+
+    Cada ID junta los milisegundos desde EPOCA_MS, un numero de nodo y un
+    contador dentro del mismo milisegundo. Generar uno es O(1) y no hace
+    falta consultar los usuarios existentes. Dos procesos no chocan mientras
+    tengan nodos distintos: si no se configura `identificadores.nodo`, cada
+    proceso pide uno al almacen con `asignar()` (un contador compartido), asi
+    que solo se repite un nodo tras 1024 arranques. Si no se puede obtener
+    se lanza NodoNoDisponible en vez de generar IDs que podrian chocar.
+
+    Aun asi la creacion de usuarios inserta solo si el id no existe (ver
+    crear_usuario() en almacenamiento.py).
+
+    Los IDs de 4 cifras de versiones anteriores siguen siendo claves validas;
+    simplemente no se vuelven a generar.
+    """
+
+    def __init__(self, nodo=None, asignar=None):
+        if nodo is not None and not 0 <= nodo <= MAX_NODO:
+            raise ValueError(f"El nodo debe estar entre 0 y {MAX_NODO}")
+        self._nodo_fijo = nodo
+        self._asignar = asignar
+        self._pid = None
+        self._nodo = None
+        self._ultimo_ms = -1
+        self._secuencia = 0
+        self._lock = threading.Lock()
+
+    def _nodo_actual(self):
+        # Tras un fork el hijo hereda el generador: necesita su propio nodo
+        pid = os.getpid()
+        if pid != self._pid:
+            if self._nodo_fijo is not None:
+                self._nodo = self._nodo_fijo
+            elif self._asignar is None:
+                raise NodoNoDisponible("Sin nodo configurado ni forma de asignarlo")
+            else:
+                try:
+                    self._nodo = self._asignar() & MAX_NODO
+                except Exception as e:
+                    raise NodoNoDisponible(f"No se pudo asignar un nodo: {e}") from e
+            self._pid = pid
+            self._ultimo_ms = -1
+        return self._nodo
+
+    def reservar_nodo(self):
+        """Obtiene ya el nodo de este proceso (para fallar al arrancar y no en el primer ID)."""
+        with self._lock:
+            return self._nodo_actual()
+
+    def siguiente(self):
+        with self._lock:
+            nodo = self._nodo_actual()
+            # Si el reloj retrocede se sigue desde el ultimo milisegundo usado
+            ms = max(int(time.time() * 1000) - EPOCA_MS, self._ultimo_ms)
+            if ms == self._ultimo_ms:
+                self._secuencia += 1
+                if self._secuencia > MAX_SECUENCIA:
+                    # Contador agotado: se toma prestado el milisegundo siguiente
+                    ms += 1
+                    self._secuencia = 0
+            else:
+                self._secuencia = 0
+            self._ultimo_ms = ms
+            valor = (ms << (BITS_NODO + BITS_SECUENCIA)) | (nodo << BITS_SECUENCIA) | self._secuencia
+        return str(valor).zfill(ANCHO_ID)
+
+
+def descomponer_id(id_usuario):
+    """(milisegundos desde epoch, nodo, secuencia) de un ID generado, o None
+    si es un ID heredado de 4 cifras."""
+    if len(id_usuario) != ANCHO_ID or not id_usuario.isdigit():
+        return None
+    valor = int(id_usuario)
+    return (
+        (valor >> (BITS_NODO + BITS_SECUENCIA)) + EPOCA_MS,
+        (valor >> BITS_SECUENCIA) & MAX_NODO,
+        valor & MAX_SECUENCIA,
+    )
+
+
+def _nodo_del_almacen():
+    from Funciones.almacenamiento import obtener_almacen
+    return obtener_almacen().asignar_nodo()
+
+
+generador_ids = GeneradorIds(obtener_seccion("identificadores").get("nodo"), asignar=_nodo_del_almacen)
+
+def nuevo_id_usuario():
+    return generador_ids.siguiente()
+
+
+# Rondas de la mesa y carreras mutuas: mismo formato y mismo nodo del
+# proceso, pero su propia secuencia, separada de la de usuarios.
+generador_rondas = GeneradorIds(obtener_seccion("identificadores").get("nodo"), asignar=generador_ids.reservar_nodo)
+
+def nuevo_id_ronda():
+    return generador_rondas.siguiente()
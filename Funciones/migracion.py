@@ -0,0 +1,47 @@
+"""Migracion puntual entre backends de almacenamiento: usuarios, historial,
+bote, contador de nodos y sesiones revocadas.
+
+Si la API ya abrio la base SQLite e importo los JSON heredados, migrar de
+json a sqlite no hace nada.
+
+Uso:
+    python -m Funciones.migracion json sqlite
+    python -m Funciones.migracion sqlite json --forzar
+"""
+import argparse
+
+from Funciones.almacenamiento import crear_almacen, migrar
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Migra usuarios e historial entre backends")
+    parser.add_argument("origen", choices=["json", "sqlite"])
+    parser.add_argument("destino", choices=["json", "sqlite"])
+    parser.add_argument("--forzar", action="store_true", help="Migrar aunque el destino tenga datos")
+    args = parser.parse_args(argumentos)
+
+    if args.origen == args.destino:
+        parser.error("El origen y el destino deben ser distintos")
+
+    # Sin la importacion automatica: la migracion la hace este comando
+    origen = crear_almacen(args.origen, importar_legado=False)
+    destino = crear_almacen(args.destino, importar_legado=False)
+    try:
+        resumen = migrar(origen, destino, forzar=args.forzar)
+    except ValueError as e:
+        print(f"Error: {e}. Usa --forzar para continuar.")
+        return 1
+    finally:
+        origen.cerrar()
+        destino.cerrar()
+
+    if resumen["ya_migrado"]:
+        print(f"El backend {args.destino} ya tiene los datos de {args.origen}: no hay nada que migrar.")
+        return 0
+    print(f"Migrados {resumen['usuarios']} usuarios y {resumen['partidas']} partidas "
+          f"de {args.origen} a {args.destino}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
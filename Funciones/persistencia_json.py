@@ -0,0 +1,23 @@
+import json
+import os
+
+def cargar_json(ruta):
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return {}
+
+def guardar_json(ruta, datos, sincronizar=False):
+    """Escribe en un temporal y lo renombra, asi nunca queda un JSON a medias.
+    Con sincronizar=True hace fsync antes del renombrado."""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = ruta + ".tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=4, ensure_ascii=False)
+        if sincronizar:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temporal, ruta)
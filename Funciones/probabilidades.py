@@ -0,0 +1,157 @@
+"""Probabilidades exactas, RTP y varianza de cada apuesta.
+
+A diferencia de simulacion.py aqui no se muestrea: se recorre el espacio
+completo de resultados de cada juego (6x6 tiradas, 37 casillas, las
+ventanas distintas de cada rodillo, tabla de caballos) con fracciones
+exactas, usando las reglas de pago de los motores de juego
+(juegos/motores.py). Solo una tragamonedas con mas de MAX_TIRADAS
+combinaciones de ventanas se estima con MUESTRAS tiradas al azar; su
+resumen lleva "exacto": False.
+
+Sin `apuesta` los multiplicadores son por ficha, sin redondeo. Los premios
+fraccionarios de la tragamonedas se pagan redondeados a la baja a fichas
+enteras (ver liquidacion.aplicar_apuesta()), asi que con apuestas pequeñas
+el RTP real es menor: calcular_odds(juego, apuesta) lo calcula para esa
+apuesta.
+
+El resultado se memoriza por configuracion: la clave incluye las tablas de
+pago del motor, asi que si se sustituye por otro con pagos distintos se
+recalcula y si no la consulta es un acceso a diccionario.
+"""
+import random
+from collections import Counter
+from fractions import Fraction
+from functools import lru_cache
+from itertools import product
+from math import prod
+
+from juegos.motores import MOTORES
+
+MAX_TIRADAS = 2_000_000
+MUESTRAS = 200_000
+
+
+class Muestra(Counter):
+    """Distribucion estimada con tiradas al azar en vez de recorrida entera."""
+
+# ══════════════════════════════════════════════════════════════
+# DISTRIBUCIONES DE PAGO: {multiplicador: probabilidad}
+# ══════════════════════════════════════════════════════════════
+
+def _distribucion_dados(motor):
+    caras = range(1, motor.caras + 1)
+    casos = Counter(motor.pagos[motor.resolver_duelo(j, b)] for j, b in product(caras, repeat=2))
+    return {"duelo": casos}
+
+
+def _distribucion_ruleta(motor):
+    # Todas las apuestas de un tipo cubren el mismo numero de casillas y pagan igual
+    distribuciones = {}
+    for tipo in motor.TIPOS:
+        apuesta = motor.ejemplo(tipo)
+        distribuciones[tipo] = Counter(motor.calcular_multiplicador(apuesta, bola) for bola in motor.numeros)
+    return distribuciones
+
+
+def _distribucion_tragamonedas(motor):
+    # Cada parada de cada rodillo es equiprobable, pero paradas con la misma
+    # ventana dan el mismo resultado: se evalua una parada por ventana
+    # distinta y pesa tanto como paradas la muestran
+    tabla = motor.tabla
+    rodillos = []
+    for ventanas in tabla.ventanas:
+        paradas = {}
+        for parada, ventana in enumerate(ventanas):
+            paradas.setdefault(ventana, []).append(parada)
+        rodillos.append([(p[0], len(p)) for p in paradas.values()])
+
+    if prod(len(r) for r in rodillos) > MAX_TIRADAS:
+        rng = random.Random(0)
+        casos = Muestra()
+        for _ in range(MUESTRAS):
+            casos[tabla.evaluar([rng.randrange(n) for n in tabla.longitudes])[0]] += 1
+        return {"tirada": casos}
+
+    casos = Counter()
+    for eleccion in product(*rodillos):
+        casos[tabla.evaluar([parada for parada, _ in eleccion])[0]] += prod(n for _, n in eleccion)
+    return {"tirada": casos}
+
+
+def _distribucion_carreras(motor):
+    distribuciones = {}
+    for eleccion, caballo in motor.caballos.items():
+        # Pesos enteros (porcentajes): el Counter se normaliza al final
+        casos = Counter()
+        for ganador, datos in motor.caballos.items():
+            casos[caballo["mult"] if ganador == eleccion else 0] += datos["prob"]
+        distribuciones[eleccion] = casos
+    return distribuciones
+
+
+DISTRIBUCIONES = {
+    "dados": _distribucion_dados,
+    "ruleta": _distribucion_ruleta,
+    "tragamonedas": _distribucion_tragamonedas,
+    "carreras": _distribucion_carreras,
+}
+
+# ══════════════════════════════════════════════════════════════
+# RESUMEN
+# ══════════════════════════════════════════════════════════════
+
+def pagado(multiplicador, apuesta):
+    """Multiplicador que se cobra de verdad con `apuesta` fichas: los
+    fraccionarios se redondean a la baja a fichas enteras."""
+    if isinstance(multiplicador, Fraction) and multiplicador.denominator != 1:
+        return Fraction(int(apuesta * multiplicador), apuesta)
+    return multiplicador
+
+
+def resumir(casos, apuesta=None):
+    """RTP, varianza y probabilidades de una distribucion {multiplicador: peso}.
+    Con `apuesta` los multiplicadores son los que se cobran con esa apuesta."""
+    total = sum(casos.values())
+    probabilidades = Counter()
+    for mult, peso in casos.items():
+        if peso:
+            probabilidades[mult if apuesta is None else pagado(mult, apuesta)] += Fraction(peso, total)
+    rtp = sum(mult * p for mult, p in probabilidades.items())
+    varianza = sum(mult * mult * p for mult, p in probabilidades.items()) - rtp * rtp
+    acierto = sum(p for mult, p in probabilidades.items() if mult > 1)
+    resumen = {
+        "rtp": float(rtp),
+        "rtp_exacto": str(rtp),
+        "ventaja_casa": float(1 - rtp),
+        "varianza": float(varianza),
+        "prob_acierto": float(acierto),
+        "distribucion": [
+            {"multiplicador": mult if isinstance(mult, int) else float(mult), "probabilidad": float(p), "exacta": str(p)}
+            for mult, p in sorted(probabilidades.items())
+        ],
+    }
+    if isinstance(casos, Muestra):
+        resumen["exacto"] = False
+        resumen["muestras"] = total
+    return resumen
+
+
+@lru_cache(maxsize=32)
+def _calcular(juego, configuracion, apuesta):
+    motor = MOTORES[juego]
+    return {
+        "juego": juego,
+        "apuestas": {eleccion: resumir(casos, apuesta)
+                     for eleccion, casos in DISTRIBUCIONES[juego](motor).items()},
+    }
+
+
+def calcular_odds(juego, apuesta=None):
+    """Probabilidades exactas de todas las apuestas del juego, por ficha o
+    para una apuesta de `apuesta` fichas. El diccionario devuelto se
+    comparte entre llamadas: no debe modificarse."""
+    if juego not in DISTRIBUCIONES:
+        raise KeyError(juego)
+    if apuesta is not None and apuesta <= 0:
+        raise ValueError("La apuesta debe ser positiva")
+    return _calcular(juego, MOTORES[juego].configuracion(), apuesta)
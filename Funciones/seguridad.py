@@ -0,0 +1,206 @@
+"""Contraseñas con hash y sal, y sesiones con token firmado.
+
+Las contraseñas se guardan como "pbkdf2_sha256$iteraciones$sal$hash". El
+coste sale de `seguridad.salt_rounds` con la misma escala que bcrypt: cada
+ronda dobla las iteraciones (2**salt_rounds * 100 de PBKDF2-SHA256). Las
+contraseñas heredadas en texto plano se siguen aceptando y se pasan a hash
+la primera vez que el usuario inicia sesion.
+
+Como ese hash es lento a proposito, solo se calcula al iniciar sesion.
+El login devuelve un token firmado con HMAC-SHA256 (uid, caducidad y un
+valor aleatorio) y las siguientes peticiones se comprueban contra una
+cache en memoria de sesiones. Las entradas caducan con el token y las mas
+antiguas se descartan al llenarse la cache. Si el token no esta en la cache
+(otro proceso, reinicio) se comprueba la firma y se añade.
+
+Cerrar sesion no depende de la cache: el valor aleatorio del token se anota
+en un conjunto aparte de sesiones revocadas, que solo pierde entradas
+cuando caducan, y en el almacen (ver revocar_sesion() en
+almacenamiento.py), que lo comparten todos los procesos y sobrevive a un
+reinicio. verificar() comprueba el conjunto en memoria; solo pregunta al
+almacen por un token que no estaba en la cache, y cada
+`intervalo_revocaciones` segundos recarga de el las revocaciones de otros
+procesos. Un cierre de sesion en otro proceso tarda como mucho ese
+intervalo en llegar a los tokens que este ya tenia en la cache.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from Funciones.aleatoriedad import leer_o_crear_secreto
+from Funciones.configuracion import obtener_seccion
+
+ALGORITMO = "pbkdf2_sha256"
+
+
+# ══════════════════════════════════════════════════════════════
+# CONTRASEÑAS
+# ══════════════════════════════════════════════════════════════
+
+def _iteraciones(rondas):
+    return 2 ** rondas * 100
+
+def hashear_contrasena(contrasena, rondas=None):
+    if rondas is None:
+        rondas = obtener_seccion("seguridad").get("salt_rounds", 10)
+    iteraciones = _iteraciones(rondas)
+    sal = secrets.token_hex(16)
+    resumen = hashlib.pbkdf2_hmac("sha256", contrasena.encode(), bytes.fromhex(sal), iteraciones)
+    return f"{ALGORITMO}${iteraciones}${sal}${resumen.hex()}"
+
+def es_hash(guardada):
+    return isinstance(guardada, str) and guardada.startswith(ALGORITMO + "$")
+
+def verificar_contrasena(guardada, contrasena):
+    """Compara `contrasena` con la guardada (hash o texto plano heredado) en tiempo constante."""
+    if guardada is None or contrasena is None:
+        return False
+    if not es_hash(guardada):
+        return hmac.compare_digest(str(guardada).encode(), contrasena.encode())
+    _, iteraciones, sal, resumen = guardada.split("$")
+    calculado = hashlib.pbkdf2_hmac("sha256", contrasena.encode(), bytes.fromhex(sal), int(iteraciones))
+    return hmac.compare_digest(calculado.hex(), resumen)
+
+
+# ══════════════════════════════════════════════════════════════
+# SESIONES
+# ══════════════════════════════════════════════════════════════
+
+def _b64(datos):
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode()
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+class Sesiones:
+    def __init__(self, secreto, ttl=3600, max_sesiones=100_000, reloj=time.time, almacen=None,
+                 intervalo_revocaciones=5):
+        """Con `almacen` las sesiones revocadas se guardan en el y se
+        comparten con otros procesos; sin el solo viven en memoria."""
+        self.secreto = secreto.encode() if isinstance(secreto, str) else secreto
+        self.ttl = ttl
+        self.max_sesiones = max_sesiones
+        self.reloj = reloj
+        self.almacen = almacen
+        self.intervalo_revocaciones = intervalo_revocaciones
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # token -> (uid, caduca, valor aleatorio)
+        self._revocadas = OrderedDict()  # valor aleatorio del token -> caduca
+        self._recargadas = reloj()  # ultima recarga de las revocaciones del almacen
+
+    def _firma(self, cuerpo):
+        return _b64(hmac.new(self.secreto, cuerpo.encode(), hashlib.sha256).digest())
+
+    def emitir(self, uid):
+        """Token nuevo para `uid`. Devuelve (token, caduca)."""
+        caduca = int(self.reloj()) + self.ttl
+        nonce = secrets.token_hex(8)
+        cuerpo = _b64(f"{uid}:{caduca}:{nonce}".encode())
+        token = f"{cuerpo}.{self._firma(cuerpo)}"
+        self._guardar(token, (str(uid), caduca, nonce))
+        return token, caduca
+
+    def verificar(self, token):
+        """uid del token, o None si no es valido, ha caducado o se revoco."""
+        ahora = self.reloj()
+        with self._lock:
+            entrada = self._cache.get(token)
+        en_cache = entrada is not None
+        if not en_cache:
+            # No esta en la cache: se comprueba la firma
+            entrada = self._leer(token)
+        uid, caduca, nonce = entrada
+        if uid is None or ahora >= caduca or self._revocada(nonce, ahora, en_cache):
+            return None
+        if not en_cache:
+            self._guardar(token, entrada)
+        return uid
+
+    def revocar(self, token):
+        """Cierra la sesion: el token queda anulado hasta que caduque."""
+        uid, caduca, nonce = self._leer(token)
+        if uid is None:
+            return
+        ahora = self.reloj()
+        with self._lock:
+            self._cache.pop(token, None)
+            self._anotar_revocadas({nonce: caduca}, ahora)
+        if self.almacen is not None:
+            self.almacen.revocar_sesion(nonce, caduca, ahora)
+
+    def _revocada(self, nonce, ahora, en_cache):
+        if self.almacen is not None:
+            if not en_cache:
+                # Token nuevo para este proceso: se pregunta al almacen por el
+                if self.almacen.sesion_revocada(nonce):
+                    return True
+            elif ahora - self._recargadas >= self.intervalo_revocaciones:
+                self._recargar_revocadas(ahora)
+        with self._lock:
+            return nonce in self._revocadas
+
+    def _recargar_revocadas(self, ahora):
+        with self._lock:
+            if ahora - self._recargadas < self.intervalo_revocaciones:
+                return  # Otro hilo ya las ha recargado
+            self._recargadas = ahora
+        revocadas = self.almacen.sesiones_revocadas(ahora)
+        with self._lock:
+            self._anotar_revocadas(revocadas, ahora)
+
+    def _anotar_revocadas(self, revocadas, ahora):
+        # Con self._lock tomado. Ordenadas por caducidad: las primeras caducan antes
+        todas = {**self._revocadas, **revocadas}
+        self._revocadas = OrderedDict(sorted(
+            ((n, c) for n, c in todas.items() if c > ahora), key=lambda item: item[1]))
+
+    def _leer(self, token):
+        """(uid, caduca, valor aleatorio) de un token bien firmado, o (None, 0, None)."""
+        try:
+            cuerpo, firma = token.split(".")
+            if not hmac.compare_digest(firma, self._firma(cuerpo)):
+                return None, 0, None
+            uid, caduca, nonce = _de_b64(cuerpo).decode().split(":")
+            return uid, int(caduca), nonce
+        except (ValueError, UnicodeDecodeError):
+            return None, 0, None
+
+    def _guardar(self, token, entrada):
+        ahora = self.reloj()
+        with self._lock:
+            self._cache[token] = entrada
+            self._cache.move_to_end(token)
+            # Las primeras son las mas antiguas: fuera las caducadas y lo que sobre
+            while self._cache:
+                primero, (_, caduca_primero, _) = next(iter(self._cache.items()))
+                if caduca_primero > ahora and len(self._cache) <= self.max_sesiones:
+                    break
+                del self._cache[primero]
+
+    def __len__(self):
+        return len(self._cache)
+
+
+_sesiones = None
+_lock_sesiones = threading.Lock()
+
+def obtener_sesiones():
+    """Sesiones compartidas por el proceso, creadas la primera vez que se piden."""
+    global _sesiones
+    with _lock_sesiones:
+        if _sesiones is None:
+            from Funciones.almacenamiento import obtener_almacen
+            config = obtener_seccion("seguridad")
+            _sesiones = Sesiones(
+                leer_o_crear_secreto(config.get("ruta_secreto", "base_data/secreto_sesion")),
+                ttl=config.get("ttl_sesion", 3600),
+                max_sesiones=config.get("max_sesiones", 100_000),
+                almacen=obtener_almacen(),
+                intervalo_revocaciones=config.get("intervalo_revocaciones", 5),
+            )
+    return _sesiones
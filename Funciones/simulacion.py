@@ -0,0 +1,243 @@
+"""Simulacion Monte Carlo del RTP (retorno al jugador) de cada juego.
+
+Cada juego tiene un kernel NumPy que reproduce sus reglas de resultado y
+pago para millones de rondas de golpe. Las rondas se reparten en bloques
+entre un pool de procesos, cada bloque con su propio flujo aleatorio, y
+solo se devuelven sumas (no los resultados), asi que la memoria no depende
+del numero de rondas.
+
+comprobar_kernel() contrasta con una prueba chi-cuadrado la distribucion de
+pagos del kernel con la del motor real del juego (juegos/motores.py).
+
+Uso:
+    python -m Funciones.simulacion
+    python -m Funciones.simulacion ruleta --rondas 500000000 --procesos 8
+    python -m Funciones.simulacion dados --comprobar
+"""
+import argparse
+import math
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from juegos.motores import MOTORES, Apuesta
+
+NUMERO_PLENO = 17  # todos los numeros tienen la misma probabilidad; se usa uno fijo
+Z_95 = 1.959963984540054
+
+# ══════════════════════════════════════════════════════════════
+# KERNELS: devuelven lo que recupera el jugador por cada ficha apostada
+# ══════════════════════════════════════════════════════════════
+
+def _kernel_dados(rng, n, apuesta):
+    jugador = rng.integers(1, 7, n)
+    banca = rng.integers(1, 7, n)
+    # Gana x2, empate devuelve la apuesta, pierde 0
+    return np.where(jugador > banca, 2.0, np.where(jugador == banca, 1.0, 0.0))
+
+
+def _kernel_ruleta(rng, n, apuesta):
+    bola = rng.integers(0, 37, n)
+    if apuesta == "1":
+        return np.where(bola == NUMERO_PLENO, 36.0, 0.0)
+    if apuesta == "2":
+        return np.where((bola != 0) & (bola % 2 == 0), 2.0, 0.0)
+    return np.where(bola % 2 == 1, 2.0, 0.0)
+
+
+def _kernel_tragamonedas(rng, n, apuesta):
+    tabla = MOTORES["tragamonedas"].tabla
+    paradas = rng.integers(0, tabla.longitudes, (n, len(tabla.longitudes)))
+    return tabla.evaluar_numpy(paradas)
+
+
+def _kernel_carreras(rng, n, apuesta):
+    motor = MOTORES["carreras"]
+    ganador = motor.muestreo.indices_numpy(rng, n)
+    elegido = motor.muestreo.valores.index(apuesta)
+    return np.where(ganador == elegido, float(motor.caballos[apuesta]["mult"]), 0.0)
+
+
+KERNELS = {
+    "dados": (_kernel_dados, ["duelo"]),
+    "ruleta": (_kernel_ruleta, ["1", "2", "3"]),  # pleno, rojo (pares), negro (impares)
+    "tragamonedas": (_kernel_tragamonedas, ["tirada"]),
+    "carreras": (_kernel_carreras, ["1", "2", "3", "4"]),  # caballo elegido
+}
+
+
+def apuestas(juego):
+    return list(KERNELS[juego][1])
+
+# ══════════════════════════════════════════════════════════════
+# CODIGO ESCALAR DE REFERENCIA (los motores del juego)
+# ══════════════════════════════════════════════════════════════
+
+def _ronda_escalar(juego, apuesta):
+    """Resuelve una ronda con el motor real y devuelve lo recuperado por ficha."""
+    if juego == "ruleta":
+        resultado = MOTORES[juego].resolver(Apuesta(1, apuesta, NUMERO_PLENO), random)
+    elif juego == "carreras":
+        resultado = MOTORES[juego].resolver(Apuesta(1, eleccion=apuesta), random)
+    else:
+        resultado = MOTORES[juego].resolver(Apuesta(1), random)
+    return float(resultado.multiplicador) if resultado.gano else 0
+
+# ══════════════════════════════════════════════════════════════
+# SIMULACION
+# ══════════════════════════════════════════════════════════════
+
+def _simular_bloque(juego, apuesta, n, semilla):
+    kernel = KERNELS[juego][0]
+    pagos = kernel(np.random.default_rng(semilla), n, apuesta)
+    return n, float(pagos.sum()), float(np.square(pagos).sum()), int(np.count_nonzero(pagos > 1))
+
+
+def simular(juego, apuesta, rondas=10_000_000, procesos=None, tamano_bloque=1_000_000, semilla=None):
+    """RTP, varianza, tasa de acierto (rondas con ganancia neta) e intervalo
+    de confianza al 95 % para `rondas` rondas de una apuesta de 1 ficha."""
+    if juego not in KERNELS or apuesta not in KERNELS[juego][1]:
+        raise ValueError(f"Apuesta desconocida: {juego}/{apuesta}")
+
+    tamanos = [tamano_bloque] * (rondas // tamano_bloque)
+    if rondas % tamano_bloque:
+        tamanos.append(rondas % tamano_bloque)
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    tareas = [(juego, apuesta, n, s) for n, s in zip(tamanos, semillas)]
+
+    if procesos == 1 or len(tareas) == 1:
+        parciales = [_simular_bloque(*t) for t in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            parciales = list(pool.map(_simular_bloque, *zip(*tareas)))
+
+    n = sum(p[0] for p in parciales)
+    suma = sum(p[1] for p in parciales)
+    suma_cuadrados = sum(p[2] for p in parciales)
+    aciertos = sum(p[3] for p in parciales)
+
+    rtp = suma / n
+    varianza = (suma_cuadrados - suma * suma / n) / (n - 1) if n > 1 else 0.0
+    margen = Z_95 * math.sqrt(varianza / n)
+    return {
+        "juego": juego,
+        "apuesta": apuesta,
+        "rondas": n,
+        "rtp": rtp,
+        "ventaja_casa": 1 - rtp,
+        "varianza": varianza,
+        "desviacion": math.sqrt(varianza),
+        "tasa_acierto": aciertos / n,
+        "ic95": (rtp - margen, rtp + margen),
+    }
+
+# ══════════════════════════════════════════════════════════════
+# PRUEBA CHI-CUADRADO KERNEL vs CODIGO ESCALAR
+# ══════════════════════════════════════════════════════════════
+
+def _gamma_superior_regularizada(a, x):
+    """Q(a, x) = Gamma(a, x) / Gamma(a) (serie o fraccion continua)."""
+    if x <= 0:
+        return 1.0
+    log_prefijo = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        termino = suma = 1.0 / a
+        k = a
+        for _ in range(1000):
+            k += 1
+            termino *= x / k
+            suma += termino
+            if abs(termino) < abs(suma) * 1e-15:
+                break
+        return 1.0 - suma * math.exp(log_prefijo)
+    # Fraccion continua de Lentz
+    diminuto = 1e-300
+    b = x + 1 - a
+    c = 1 / diminuto
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = diminuto if abs(d) < diminuto else d
+        c = b + an / c
+        c = diminuto if abs(c) < diminuto else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefijo) * h
+
+
+def chi2_p_valor(estadistico, grados_libertad):
+    return _gamma_superior_regularizada(grados_libertad / 2, estadistico / 2)
+
+
+def comprobar_kernel(juego, apuesta, rondas=20_000, semilla=None, alfa=0.001):
+    """Compara la distribucion de pagos del kernel y del motor real con una
+    prueba chi-cuadrado de homogeneidad. Las categorias con frecuencia
+    esperada menor que 5 se agrupan."""
+    random.seed(semilla)
+    escalar = Counter(_ronda_escalar(juego, apuesta) for _ in range(rondas))
+    kernel = Counter(KERNELS[juego][0](np.random.default_rng(semilla), rondas, apuesta).tolist())
+
+    categorias = sorted(set(escalar) | set(kernel))
+    total = 2 * rondas
+    filas, resto = [], [0, 0]
+    for categoria in categorias:
+        observados = [escalar.get(categoria, 0), kernel.get(categoria, 0)]
+        if sum(observados) * rondas / total < 5:
+            resto = [resto[0] + observados[0], resto[1] + observados[1]]
+        else:
+            filas.append(observados)
+    if sum(resto):
+        filas.append(resto)
+
+    estadistico = 0.0
+    for observados in filas:
+        esperado = sum(observados) * rondas / total
+        estadistico += sum((o - esperado) ** 2 / esperado for o in observados)
+    grados_libertad = max(len(filas) - 1, 1)
+    p_valor = chi2_p_valor(estadistico, grados_libertad)
+    return {
+        "juego": juego,
+        "apuesta": apuesta,
+        "estadistico": estadistico,
+        "grados_libertad": grados_libertad,
+        "p_valor": p_valor,
+        "coincide": p_valor >= alfa,
+    }
+
+# ══════════════════════════════════════════════════════════════
+# CLI
+# ══════════════════════════════════════════════════════════════
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Simula el RTP de los juegos del casino")
+    parser.add_argument("juego", nargs="?", choices=list(KERNELS), help="Por defecto, todos")
+    parser.add_argument("--rondas", type=int, default=10_000_000)
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--semilla", type=int, default=None)
+    parser.add_argument("--comprobar", action="store_true", help="Prueba chi-cuadrado contra el codigo real")
+    args = parser.parse_args(argumentos)
+
+    for juego in [args.juego] if args.juego else list(KERNELS):
+        for apuesta in apuestas(juego):
+            r = simular(juego, apuesta, args.rondas, args.procesos, semilla=args.semilla)
+            print(f"{juego:<13} {apuesta:<6} RTP {r['rtp']:.5f} "
+                  f"[{r['ic95'][0]:.5f}, {r['ic95'][1]:.5f}]  "
+                  f"var {r['varianza']:.3f}  aciertos {r['tasa_acierto']:.4f}")
+            if args.comprobar:
+                c = comprobar_kernel(juego, apuesta, semilla=args.semilla)
+                estado = "OK" if c["coincide"] else "NO COINCIDE"
+                print(f"{'':<20} chi2 {c['estadistico']:.2f} (gl {c['grados_libertad']}) "
+                      f"p={c['p_valor']:.4f} {estado}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,52 @@
+from Funciones.bote import combinar_cambios
+
+
+class UnidadDeTrabajo:
+    """Reune los cambios de una operacion (saldos, partidas y bote) para
+    confirmarlos juntos en una sola escritura.
+
+    gestionar_apuesta marca el usuario modificado y registrar_partida
+    añade la partida; nada toca el disco hasta confirmar(), que entrega todo
+    a `confirmar_cambios(usuarios, partidas, bote)` de una vez.
+    """
+
+    def __init__(self, confirmar_cambios):
+        self._confirmar_cambios = confirmar_cambios
+        self.usuarios = {}
+        self.partidas = []
+        self.bote = None
+        self._al_fallar = []
+
+    def marcar_usuario(self, uid, datos):
+        self.usuarios[str(uid)] = datos
+
+    def registrar_partida(self, uid, nombre, partida):
+        self.partidas.append((str(uid), nombre, partida))
+
+    def marcar_bote(self, cambios, deshacer=None):
+        """Cambios del bote (ver bote.py) que se guardan con lo demas. Si la
+        confirmacion falla se llama a deshacer()."""
+        self.bote = combinar_cambios(self.bote, cambios)
+        if deshacer is not None:
+            self._al_fallar.append(deshacer)
+
+    def pendiente(self):
+        return bool(self.usuarios or self.partidas or self.bote)
+
+    def confirmar(self):
+        if self.pendiente():
+            try:
+                self._confirmar_cambios(self.usuarios, self.partidas, self.bote)
+            except Exception:
+                for deshacer in reversed(self._al_fallar):
+                    deshacer()
+                self.bote = None
+                self._al_fallar = []
+                raise
+        self.descartar()
+
+    def descartar(self):
+        self.usuarios = {}
+        self.partidas = []
+        self.bote = None
+        self._al_fallar = []
@@ -0,0 +1,266 @@
+"""Verificador de historial: vuelve a jugar cada partida y compara.
+
+Para cada partida con flujo aleatorio guardado (ver aleatoriedad.py) se
+recalcula el resultado con el motor del juego y se vuelve a liquidar sobre
+fichas_antes; resultado, ganancia, fichas_despues y detalles deben
+coincidir con lo registrado. Las partidas antiguas sin flujo solo se
+comprueban aritmeticamente, igual que los ingresos del banco (juego "banco",
+apuesta 0), que no son apuestas.
+
+Las partidas se leen en streaming (del almacen o de un archivo NDJSON, tambien
+.gz) y se reparten por usuario entre varios procesos, de modo que las de un
+mismo usuario se verifican en orden. El resultado es un informe con las
+discrepancias encontradas.
+
+Uso:
+    python -m Funciones.verificacion
+    python -m Funciones.verificacion --archivo base_data/historial.jsonl --procesos 4
+    python -m Funciones.verificacion --archivo base_data/historial.json --salida informe.json
+"""
+import argparse
+import gzip
+import json
+import multiprocessing
+import zlib
+
+from Funciones.aleatoriedad import ServicioAleatorio, obtener_aleatoriedad, reproducir_resultado
+from Funciones.funciones import gestionar_apuesta
+from juegos.liquidacion import aplicar_apuesta, clasificar_resultado
+
+TAMANO_BLOQUE = 1000
+
+# ══════════════════════════════════════════════════════════════
+# VERIFICACION DE UNA PARTIDA
+# ══════════════════════════════════════════════════════════════
+
+def _liquidar_de_nuevo(partida, gano, multiplicador):
+    """(resultado, ganancia, fichas_despues) que deberia haberse guardado."""
+    apuesta, antes = partida["apuesta"], partida["fichas_antes"]
+    usuarios = {"v": {"fichas": antes, "stats": {"partidas_totales": 0}}}
+    despues = aplicar_apuesta(gestionar_apuesta, usuarios, "v", apuesta, partida["juego"],
+                              gano, multiplicador)["v"]["fichas"]
+    # Premio del bote progresivo cobrado con la apuesta
+    despues += partida.get("bote", 0)
+    return (*clasificar_resultado(antes, despues), despues)
+
+
+def _verificar_deposito(partida):
+    """Un ingreso del banco (juego "banco", apuesta 0) no se juega: solo se
+    comprueba que suma `ganancia` fichas al saldo."""
+    antes, ganancia = partida["fichas_antes"], partida.get("ganancia")
+    problemas = []
+    if not isinstance(ganancia, int) or ganancia <= 0:
+        problemas.append(("ganancia", "> 0", ganancia))
+    else:
+        for campo, valor in (("resultado", "gano"), ("fichas_despues", antes + ganancia)):
+            if partida.get(campo) != valor:
+                problemas.append((campo, valor, partida.get(campo)))
+    return problemas, False
+
+
+def verificar_partida(partida, servicio):
+    """Lista de (campo, esperado, registrado) que no coinciden. Devuelve
+    tambien si la partida se ha podido reproducir con su flujo."""
+    problemas = []
+    apuesta, antes = partida.get("apuesta"), partida.get("fichas_antes")
+    if apuesta is None or antes is None or "fichas_despues" not in partida:
+        return [("partida", "apuesta, fichas_antes y fichas_despues", "incompleta")], False
+    if partida.get("juego") == "banco" and apuesta == 0:
+        return _verificar_deposito(partida)
+    if not 0 < apuesta <= antes:
+        problemas.append(("apuesta", f"0 < apuesta <= {antes}", apuesta))
+
+    reproducido = reproducir_resultado(partida, servicio)
+    if reproducido is not None:
+        esperado = _liquidar_de_nuevo(partida, reproducido.gano, reproducido.multiplicador)
+        if reproducido.detalles != partida.get("detalles"):
+            problemas.append(("detalles", reproducido.detalles, partida.get("detalles")))
+    else:
+        # Sin flujo el multiplicador no se conoce: solo se comprueba que
+        # resultado y ganancia cuadran con los saldos y que no se cobro menos de 0
+        despues = partida["fichas_despues"]
+        esperado = (*clasificar_resultado(antes, despues), despues)
+        if despues < antes - apuesta:
+            problemas.append(("fichas_despues", f">= {antes - apuesta}", despues))
+
+    for campo, valor in zip(("resultado", "ganancia", "fichas_despues"), esperado):
+        if partida.get(campo) != valor:
+            problemas.append((campo, valor, partida.get(campo)))
+    return problemas, reproducido is not None
+
+# ══════════════════════════════════════════════════════════════
+# VERIFICACION POR PARTICION
+# ══════════════════════════════════════════════════════════════
+
+class Verificador:
+    """Acumula el informe de las partidas de una particion de usuarios."""
+
+    def __init__(self, servicio, limite=100):
+        self.servicio = servicio
+        self.limite = limite
+        self.partidas = 0
+        self.reproducidas = 0
+        self.saltos_saldo = 0  # saldo distinto entre partidas seguidas (depositos, gacha, ...)
+        self.total_discrepancias = 0
+        self.discrepancias = []
+        self._ultimo_saldo = {}
+
+    def verificar(self, filas):
+        for uid, partida in filas:
+            self.partidas += 1
+            problemas, reproducida = verificar_partida(partida, self.servicio)
+            self.reproducidas += reproducida
+
+            anterior = self._ultimo_saldo.get(uid)
+            if anterior is not None and anterior != partida.get("fichas_antes"):
+                self.saltos_saldo += 1
+            self._ultimo_saldo[uid] = partida.get("fichas_despues")
+
+            self.total_discrepancias += len(problemas)
+            for campo, esperado, registrado in problemas:
+                if len(self.discrepancias) < self.limite:
+                    self.discrepancias.append({
+                        "uid": uid, "fecha": partida.get("fecha"), "juego": partida.get("juego"),
+                        "campo": campo, "esperado": esperado, "registrado": registrado,
+                    })
+
+    def informe(self):
+        return {
+            "partidas": self.partidas,
+            "reproducidas": self.reproducidas,
+            "sin_flujo": self.partidas - self.reproducidas,
+            "usuarios": len(self._ultimo_saldo),
+            "saltos_saldo": self.saltos_saldo,
+            "total_discrepancias": self.total_discrepancias,
+            "discrepancias": self.discrepancias,
+        }
+
+
+def _trabajador(semilla, limite, entrada, salida):
+    verificador = Verificador(ServicioAleatorio(semilla), limite)
+    for filas in iter(entrada.get, None):
+        verificador.verificar(filas)
+    salida.put(verificador.informe())
+
+
+def _unir(informes, limite):
+    total = {"partidas": 0, "reproducidas": 0, "sin_flujo": 0, "usuarios": 0,
+             "saltos_saldo": 0, "total_discrepancias": 0, "discrepancias": []}
+    for informe in informes:
+        for clave in total:
+            if clave != "discrepancias":
+                total[clave] += informe[clave]
+        total["discrepancias"].extend(informe["discrepancias"])
+    total["discrepancias"] = total["discrepancias"][:limite]
+    total["correcto"] = total["total_discrepancias"] == 0
+    return total
+
+
+def verificar(filas, procesos=None, limite=100, servicio=None):
+    """Verifica las partidas de `filas`, un iterable de (uid, nombre, partida)
+    en orden cronologico. Con procesos=1 se hace en este mismo proceso."""
+    servicio = servicio or obtener_aleatoriedad()
+    procesos = procesos or multiprocessing.cpu_count()
+
+    if procesos == 1:
+        verificador = Verificador(servicio, limite)
+        bloque = []
+        for uid, _, partida in filas:
+            bloque.append((str(uid), partida))
+            if len(bloque) >= TAMANO_BLOQUE:
+                verificador.verificar(bloque)
+                bloque = []
+        verificador.verificar(bloque)
+        return _unir([verificador.informe()], limite)
+
+    # Un proceso por particion: las partidas de un usuario siempre van al
+    # mismo y en orden. Las colas acotadas evitan leerlo todo en memoria.
+    contexto = multiprocessing.get_context()
+    salida = contexto.Queue()
+    entradas = [contexto.Queue(maxsize=4) for _ in range(procesos)]
+    trabajadores = [
+        contexto.Process(target=_trabajador, args=(servicio.semilla, limite, entrada, salida), daemon=True)
+        for entrada in entradas
+    ]
+    for trabajador in trabajadores:
+        trabajador.start()
+
+    bloques = [[] for _ in range(procesos)]
+    try:
+        for uid, _, partida in filas:
+            particion = zlib.crc32(str(uid).encode("utf-8")) % procesos
+            bloques[particion].append((str(uid), partida))
+            if len(bloques[particion]) >= TAMANO_BLOQUE:
+                entradas[particion].put(bloques[particion])
+                bloques[particion] = []
+        for entrada, bloque in zip(entradas, bloques):
+            if bloque:
+                entrada.put(bloque)
+    finally:
+        for entrada in entradas:
+            entrada.put(None)
+    informes = [salida.get() for _ in trabajadores]
+    for trabajador in trabajadores:
+        trabajador.join()
+    return _unir(informes, limite)
+
+# ══════════════════════════════════════════════════════════════
+# LECTURA DE ARCHIVOS
+# ══════════════════════════════════════════════════════════════
+
+def leer_archivo(ruta):
+    """Partidas (uid, nombre, partida) de un archivo, sin cargarlo entero si es
+    NDJSON (diario historial.jsonl, segmentos de archivo .ndjson.gz o la
+    exportacion de /jugadas?formato=ndjson). El historial.json heredado se
+    carga completo."""
+    abrir = gzip.open if ruta.endswith(".gz") else open
+    with abrir(ruta, 'rt', encoding='utf-8') as f:
+        primero = f.read(1)
+        f.seek(0)
+        if ruta.endswith(".json") and primero == "{":
+            # Formato heredado: {uid: {"usuario", "partidas" (la mas reciente primero)}}
+            for uid, info in json.load(f).items():
+                for partida in reversed(info.get("partidas", [])):
+                    yield uid, info.get("usuario"), partida
+            return
+        for linea in f:
+            if not linea.strip():
+                continue
+            registro = json.loads(linea)
+            if "partida" in registro:
+                # El diario usa "uid"; la exportacion de /jugadas, "id"
+                yield registro.get("uid", registro.get("id")), registro.get("usuario"), registro["partida"]
+
+# ══════════════════════════════════════════════════════════════
+# CLI
+# ══════════════════════════════════════════════════════════════
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Verifica el historial volviendo a jugar cada partida")
+    parser.add_argument("--archivo", help="NDJSON, .ndjson.gz o historial.json; por defecto el almacen configurado")
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--limite", type=int, default=100, help="Discrepancias que se detallan en el informe")
+    parser.add_argument("--salida", help="Guarda el informe completo en este archivo JSON")
+    args = parser.parse_args(argumentos)
+
+    if args.archivo:
+        filas = leer_archivo(args.archivo)
+    else:
+        from Funciones.almacenamiento import obtener_almacen
+        filas = obtener_almacen().iterar_partidas()
+
+    informe = verificar(filas, args.procesos, args.limite)
+    print(f"Partidas: {informe['partidas']} ({informe['reproducidas']} reproducidas, "
+          f"{informe['sin_flujo']} sin flujo) de {informe['usuarios']} usuarios")
+    print(f"Discrepancias: {informe['total_discrepancias']}")
+    for d in informe["discrepancias"]:
+        print(f"  {d['uid']} {d['fecha']} {d['juego']}: {d['campo']} esperado {d['esperado']!r}, "
+              f"registrado {d['registrado']!r}")
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
+    return 0 if informe["correcto"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,30 +1,83 @@
-from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import Optional, List
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import base64
+import bisect
 import json
 import os
+import zlib
 
 # Importaciones de módulos de lógica
 from Funciones.historial import cargar_json, guardar_json, obtener_historial_usuario, registrar_partida
+from Funciones.aleatoriedad import obtener_aleatoriedad
+from Funciones.almacenamiento import obtener_almacen
+from Funciones.asincrono import asincrono, cerrar_ejecutor
+from Funciones.archivo import AlmacenConArchivo
+from Funciones.configuracion import obtener_seccion
+from Funciones.diario import FORMATO_FECHA
+from Funciones.estado import obtener_estado
+from Funciones.bloqueos import bloqueo_usuario
+from Funciones.bote import obtener_bote
+from Funciones.unidad_trabajo import UnidadDeTrabajo
 from Funciones.funciones import gestionar_apuesta, Usuario, calcular_edad
+from Funciones.identificadores import generador_ids
 from Funciones.gacha import GachaChistes
+from Funciones.probabilidades import calcular_odds
+from Funciones.seguridad import es_hash, hashear_contrasena, obtener_sesiones, verificar_contrasena
 
 # Importaciones de los juegos (Versión API)
-from juegos.dados_api import JuegoDadosAPI
-from juegos.carreras_api import JuegoCarrerasAPI
-from juegos.ruleta_api import JuegoRuletaAPI
-from juegos.traga_monedas_api import JuegoTragaMonedasAPI
+from juegos.apuestas_mutuas import HipodromoMutuo
+from juegos.liquidacion import FichasInsuficientes, Liquidacion
+from juegos.mesa_ruleta import MesaLlena, MesaRuleta
+from juegos.planificador import PlanificadorRondas
+from juegos.motores import MOTORES, Apuesta
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    # Sin nodo propio los IDs podrian chocar con los de otro proceso: no se arranca
+    generador_ids.reservar_nodo()
+    # Las partidas que exceden la retencion pasan al archivo en segundo plano
+    if isinstance(almacen, AlmacenConArchivo):
+        almacen.iniciar_compactacion(obtener_seccion("retencion").get("intervalo_compactacion", 3600))
+    if obtener_seccion("mesa_ruleta").get("activa", True):
+        planificador_mesa.iniciar()
+    if obtener_seccion("apuestas_mutuas").get("activa", True):
+        planificador_hipodromo.iniciar()
+    # Las aportaciones al bote de cada hilo se suman al bote central cada poco
+    if liquidacion.bote is not None:
+        liquidacion.bote.iniciar_consolidacion(obtener_seccion("bote").get("intervalo_consolidacion", 1.0))
+    yield
+    await planificador_mesa.detener()
+    await planificador_hipodromo.detener()
+    if liquidacion.bote is not None:
+        liquidacion.bote.detener_consolidacion()
+    # Las escrituras que sigan en los hilos del almacen terminan antes del volcado final
+    cerrar_ejecutor()
+    # Apagado limpio: se vuelca lo que quede pendiente en modo diferido
+    estado.cerrar()
+    if isinstance(almacen, AlmacenConArchivo):
+        almacen.detener_compactacion()
 
 app = FastAPI(
     title="Casino CancinHub API", 
     description="Backend profesional para el Casino Virtual. ¡Zawa Zawa!",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=ciclo_de_vida
 )
 
-# RUTAS DE ARCHIVOS
+# RUTAS DE ARCHIVOS (backend JSON heredado)
 DB_PATH = "base_data/users.json"
 DB_PATH_HISTORIAL = "base_data/historial.json"
 
+# Backend de almacenamiento seleccionado en config.json (sqlite o json)
+almacen = obtener_almacen()
+
+# Usuarios en memoria: se cargan una vez al arrancar y se escriben en el almacen al cambiar
+estado = obtener_estado()
+
 # --- MODELOS DE DATOS (PYDANTIC) ---
 
 class DatosApuesta(BaseModel):
@@ -35,8 +88,30 @@ class DatosApuesta(BaseModel):
 class DatosApuestaRuleta(BaseModel):
     user_id: str
     monto: int
-    tipo_apuesta: str  # "1": Pleno, "2": Rojo, "3": Negro
+    tipo_apuesta: str  # "1": Pleno, "2": Pares, "3": Impares, o pleno, caballo, calle, docena, rojo...
     numero: Optional[int] = None
+    numeros: Optional[List[int]] = None  # numeros cubiertos; docena y columna: 1-3
+
+class ApuestaBoleto(BaseModel):
+    monto: int
+    tipo_apuesta: str
+    numero: Optional[int] = None
+    numeros: Optional[List[int]] = None
+
+class BoletoRuleta(BaseModel):
+    user_id: str
+    apuestas: List[ApuestaBoleto] = Field(..., min_length=1, max_length=200)
+
+class ApuestaLote(BaseModel):
+    monto: int
+    eleccion: Optional[str] = "1"       # carreras
+    tipo_apuesta: Optional[str] = None  # ruleta
+    numero: Optional[int] = None        # ruleta, pleno
+    numeros: Optional[List[int]] = None # ruleta, resto de apuestas
+
+class LoteApuestas(BaseModel):
+    user_id: str
+    apuestas: List[ApuestaLote] = Field(..., min_length=1, max_length=1000)
 
 class CrearUsuarioRequest(BaseModel):
     nombre: str
@@ -45,23 +120,108 @@ class CrearUsuarioRequest(BaseModel):
 
 class AgregarFichasRequest(BaseModel):
     user_id: str
-    contrasena: str
+    contrasena: Optional[str] = None  # sin token de sesion
     cantidad: int
 
+class IniciarSesionRequest(BaseModel):
+    user_id: str
+    contrasena: str
+
 # --- FUNCIONES DE UTILIDAD INTERNA ---
 
-def cargar_db_usuarios():
-    return cargar_json(DB_PATH)
+def cargar_db_usuarios(user_id=None):
+    """Sin user_id devuelve todos los usuarios; con user_id solo ese usuario.
+    Se sirve desde el estado en memoria, sin tocar el disco."""
+    if user_id is None:
+        return estado.usuarios()
+    datos = estado.usuario(user_id)
+    return {user_id: datos} if datos is not None else {}
 
 def guardar_db_usuarios(datos):
-    guardar_json(DB_PATH, datos)
+    """Inserta o actualiza los usuarios recibidos (memoria y almacen)."""
+    estado.guardar_usuarios(datos)
+
+def crear_db_usuario(user_id, datos):
+    """Inserta el usuario solo si el id está libre (False si ya existía)."""
+    return estado.crear_usuario(user_id, datos)
+
+def confirmar_db(usuarios, partidas, bote=None):
+    """Guarda saldos, partidas y cambios del bote juntos: o quedan todos o ninguno."""
+    estado.confirmar(usuarios, partidas, bote)
 
 def cargar_db_historial():
-    return cargar_json(DB_PATH_HISTORIAL)
+    return almacen.cargar_historial()
+
+# Una sola liquidacion para todas las peticiones. Las funciones se buscan al
+# llamar (así los tests pueden sustituirlas)
+liquidacion = Liquidacion(
+    lambda *a: gestionar_apuesta(*a),
+    lambda datos: guardar_db_usuarios(datos),
+    lambda uid: cargar_db_usuarios(uid),
+    lambda usuarios, partidas, bote=None: confirmar_db(usuarios, partidas, bote),
+    bote=obtener_bote(),
+)
+
+# Mesa de ruleta compartida: un giro por ronda para todos los jugadores
+_config_mesa = obtener_seccion("mesa_ruleta")
+mesa_ruleta = MesaRuleta(
+    liquidacion,
+    segundos_ronda=_config_mesa.get("segundos_ronda", 30),
+    max_apuestas=_config_mesa.get("max_apuestas", 10000),
+)
+planificador_mesa = PlanificadorRondas(mesa_ruleta)
+
+# Carreras con apuestas mutuas: las cuotas salen de lo apostado por todos
+_config_mutuas = obtener_seccion("apuestas_mutuas")
+hipodromo = HipodromoMutuo(
+    liquidacion,
+    comision=_config_mutuas.get("comision", 0.15),
+    segundos_carrera=_config_mutuas.get("segundos_carrera", 120),
+    max_apuestas=_config_mutuas.get("max_apuestas", 10000),
+)
+planificador_hipodromo = PlanificadorRondas(hipodromo)
+
+def _crear_cursor(ultimo_id):
+    """Cursor opaco para la paginación: codifica el último ID devuelto."""
+    return base64.urlsafe_b64encode(json.dumps({"despues": ultimo_id}).encode("utf-8")).decode("ascii")
+
+def _leer_cursor(cursor):
+    if cursor is None:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["despues"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(400, detail="Cursor no válido")
+
+def _respuesta_ndjson(registros, comprimir=False):
+    """Emite cada registro como una línea JSON según se genera, sin montar
+    la respuesta completa en memoria. Con comprimir=True se envía en gzip."""
+    def lineas():
+        for registro in registros:
+            yield (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def comprimidas():
+        compresor = zlib.compressobj(wbits=31)  # 31: formato gzip
+        for linea in lineas():
+            bloque = compresor.compress(linea)
+            if bloque:
+                yield bloque
+        yield compresor.flush()
+
+    if comprimir:
+        return StreamingResponse(comprimidas(), media_type="application/x-ndjson",
+                                 headers={"Content-Encoding": "gzip"})
+    return StreamingResponse(lineas(), media_type="application/x-ndjson")
+
+@app.exception_handler(FichasInsuficientes)
+async def fichas_insuficientes_handler(request: Request, exc: FichasInsuficientes):
+    # Otra apuesta del mismo usuario se liquidó antes y dejó el saldo por debajo
+    return JSONResponse(status_code=400, content={"detail": "Fichas insuficientes"})
 
 # --- ENDPOINTS DE GESTIÓN DE USUARIOS ---
 
 @app.post("/api/usuarios", status_code=201)
+@asincrono
 def crear_usuario_endpoint(req: CrearUsuarioRequest):
     """Crea un nuevo usuario con validación de edad y nombre."""
     if len(req.nombre.strip()) < 3:
@@ -77,131 +237,423 @@ def crear_usuario_endpoint(req: CrearUsuarioRequest):
     if edad < 18:
         raise HTTPException(status_code=403, detail=f"Acceso denegado: Tienes {edad} años. Solo mayores de 18.")
 
-    usuarios_db = cargar_db_usuarios()
-    
-    nuevo_user = Usuario(req.nombre.strip(), req.contrasena, req.fecha_nacimiento.strip())
-    
-    if nuevo_user.id in usuarios_db:
-        raise HTTPException(status_code=409, detail="El ID de usuario ya existe. Intenta con un nombre diferente.")
-
-    usuarios_db[nuevo_user.id] = nuevo_user.to_dict()
-    guardar_db_usuarios(usuarios_db)
+    nuevo_user = Usuario(req.nombre.strip(), hashear_contrasena(req.contrasena), req.fecha_nacimiento.strip())
+    # Nunca se sobrescribe una cuenta existente aunque el ID se repitiera
+    if not crear_db_usuario(nuevo_user.id, nuevo_user.to_dict()):
+        raise HTTPException(status_code=409, detail="El ID de usuario ya existe, inténtalo de nuevo")
     
-    return {"success": True, "message": "Usuario creado", "data": nuevo_user.to_dict()}
+    return {"success": True, "message": "Usuario creado", "data": _sin_contrasena(nuevo_user.to_dict())}
+
+def _sin_contrasena(datos):
+    return {k: v for k, v in datos.items() if k != "contrasena"}
+
+def _autenticar(usuarios, user_id, contrasena=None, authorization=None):
+    """Comprueba el token de sesión (cabecera Authorization: Bearer) o, sin
+    token, la contraseña. El token cuesta una consulta a la caché de sesiones;
+    la contraseña, un hash lento, así que conviene iniciar sesión una vez."""
+    if user_id not in usuarios:
+        return False
+    if authorization:
+        tipo, _, token = authorization.partition(" ")
+        return tipo.lower() == "bearer" and obtener_sesiones().verificar(token) == user_id
+    return verificar_contrasena(usuarios[user_id].get("contrasena"), contrasena)
+
+@app.post("/api/sesion")
+@asincrono
+def iniciar_sesion_endpoint(req: IniciarSesionRequest):
+    """Comprueba la contraseña una vez y devuelve un token de sesión firmado."""
+    with bloqueo_usuario(req.user_id):
+        usuarios = cargar_db_usuarios(req.user_id)
+        if not _autenticar(usuarios, req.user_id, req.contrasena):
+            raise HTTPException(status_code=401, detail="ID o contraseña incorrectos")
+        # Las contraseñas antiguas en texto plano pasan a hash al entrar
+        if not es_hash(usuarios[req.user_id]["contrasena"]):
+            usuarios[req.user_id]["contrasena"] = hashear_contrasena(req.contrasena)
+            guardar_db_usuarios({req.user_id: usuarios[req.user_id]})
+    token, caduca = obtener_sesiones().emitir(req.user_id)
+    return {"success": True, "token": token, "tipo": "Bearer", "caduca": caduca}
+
+@app.delete("/api/sesion")
+@asincrono
+def cerrar_sesion_endpoint(authorization: str = Header(...)):
+    """Anula el token de sesión."""
+    obtener_sesiones().revocar(authorization.partition(" ")[2])
+    return {"success": True}
 
 @app.get("/api/usuarios/{user_id}/info")
-def obtener_info_usuario(user_id: str, contrasena: str):
-    usuarios = cargar_db_usuarios()
-    if user_id not in usuarios or usuarios[user_id]["contrasena"] != contrasena:
+@asincrono
+def obtener_info_usuario(user_id: str, contrasena: Optional[str] = None,
+                         authorization: Optional[str] = Header(None)):
+    usuarios = cargar_db_usuarios(user_id)
+    if not _autenticar(usuarios, user_id, contrasena, authorization):
         raise HTTPException(status_code=401, detail="ID o contraseña incorrectos")
     
-    return {"success": True, "data": usuarios[user_id]}
+    return {"success": True, "data": _sin_contrasena(usuarios[user_id])}
 
 # --- ENDPOINTS DE JUEGOS ---
 
+def _tupla(numeros):
+    return tuple(numeros) if numeros is not None else None
+
+def _jugar(nombre_juego, user_id, apuesta):
+    """Valida la apuesta, la resuelve con el motor del juego y la liquida."""
+    motor = MOTORES[nombre_juego]
+    usuarios = cargar_db_usuarios(user_id)
+    if user_id not in usuarios: raise HTTPException(404, "Usuario no encontrado")
+    if apuesta.monto > usuarios[user_id]["fichas"]: raise HTTPException(400, "Fichas insuficientes")
+    error = motor.validar(apuesta)
+    if error:
+        raise HTTPException(400, detail=error)
+
+    _, respuesta = liquidacion.jugar(motor, user_id, apuesta, usuarios, rng=obtener_aleatoriedad().flujo())
+    return respuesta
+
 @app.post("/jugar/dados")
+@asincrono
 def api_dados(req: DatosApuesta):
-    usuarios = cargar_db_usuarios()
-    if req.user_id not in usuarios: raise HTTPException(404, "Usuario no encontrado")
-    if req.monto > usuarios[req.user_id]["fichas"]: raise HTTPException(400, "Fichas insuficientes")
-
-    juego = JuegoDadosAPI(usuarios, req.user_id, gestionar_apuesta, guardar_db_usuarios)
-    return juego.ejecutar_logica(req.monto)
+    return _jugar("dados", req.user_id, Apuesta(req.monto))
 
 @app.post("/jugar/tragamonedas")
+@asincrono
 def api_tragamonedas(req: DatosApuesta):
-    usuarios = cargar_db_usuarios()
-    if req.user_id not in usuarios: raise HTTPException(404, "Usuario no encontrado")
-    if req.monto > usuarios[req.user_id]["fichas"]: raise HTTPException(400, "Fichas insuficientes")
-    if req.monto > 10: raise HTTPException(400, "Apuesta máxima permitida: 10")
-
-    juego = JuegoTragaMonedasAPI(usuarios, req.user_id, gestionar_apuesta, guardar_db_usuarios)
-    return juego.ejecutar_logica(req.monto)
+    return _jugar("tragamonedas", req.user_id, Apuesta(req.monto))
 
 @app.post("/jugar/carreras")
+@asincrono
 def api_carreras(req: DatosApuesta):
-    usuarios = cargar_db_usuarios()
-    if req.user_id not in usuarios: raise HTTPException(404)
-    if req.monto > usuarios[req.user_id]["fichas"]: raise HTTPException(400, "Fichas insuficientes")
-    
-    juego = JuegoCarrerasAPI(usuarios, req.user_id, gestionar_apuesta, guardar_db_usuarios)
-    if req.eleccion not in juego.caballos:
-        raise HTTPException(400, detail="Ese caballo no existe")
-
-    return juego.ejecutar_logica(req.monto, req.eleccion)
+    return _jugar("carreras", req.user_id, Apuesta(req.monto, eleccion=req.eleccion))
 
 @app.post("/jugar/ruleta")
+@asincrono
 def api_ruleta(req: DatosApuestaRuleta):
-    usuarios = cargar_db_usuarios()
+    return _jugar("ruleta", req.user_id, Apuesta(req.monto, req.tipo_apuesta, req.numero,
+                                                 numeros=_tupla(req.numeros)))
+
+def _validar_apuesta_lote(motor, apuesta):
+    if apuesta.monto <= 0:
+        return "La apuesta debe ser mayor a 0"
+    return motor.validar(apuesta)
+
+@app.post("/jugar/{nombre_juego}/lote")
+@asincrono
+def api_jugar_lote(nombre_juego: str, req: LoteApuestas):
+    """
+    Juega varias apuestas seguidas de un mismo usuario. Se resuelven en orden
+    contra su saldo, se paran en la primera que no pueda pagar y saldo e
+    historial se guardan una sola vez al final.
+    """
+    if nombre_juego not in MOTORES:
+        raise HTTPException(404, "Juego no encontrado")
+    usuarios = cargar_db_usuarios(req.user_id)
     if req.user_id not in usuarios: raise HTTPException(404, "Usuario no encontrado")
-    if req.monto > usuarios[req.user_id]["fichas"]: raise HTTPException(400, "Fichas insuficientes")
 
-    juego = JuegoRuletaAPI(usuarios, req.user_id, gestionar_apuesta, guardar_db_usuarios)
-    if req.tipo_apuesta not in ["1", "2", "3"]:
-        raise HTTPException(400, detail="Tipo de apuesta inválido")
-    
-    return juego.ejecutar_logica(req.monto, req.tipo_apuesta, req.numero)
+    motor = MOTORES[nombre_juego]
+    apuestas = [Apuesta(a.monto, a.tipo_apuesta, a.numero, a.eleccion, _tupla(a.numeros)) for a in req.apuestas]
+    # Se valida todo antes de jugar la primera
+    for i, apuesta in enumerate(apuestas):
+        error = _validar_apuesta_lote(motor, apuesta)
+        if error:
+            raise HTTPException(400, detail=f"Apuesta {i}: {error}")
+
+    resultados = []
+    detenido = None
+    rng = obtener_aleatoriedad().flujo()
+    with liquidacion.lote(req.user_id, usuarios) as (usuarios, unidad):
+        for apuesta in apuestas:
+            if apuesta.monto > usuarios[req.user_id]["fichas"]:
+                detenido = "Fichas insuficientes"
+                break
+            usuarios, resultado = liquidacion.jugar(motor, req.user_id, apuesta, usuarios, unidad, rng)
+            resultados.append({k: v for k, v in resultado.items() if k not in ("juego", "detalles")})
+
+    return {
+        "juego": nombre_juego,
+        "jugadas": len(resultados),
+        "pendientes": len(apuestas) - len(resultados),
+        "detenido": detenido,
+        "fichas_finales": usuarios[req.user_id]["fichas"],
+        "resultados": resultados,
+    }
+
+@app.post("/jugar/ruleta/boleto")
+@asincrono
+def api_ruleta_boleto(req: BoletoRuleta):
+    """
+    Varias apuestas de ruleta sobre un mismo giro. Se juegan todas o
+    ninguna: el saldo debe cubrir la suma de las apuestas, y saldo e
+    historial (una partida por apuesta) se guardan una sola vez.
+    """
+    usuarios = cargar_db_usuarios(req.user_id)
+    if req.user_id not in usuarios: raise HTTPException(404, "Usuario no encontrado")
+
+    motor = MOTORES["ruleta"]
+    apuestas = [Apuesta(a.monto, a.tipo_apuesta, a.numero, numeros=_tupla(a.numeros)) for a in req.apuestas]
+    for i, apuesta in enumerate(apuestas):
+        error = _validar_apuesta_lote(motor, apuesta)
+        if error:
+            raise HTTPException(400, detail=f"Apuesta {i}: {error}")
+    total = sum(a.monto for a in apuestas)
+
+    rng = obtener_aleatoriedad().flujo()
+    with liquidacion.lote(req.user_id, usuarios) as (usuarios, unidad):
+        if total > usuarios[req.user_id]["fichas"]:
+            raise HTTPException(400, "Fichas insuficientes")
+        usuarios, resultados = liquidacion.jugar_varias(motor, req.user_id, apuestas, usuarios, unidad, rng)
+
+    bola = resultados[0].datos["numero_ganador"]
+    return {
+        "juego": "ruleta",
+        "numero_ganador": bola,
+        "color_ganador": resultados[0].datos["color_ganador"],
+        "total_apostado": total,
+        "total_ganado": sum(r.datos["fichas_ganadas"] for r in resultados),
+        "fichas_finales": usuarios[req.user_id]["fichas"],
+        "resultados": [
+            {"tipo_apuesta": a.tipo_apuesta, "numeros": list(motor.clave(a)[1]), "monto": a.monto,
+             "resultado": r.resultado, "fichas_ganadas": r.datos["fichas_ganadas"]}
+            for a, r in zip(apuestas, resultados)
+        ],
+    }
+
+@app.get("/mesa/ruleta")
+async def get_mesa_ruleta(user_id: Optional[str] = None):
+    """Ronda abierta de la mesa compartida y los últimos números que han salido."""
+    return {**mesa_ruleta.ronda_actual.resumen(user_id), "ultimos_numeros": mesa_ruleta.ultimos_numeros()}
+
+@app.post("/mesa/ruleta/apuestas")
+@asincrono
+def api_mesa_apostar(req: BoletoRuleta):
+    """
+    Añade apuestas a la ronda abierta de la mesa. No se cobran hasta el
+    giro; el saldo debe cubrir todo lo apostado por el usuario en la ronda.
+    """
+    usuarios = cargar_db_usuarios(req.user_id)
+    if req.user_id not in usuarios: raise HTTPException(404, "Usuario no encontrado")
+
+    motor = MOTORES["ruleta"]
+    apuestas = [Apuesta(a.monto, a.tipo_apuesta, a.numero, numeros=_tupla(a.numeros)) for a in req.apuestas]
+    for i, apuesta in enumerate(apuestas):
+        error = _validar_apuesta_lote(motor, apuesta)
+        if error:
+            raise HTTPException(400, detail=f"Apuesta {i}: {error}")
+    try:
+        ronda = mesa_ruleta.apostar(req.user_id, apuestas, usuarios[req.user_id]["fichas"])
+    except FichasInsuficientes:
+        raise HTTPException(400, "Fichas insuficientes")
+    except MesaLlena as e:
+        raise HTTPException(409, str(e))
+    return ronda.resumen(req.user_id)
+
+@app.get("/mesa/ruleta/rondas/{ronda_id}")
+async def get_ronda_ruleta(ronda_id: str, user_id: Optional[str] = None):
+    """Estado de una ronda (la abierta o una de las últimas) y, con user_id, sus apuestas en ella."""
+    ronda = mesa_ruleta.ronda(ronda_id)
+    if ronda is None:
+        raise HTTPException(404, "Ronda no encontrada")
+    return ronda.resumen(user_id)
+
+@app.get("/carreras/mutuas")
+async def get_carrera_mutua(user_id: Optional[str] = None):
+    """Carrera abierta: bolsa, cuotas actuales y hora de salida."""
+    return {**hipodromo.ronda_actual.resumen(user_id), "ultimos_ganadores": hipodromo.ultimos_ganadores()}
+
+@app.post("/carreras/mutuas/apuestas")
+@asincrono
+def api_apostar_carrera_mutua(req: LoteApuestas):
+    """
+    Apuesta a la carrera abierta. Las cuotas cambian con cada apuesta y la
+    definitiva se fija al salir; no se cobra hasta que se corre.
+    """
+    usuarios = cargar_db_usuarios(req.user_id)
+    if req.user_id not in usuarios: raise HTTPException(404, "Usuario no encontrado")
+
+    motor = MOTORES["carreras"]
+    apuestas = [Apuesta(a.monto, eleccion=a.eleccion) for a in req.apuestas]
+    for i, apuesta in enumerate(apuestas):
+        error = _validar_apuesta_lote(motor, apuesta)
+        if error:
+            raise HTTPException(400, detail=f"Apuesta {i}: {error}")
+    try:
+        carrera = hipodromo.apostar(req.user_id, apuestas, usuarios[req.user_id]["fichas"])
+    except FichasInsuficientes:
+        raise HTTPException(400, "Fichas insuficientes")
+    except MesaLlena as e:
+        raise HTTPException(409, str(e))
+    return carrera.resumen(req.user_id)
+
+@app.get("/carreras/mutuas/{carrera_id}")
+async def get_resultado_carrera_mutua(carrera_id: str, user_id: Optional[str] = None):
+    """Estado de una carrera (la abierta o una de las últimas), ganador y dividendo."""
+    carrera = hipodromo.carrera(carrera_id)
+    if carrera is None:
+        raise HTTPException(404, "Carrera no encontrada")
+    return carrera.resumen(user_id)
+
+@app.get("/bote")
+@asincrono
+def get_bote():
+    """Bote progresivo: cantidad actual, juegos que aportan y últimos premios."""
+    if liquidacion.bote is None:
+        raise HTTPException(404, "No hay bote progresivo")
+    return liquidacion.bote.estado()
+
+@app.get("/juegos/{nombre_juego}/odds")
+@asincrono
+def get_odds_juego(nombre_juego: str,
+                   monto: Optional[int] = Query(None, gt=0, description="Apuesta; sin ella, por ficha y sin redondeo")):
+    """Probabilidades exactas, RTP y varianza de cada apuesta del juego (por ficha apostada, o
+    para una apuesta de `monto` fichas con los premios redondeados a la baja)."""
+    try:
+        return calcular_odds(nombre_juego, monto)
+    except KeyError:
+        raise HTTPException(404, "Juego no encontrado")
 
 @app.post("/gacha/chiste")
+@asincrono
 def api_tirar_gacha(user_id: str):
-    usuarios = cargar_db_usuarios()
-    if user_id not in usuarios: raise HTTPException(404, "Usuario no encontrado")
-    
-    gacha = GachaChistes(usuarios, user_id, guardar_db_usuarios)
-    resultado = gacha.tirar_gacha()
-    
+    # GachaChistes lee el usuario dentro de su bloqueo
+    gacha = GachaChistes({}, user_id, guardar_db_usuarios, cargar_datos=cargar_db_usuarios)
+    return _resultado_gacha(gacha.tirar_gacha())
+
+@app.post("/gacha/chiste/multiple")
+@asincrono
+def api_tirar_gacha_multiple(user_id: str):
+    """Tirada múltiple: varios chistes con un solo cobro y un solo guardado."""
+    gacha = GachaChistes({}, user_id, guardar_db_usuarios, cargar_datos=cargar_db_usuarios)
+    return _resultado_gacha(gacha.tirar_varias())
+
+def _resultado_gacha(resultado):
+    if resultado.get("error") == "Usuario no encontrado": raise HTTPException(404, resultado["error"])
     if "error" in resultado: raise HTTPException(400, detail=resultado["error"])
     return resultado
 
 # --- ENDPOINTS DE HISTORIAL Y BANCO ---
 
+def _leer_fecha(texto, parametro):
+    """Acepta "DD/MM/YYYY", "DD/MM/YYYY HH:MM:SS" o segundos desde epoch."""
+    for formato in (FORMATO_FECHA, "%d/%m/%Y"):
+        try:
+            return datetime.strptime(texto, formato).timestamp()
+        except ValueError:
+            pass
+    try:
+        return float(texto)
+    except ValueError:
+        raise HTTPException(400, detail=f"Fecha no válida en '{parametro}': {texto}")
+
+def _agrupar_por_usuario(filas):
+    """Convierte tuplas (uid, nombre, partida) cronologicas al formato de
+    /jugadas: un bloque por usuario con sus partidas de la mas reciente a la mas antigua."""
+    por_usuario = {}
+    for uid, nombre, partida in filas:
+        info = por_usuario.setdefault(uid, {"id": uid, "usuario": nombre, "partidas": []})
+        info["partidas"].append(partida)
+    for info in por_usuario.values():
+        info["partidas"].reverse()
+    return list(por_usuario.values())
+
 @app.get("/jugadas/fecha")
+@asincrono
 def get_jugadas_por_fecha(fecha: str = Query(..., description="DD/MM/YYYY")):
-    datos_historial = cargar_db_historial()
-    resultado = []
+    try:
+        dia = datetime.strptime(fecha, "%d/%m/%Y")
+    except ValueError:
+        raise HTTPException(400, detail="Formato de fecha no válido, usa DD/MM/YYYY")
 
-    for uid, info in datos_historial.items():
-        filtradas = [p for p in info["partidas"] if p["fecha"].startswith(fecha)]
-        if filtradas:
-            resultado.append({"id": uid, "usuario": info["usuario"], "partidas": filtradas})
+    filas = almacen.buscar_partidas(desde=dia.timestamp(), hasta=(dia + timedelta(days=1)).timestamp())
+    resultado = _agrupar_por_usuario(filas)
 
     if not resultado: raise HTTPException(404, detail="Sin registros en esa fecha")
     return resultado
 
+@app.get("/jugadas/rango")
+@asincrono
+def get_jugadas_por_rango(
+    desde: Optional[str] = Query(None, description="Inicio incluido: DD/MM/YYYY [HH:MM:SS] o epoch"),
+    hasta: Optional[str] = Query(None, description="Fin excluido: DD/MM/YYYY [HH:MM:SS] o epoch"),
+    juego: Optional[str] = Query(None, description="dados, ruleta, tragamonedas, carreras, banco..."),
+    resultado: Optional[str] = Query(None, description="gano, perdio o empate"),
+):
+    """
+    Jugadas de todos los usuarios en un intervalo de tiempo, opcionalmente
+    filtradas por juego y resultado. Se resuelve con los índices por fecha y juego.
+    """
+    inicio = _leer_fecha(desde, "desde") if desde else None
+    fin = _leer_fecha(hasta, "hasta") if hasta else None
+    filas = almacen.buscar_partidas(desde=inicio, hasta=fin, juego=juego, resultado=resultado)
+    return _agrupar_por_usuario(filas)
+
 @app.post("/api/banco/agregar-fichas")
-def agregar_fichas_banco(req: AgregarFichasRequest):
-    usuarios = cargar_db_usuarios()
-    if req.user_id not in usuarios or usuarios[req.user_id]["contrasena"] != req.contrasena:
-        raise HTTPException(401, "Credenciales inválidas")
-    
-    if req.cantidad <= 0: raise HTTPException(400, "La cantidad debe ser positiva")
-    
-    fichas_antes = usuarios[req.user_id]["fichas"]
-    usuarios[req.user_id]["fichas"] += req.cantidad
-    
-    registrar_partida(
-        user_id=req.user_id,
-        nombre=usuarios[req.user_id]["nombre"],
-        juego="banco",
-        apuesta=0,
-        detalles="Ingreso desde API Banco",
-        resultado="gano",
-        ganancia=req.cantidad,
-        antes=fichas_antes,
-        despues=usuarios[req.user_id]["fichas"]
-    )
-    
-    guardar_db_usuarios(usuarios)
+@asincrono
+def agregar_fichas_banco(req: AgregarFichasRequest, authorization: Optional[str] = Header(None)):
+    with bloqueo_usuario(req.user_id):
+        usuarios = cargar_db_usuarios(req.user_id)
+        if not _autenticar(usuarios, req.user_id, req.contrasena, authorization):
+            raise HTTPException(401, "Credenciales inválidas")
+        
+        if req.cantidad <= 0: raise HTTPException(400, "La cantidad debe ser positiva")
+        
+        unidad = UnidadDeTrabajo(confirmar_db)
+        fichas_antes = usuarios[req.user_id]["fichas"]
+        usuarios[req.user_id]["fichas"] += req.cantidad
+        
+        registrar_partida(
+            user_id=req.user_id,
+            nombre=usuarios[req.user_id]["nombre"],
+            juego="banco",
+            apuesta=0,
+            detalles="Ingreso desde API Banco",
+            resultado="gano",
+            ganancia=req.cantidad,
+            antes=fichas_antes,
+            despues=usuarios[req.user_id]["fichas"],
+            unidad=unidad
+        )
+        
+        unidad.marcar_usuario(req.user_id, usuarios[req.user_id])
+        unidad.confirmar()
     return {"success": True, "fichas_actuales": usuarios[req.user_id]["fichas"]}
 
 # --- ENDPOINTS DE HISTÓRICO ---
 
 @app.get("/jugadas")
-def get_todos_los_usuarios():
+@asincrono
+def get_todos_los_usuarios(
+    response: Response,
+    limite: Optional[int] = Query(None, ge=1, description="Usuarios por página"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Siguiente-Cursor de la página anterior"),
+    formato: str = Query("json", pattern="^(json|ndjson)$"),
+    comprimir: bool = Query(False, description="Solo ndjson: respuesta con gzip"),
+):
     """
-    Obtiene el historial completo de todos los usuarios registrados 
-    en el archivo historial.json.
+    Obtiene el historial de todos los usuarios registrados.
+
+    - Sin `limite` ni `cursor`: todo el historial en una sola respuesta.
+    - Con `limite`: una página de usuarios; la siguiente se pide con el cursor
+      de la cabecera X-Siguiente-Cursor (ausente en la última página).
+    - `formato=ndjson`: una línea por partida, leída del almacén sobre la marcha.
     """
+    if formato == "ndjson":
+        registros = ({"id": uid, "usuario": nombre, "partida": partida}
+                     for uid, nombre, partida in almacen.iterar_partidas())
+        return _respuesta_ndjson(registros, comprimir)
+
+    if limite is not None or cursor is not None:
+        despues = _leer_cursor(cursor)
+        resultado = []
+        uids = almacen.usuarios_con_partidas(despues=despues, limite=limite)
+        for user_id in uids:
+            info = almacen.obtener_partidas(user_id)
+            resultado.append({
+                "id": user_id,
+                "usuario": info["usuario"],
+                "total_partidas": len(info["partidas"]),
+                "partidas": info["partidas"]
+            })
+        if limite is not None and len(uids) == limite:
+            response.headers["X-Siguiente-Cursor"] = _crear_cursor(uids[-1])
+        return resultado
+
     try:
         datos = cargar_db_historial()
         
@@ -219,44 +671,72 @@ def get_todos_los_usuarios():
         raise HTTPException(status_code=500, detail=f"Error al leer el historial: {str(e)}")
 
 @app.get("/jugadas/{user_id}")
-def get_jugadas_usuario(user_id: str):
+@asincrono
+def get_jugadas_usuario(user_id: str, limite: Optional[int] = Query(None, ge=1, description="Últimas N jugadas")):
     """
-    Obtiene todas las jugadas de un usuario específico por su ID.
+    Obtiene las jugadas de un usuario específico por su ID (todas, o las
+    últimas `limite`), leyendo solo sus entradas a través del índice.
     """
-    datos = cargar_db_historial()
+    usuario_data = almacen.obtener_partidas(user_id, limite)
     
-    if user_id not in datos:
+    if usuario_data is None:
         raise HTTPException(
             status_code=404, 
             detail=f"Historial para el usuario con ID {user_id} no encontrado"
         )
     
-    usuario_data = datos[user_id]
-    
     return {
         "id": user_id,
         "usuario": usuario_data["usuario"],
-        "total_partidas": len(usuario_data.get("partidas", [])),
+        "total_partidas": almacen.contar_partidas(user_id),
         "partidas": usuario_data.get("partidas", [])
     }
 
 @app.get("/api/usuarios")
-def listar_usuarios():
+@asincrono
+def listar_usuarios(
+    response: Response,
+    limite: Optional[int] = Query(None, ge=1, description="Usuarios por página"),
+    cursor: Optional[str] = Query(None, description="Valor de siguiente_cursor de la página anterior"),
+    formato: str = Query("json", pattern="^(json|ndjson)$"),
+    comprimir: bool = Query(False, description="Solo ndjson: respuesta con gzip"),
+):
     """
-    Lista todos los usuarios creados en el sistema (solo ID y nombre).
-    Utiliza el archivo users.json.
+    Lista los usuarios creados en el sistema (solo ID y nombre). Con `limite`
+    se pagina por cursor (por orden de ID) y con `formato=ndjson` se emite un
+    usuario por línea.
     """
     usuarios_db = cargar_db_usuarios()
-    
+
+    if formato == "ndjson":
+        registros = ({"id": user_id, "nombre": usuario["nombre"]}
+                     for user_id, usuario in usuarios_db.items())
+        return _respuesta_ndjson(registros, comprimir)
+
+    paginado = limite is not None or cursor is not None
+    ids = list(usuarios_db)
+    siguiente = None
+    if paginado:
+        ids.sort()
+        despues = _leer_cursor(cursor)
+        inicio = bisect.bisect_right(ids, despues) if despues is not None else 0
+        ids = ids[inicio:inicio + limite] if limite else ids[inicio:]
+        if limite is not None and len(ids) == limite:
+            siguiente = _crear_cursor(ids[-1])
+            response.headers["X-Siguiente-Cursor"] = siguiente
+
     usuarios_lista = []
-    for user_id, usuario in usuarios_db.items():
+    for user_id in ids:
         usuarios_lista.append({
             "id": user_id,
-            "nombre": usuario["nombre"]
+            "nombre": usuarios_db[user_id]["nombre"]
         })
     
-    return {
+    respuesta = {
         "success": True,
         "count": len(usuarios_lista),
         "data": usuarios_lista
-    }
\ No newline at end of file
+    }
+    if paginado:
+        respuesta["siguiente_cursor"] = siguiente
+    return respuesta
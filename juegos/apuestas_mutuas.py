@@ -0,0 +1,232 @@
+"""Apuestas mutuas (parimutuel) para carreras programadas.
+
+En vez de las cuotas fijas de MotorCarreras, lo apostado por todos a una
+carrera forma una bolsa. La casa se queda la `comision` y el resto se
+reparte entre quienes acertaron el ganador, en proporcion a lo apostado:
+
+    dividendo = bolsa * (1 - comision) / apostado al ganador
+
+La bolsa lleva la suma total y la de cada caballo, asi que cada apuesta la
+actualiza en O(1) y las cuotas que se muestran salen de esas sumas sin
+recorrer las apuestas. El ganador se sortea con las probabilidades de
+MotorCarreras.
+
+Como en la mesa de ruleta, nada se cobra al apostar. Al correr la carrera
+se bloquean los usuarios, se anulan las apuestas que su saldo ya no cubre
+(y se restan de la bolsa) y se liquidan todas con una sola confirmacion.
+Los premios se redondean a la baja a fichas enteras y nunca son menores
+que lo apostado. Si nadie acerto, se devuelve cada apuesta. Lo apostado es
+de la bolsa, asi que estas apuestas no aportan al bote progresivo ni lo
+sortean aunque "carreras" participe en el.
+"""
+import threading
+import time
+from collections import OrderedDict
+from fractions import Fraction
+
+from Funciones.aleatoriedad import obtener_aleatoriedad
+from Funciones.identificadores import nuevo_id_ronda
+from juegos.liquidacion import FichasInsuficientes
+from juegos.mesa_ruleta import MesaLlena
+from juegos.motores import MOTORES
+
+
+class Bolsa:
+    """Totales de una carrera: se actualizan en O(1) por apuesta."""
+
+    def __init__(self, caballos, comision):
+        self.comision = Fraction(str(comision))
+        self.total = 0
+        self.por_caballo = dict.fromkeys(caballos, 0)
+        self.apuestas = 0
+
+    def añadir(self, caballo, monto):
+        self.total += monto
+        self.por_caballo[caballo] += monto
+        self.apuestas += 1
+
+    def quitar(self, caballo, monto):
+        self.total -= monto
+        self.por_caballo[caballo] -= monto
+        self.apuestas -= 1
+
+    @property
+    def neto(self):
+        """Lo que se reparte entre los ganadores."""
+        return self.total * (1 - self.comision)
+
+    def dividendo(self, caballo):
+        """Lo que cobra cada ficha apostada a `caballo` si gana (None si nadie le apuesta)."""
+        apostado = self.por_caballo[caballo]
+        if not apostado:
+            return None
+        return max(Fraction(1), self.neto / apostado)
+
+    def cuotas(self):
+        return {c: (round(float(d), 2) if d is not None else None)
+                for c, d in ((c, self.dividendo(c)) for c in self.por_caballo)}
+
+    def resumen(self):
+        return {"total": self.total, "por_caballo": dict(self.por_caballo),
+                "comision": float(self.comision), "cuotas": self.cuotas()}
+
+
+class Carrera:
+    def __init__(self, caballos, comision, segundos):
+        self.id = nuevo_id_ronda()
+        self.estado = "abierta"  # abierta -> corriendo -> liquidada (o fallida)
+        self.abierta_en = time.time()
+        self.cierra_en = self.abierta_en + segundos
+        self.bolsa = Bolsa(caballos, comision)
+        self.jugadas = []        # (uid, Apuesta)
+        self.comprometido = {}   # uid -> fichas apostadas en la carrera
+        self.ganador = None
+        self.dividendo = None
+        self.premios = []        # fichas cobradas por cada apuesta, o None si se anulo
+
+    def resumen(self, uid=None):
+        datos = {
+            "carrera": self.id,
+            "estado": self.estado,
+            "abierta_en": self.abierta_en,
+            "cierra_en": self.cierra_en,
+            "apuestas": self.bolsa.apuestas,
+            "bolsa": self.bolsa.resumen(),
+        }
+        if self.ganador is not None:
+            datos["ganador"] = self.ganador
+            datos["nombre_ganador"] = MOTORES["carreras"].caballos[self.ganador]["nombre"]
+            datos["dividendo"] = float(self.dividendo) if self.dividendo is not None else None
+        if uid is not None:
+            datos["mis_apuestas"] = [self._apuesta(i) for i, (u, _) in enumerate(self.jugadas) if u == uid]
+        return datos
+
+    def _apuesta(self, i):
+        _, apuesta = self.jugadas[i]
+        datos = {"eleccion": apuesta.eleccion, "monto": apuesta.monto}
+        if self.estado == "liquidada":
+            premio = self.premios[i]
+            datos["fichas_ganadas"] = premio or 0
+            if premio is None:
+                datos["resultado"] = "anulada"
+            elif premio == apuesta.monto:
+                datos["resultado"] = "empate"
+            else:
+                datos["resultado"] = "gano" if premio > apuesta.monto else "perdio"
+        return datos
+
+
+class HipodromoMutuo:
+    def __init__(self, liquidacion, comision=0.15, segundos_carrera=120, max_apuestas=10000,
+                 carreras_guardadas=50, servicio=obtener_aleatoriedad):
+        self.liquidacion = liquidacion
+        self.comision = comision
+        self.segundos_carrera = segundos_carrera
+        self.max_apuestas = max_apuestas
+        self.carreras_guardadas = carreras_guardadas
+        self.servicio = servicio
+        self._lock = threading.Lock()
+        self._carrera = self._nueva_carrera()
+        self._carreras = OrderedDict()  # ultimas carreras corridas, por id
+
+    def _nueva_carrera(self):
+        return Carrera(MOTORES["carreras"].caballos, self.comision, self.segundos_carrera)
+
+    @property
+    def ronda_actual(self):
+        return self._carrera
+
+    def carrera(self, carrera_id):
+        """La carrera abierta o una de las ultimas corridas (None si no se conoce)."""
+        with self._lock:
+            if carrera_id == self._carrera.id:
+                return self._carrera
+            return self._carreras.get(carrera_id)
+
+    def apostar(self, uid, apuestas, fichas):
+        """Añade las apuestas (ya validadas) de `uid` a la bolsa de la carrera
+        abierta si su saldo `fichas` cubre todo lo que lleva apostado en ella."""
+        uid = str(uid)
+        with self._lock:
+            carrera = self._carrera
+            if len(carrera.jugadas) + len(apuestas) > self.max_apuestas:
+                raise MesaLlena("La carrera está completa, espera a la siguiente")
+            comprometido = carrera.comprometido.get(uid, 0) + sum(a.monto for a in apuestas)
+            if comprometido > fichas:
+                raise FichasInsuficientes(f"Fichas insuficientes: {fichas} disponibles")
+            for apuesta in apuestas:
+                carrera.jugadas.append((uid, apuesta))
+                carrera.bolsa.añadir(apuesta.eleccion, apuesta.monto)
+            carrera.comprometido[uid] = comprometido
+            return carrera
+
+    def correr(self):
+        """Cierra las apuestas, abre la siguiente carrera y liquida la cerrada."""
+        with self._lock:
+            carrera = self._carrera
+            self._carrera = self._nueva_carrera()
+            carrera.estado = "corriendo"
+            self._carreras[carrera.id] = carrera
+            while len(self._carreras) > self.carreras_guardadas:
+                self._carreras.popitem(last=False)
+
+        try:
+            rng = self.servicio().flujo()
+            sorteo = rng.posicion() if hasattr(rng, "posicion") else None
+            carrera.ganador = MOTORES["carreras"].sortear_ganador(rng)
+            if carrera.jugadas:
+                self._liquidar(carrera, sorteo)
+        except Exception:
+            carrera.estado = "fallida"
+            raise
+        carrera.estado = "liquidada"
+        return carrera
+
+    cerrar_ronda = correr  # lo que llama el planificador
+
+    def _liquidar(self, carrera, sorteo):
+        bolsa = carrera.bolsa
+        nombre_ganador = MOTORES["carreras"].caballos[carrera.ganador]["nombre"]
+        with self.liquidacion.lote_usuarios(carrera.comprometido) as (usuarios, unidad):
+            # Primero se anulan las apuestas sin saldo: cambian la bolsa y el dividendo
+            disponibles = {uid: datos["fichas"] for uid, datos in usuarios.items()}
+            cubiertas = []
+            for uid, apuesta in carrera.jugadas:
+                cubierta = apuesta.monto <= disponibles.get(uid, 0)
+                if cubierta:
+                    disponibles[uid] -= apuesta.monto
+                else:
+                    bolsa.quitar(apuesta.eleccion, apuesta.monto)
+                cubiertas.append(cubierta)
+            carrera.dividendo = bolsa.dividendo(carrera.ganador)
+
+            extra = {"carrera": carrera.id, "ganador": carrera.ganador}
+            if sorteo is not None:
+                extra["sorteo"] = sorteo
+            for (uid, apuesta), cubierta in zip(carrera.jugadas, cubiertas):
+                if not cubierta:
+                    carrera.premios.append(None)
+                    continue
+                elegido = MOTORES["carreras"].caballos[apuesta.eleccion]["nombre"]
+                detalles = f"Apuestas mutuas: aposto por {elegido}. Ganador: {nombre_ganador}"
+                if carrera.dividendo is None:
+                    # Nadie acerto: se devuelve la apuesta
+                    premio = apuesta.monto
+                    usuarios = self.liquidacion.liquidar(usuarios, uid, "carreras", apuesta.monto, True, 1,
+                                                         detalles, unidad, extra, bote=False)
+                elif apuesta.eleccion == carrera.ganador:
+                    premio = int(apuesta.monto * carrera.dividendo)
+                    usuarios = self.liquidacion.liquidar(usuarios, uid, "carreras", apuesta.monto, True, None,
+                                                         detalles, unidad, {**extra, "dividendo": str(carrera.dividendo)},
+                                                         premio=premio, bote=False)
+                else:
+                    premio = 0
+                    usuarios = self.liquidacion.liquidar(usuarios, uid, "carreras", apuesta.monto, False, 0,
+                                                         detalles, unidad, extra, bote=False)
+                carrera.premios.append(premio)
+
+    def ultimos_ganadores(self, n=10):
+        """Ganadores de las ultimas carreras, la mas reciente primero."""
+        with self._lock:
+            carreras = list(self._carreras.values())
+        return [c.ganador for c in reversed(carreras) if c.ganador is not None][:n]
@@ -1,14 +1,18 @@
 import time
 import random
-from Funciones.historial import registrar_partida
+from contextlib import contextmanager
+from Funciones.bote import obtener_bote
+from juegos.liquidacion import FichasInsuficientes, Liquidacion
 
 class Juego:
-    def __init__(self, nombre_juego, usuarios, uid, gestionar_apuesta, guardar_datos):
+    def __init__(self, nombre_juego, usuarios, uid, gestionar_apuesta, guardar_datos, cargar_datos=None, confirmar_datos=None):
         self.nombre_juego = nombre_juego
         self.usuarios = usuarios
         self.uid = str(uid)
-        self.gestionar_apuesta = gestionar_apuesta
-        self.guardar_datos = guardar_datos
+        # Saldo e historial los aplica la liquidacion (ver juegos/liquidacion.py)
+        self.liquidacion = Liquidacion(gestionar_apuesta, guardar_datos, cargar_datos, confirmar_datos,
+                                       bote=obtener_bote())
+        self._lote = None  # UnidadDeTrabajo compartida mientras dura un lote()
 
     def solicitar_apuesta(self):
         try:
@@ -36,32 +40,26 @@ class Juego:
             return None
 
     def procesar_resultado(self, apuesta, gano, multiplicador, detalles="Sin detalles"):
-        fichas_antes = self.usuarios[self.uid]["fichas"] # Saldo real antes de la jugada
-        
-        self.usuarios = self.gestionar_apuesta(
-            self.usuarios, self.uid, apuesta, self.nombre_juego, gano, multiplicador
+        # El premio del bote se cobra en la misma liquidacion que la apuesta
+        self.usuarios, premio_bote = self.liquidacion.liquidar_con_bote(
+            self.usuarios, self.uid, self.nombre_juego, apuesta, gano, multiplicador, detalles, unidad=self._lote
         )
-        
-        fichas_despues = self.usuarios[self.uid]["fichas"]
-
-        if gano:
-            if multiplicador == 1:
-                resultado_txt = "empate"
-                valor_historial = 0
-            else:
-                resultado_txt = "gano"
-                valor_historial = fichas_despues - fichas_antes
-        else:
-            resultado_txt = "perdio"
-            valor_historial = -apuesta
-
-        registrar_partida(
-            self.uid, self.usuarios[self.uid]["nombre"], self.nombre_juego, 
-            apuesta, detalles, resultado_txt, valor_historial, fichas_antes, fichas_despues
-        )
-        
-        self.guardar_datos(self.usuarios)
+        if premio_bote:
+            print(f"\n*** ¡BOTE PROGRESIVO! Has ganado {premio_bote} fichas extra ***")
         return self.usuarios
+
+    @contextmanager
+    def lote(self):
+        """Agrupa varias apuestas seguidas del mismo usuario: se liquidan bajo
+        un unico bloqueo y saldo y partidas se guardan una sola vez al salir.
+        Requiere confirmar_datos."""
+        with self.liquidacion.lote(self.uid, self.usuarios) as (usuarios, unidad):
+            self.usuarios = usuarios
+            self._lote = unidad
+            try:
+                yield self
+            finally:
+                self._lote = None
         
     def animacion_espera(self, mensaje=""):
         if mensaje:
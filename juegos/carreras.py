@@ -1,16 +1,11 @@
 import random
 from juegos.base_juegos import *
+from juegos.motores import MOTORES
 
 class JuegoCarreras(Juego):
-    def __init__(self, usuarios, uid, gestionar_apuesta, guardar_datos):
-        super().__init__("carreras", usuarios, uid, gestionar_apuesta, guardar_datos)
-        
-        self.caballos = {
-            "1": {"nombre": "Secretariat", "prob": 40, "mult": 2},
-            "2": {"nombre": "Tamamo Cross", "prob": 30, "mult": 3},
-            "3": {"nombre": "Epona", "prob": 20, "mult": 4},
-            "4": {"nombre": "Tormenta China", "prob": 10, "mult": 5}
-        }
+    def __init__(self, usuarios, uid, gestionar_apuesta, guardar_datos, cargar_datos=None, confirmar_datos=None):
+        super().__init__("carreras", usuarios, uid, gestionar_apuesta, guardar_datos, cargar_datos, confirmar_datos)
+        self.caballos = MOTORES["carreras"].caballos
 
     def mostrar_menu_caballos(self):
         print("\n" + "="*35)
@@ -20,6 +15,9 @@ class JuegoCarreras(Juego):
             print(f"{k}. {v['nombre']} | x{v['mult']} (Exito: {v['prob']}%)")
         print("-" * 35)
 
+    def sortear_ganador(self):
+        return MOTORES["carreras"].sortear_ganador(random)
+
     def jugar(self):
         self.mostrar_menu_caballos()
         
@@ -35,15 +33,7 @@ class JuegoCarreras(Juego):
             
             self.animacion_espera(f"Se abren los partidores! Galopando con {caballo_elegido}...")
 
-            azar = random.randint(1, 100)
-            if azar <= 40: 
-                ganador_id = "1"
-            elif azar <= 70: 
-                ganador_id = "2"
-            elif azar <= 90: 
-                ganador_id = "3"
-            else: 
-                ganador_id = "4"
+            ganador_id = self.sortear_ganador()
 
             ganador_nombre = self.caballos[ganador_id]["nombre"]
             print(f"RESULTADO: El ganador es {ganador_nombre.upper()}!")
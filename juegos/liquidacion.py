@@ -0,0 +1,239 @@
+"""Liquidacion de apuestas: aplica un resultado al saldo y al historial.
+
+Los motores (juegos/motores.py) solo deciden el resultado; aqui se cobra la
+apuesta, se paga el premio, se registra la partida y se guarda, todo dentro
+del bloqueo del usuario. Una Liquidacion no guarda datos de ningun usuario,
+asi que la API crea una sola y la usa en todas las peticiones.
+
+Con un bote progresivo (Funciones/bote.py) cada apuesta de un juego que
+participa aporta su parte al bote y lo sortea; el premio se suma al saldo
+dentro del mismo bloqueo y los cambios del bote se guardan en la misma
+confirmacion que la apuesta (tambien dentro de un lote). Si no se pueden
+guardar, el premio vuelve al bote.
+"""
+import random
+from contextlib import contextmanager
+from fractions import Fraction
+
+from Funciones.bloqueos import bloqueo_usuario, bloqueo_usuarios
+from Funciones.historial import registrar_partida
+from Funciones.unidad_trabajo import UnidadDeTrabajo
+
+
+class FichasInsuficientes(Exception):
+    """El saldo del usuario no cubre la apuesta en el momento de liquidarla."""
+
+
+def respuesta_jugada(nombre_juego, resultado, fichas_finales):
+    """Respuesta de la API para una jugada resuelta por un motor."""
+    return {
+        "juego": nombre_juego,
+        **resultado.datos,
+        "resultado": resultado.resultado,
+        "fichas_finales": fichas_finales,
+        "detalles": resultado.detalles,
+    }
+
+
+def aplicar_apuesta(gestionar_apuesta, usuarios, uid, apuesta, nombre_juego, gano, multiplicador, premio=None):
+    """Cobra la apuesta y paga el premio sobre `usuarios`. Con `premio` se paga
+    esa cantidad exacta; un multiplicador fraccionario (Fraction) paga
+    apuesta * multiplicador redondeado a la baja, para que el saldo siga
+    siendo entero."""
+    if premio is None and gano and isinstance(multiplicador, Fraction):
+        premio = int(apuesta * multiplicador)
+    if premio is None:
+        return gestionar_apuesta(usuarios, uid, apuesta, nombre_juego, gano, multiplicador)
+    usuarios = gestionar_apuesta(usuarios, uid, apuesta, nombre_juego, False, 0)
+    usuarios[str(uid)]["fichas"] += premio
+    return usuarios
+
+
+def clasificar_resultado(fichas_antes, fichas_despues):
+    """Texto del resultado y ganancia que se guardan en el historial, segun lo
+    cobrado de verdad: gano si se cobra mas de lo apostado, empate si lo mismo
+    y perdio si menos (un premio fraccionario redondeado a la baja puede
+    quedarse por debajo de la apuesta)."""
+    ganancia = fichas_despues - fichas_antes
+    if ganancia > 0:
+        return "gano", ganancia
+    if ganancia == 0:
+        return "empate", 0
+    return "perdio", ganancia
+
+
+class Liquidacion:
+    def __init__(self, gestionar_apuesta, guardar_datos, cargar_datos=None, confirmar_datos=None, bote=None):
+        self.gestionar_apuesta = gestionar_apuesta
+        self.guardar_datos = guardar_datos
+        # Opcional: cargar_datos(uid) -> {uid: datos}, para releer el usuario dentro del bloqueo
+        self.cargar_datos = cargar_datos
+        # Opcional: confirmar_datos(usuarios, partidas, bote) guarda saldo, partida y bote a la vez
+        self.confirmar_datos = confirmar_datos
+        # Opcional: bote.BoteProgresivo que se alimenta y se sortea en cada apuesta
+        self.bote = bote
+
+    def liquidar(self, usuarios, uid, nombre_juego, apuesta, gano, multiplicador,
+                 detalles="Sin detalles", unidad=None, extra=None, premio=None, bote=True):
+        """Cobra la apuesta, paga el premio y registra la partida (con los
+        campos de `extra`). Devuelve el diccionario de usuarios actualizado.
+
+        Con `premio` se paga esa cantidad exacta en vez de apuesta *
+        multiplicador (apuestas mutuas, ver aplicar_apuesta()). Con
+        bote=False la apuesta no aporta al bote ni lo sortea aunque el juego
+        participe (en las mutuas lo apostado es de la bolsa).
+
+        Con `unidad` (dentro de un lote()) no se relee el usuario ni se guarda:
+        lo hace el lote al terminar.
+        """
+        return self.liquidar_con_bote(usuarios, uid, nombre_juego, apuesta, gano, multiplicador,
+                                      detalles, unidad, extra, premio, bote)[0]
+
+    def liquidar_con_bote(self, usuarios, uid, nombre_juego, apuesta, gano, multiplicador,
+                          detalles="Sin detalles", unidad=None, extra=None, premio=None, bote=True):
+        """Como liquidar(), pero devuelve (usuarios, fichas del bote ganadas)."""
+        uid = str(uid)
+        # Leer saldo, aplicar la apuesta y guardar es una seccion critica por
+        # usuario: apuestas del mismo usuario se ejecutan en orden y las de
+        # usuarios distintos en paralelo.
+        with bloqueo_usuario(uid):
+            en_lote = unidad is not None
+            if not en_lote:
+                if self.cargar_datos is not None:
+                    usuarios = self.cargar_datos(uid)
+                unidad = UnidadDeTrabajo(self.confirmar_datos) if self.confirmar_datos is not None else None
+
+            fichas_antes = usuarios[uid]["fichas"] # Saldo real antes de la jugada
+            if apuesta > fichas_antes:
+                raise FichasInsuficientes(f"Fichas insuficientes: {fichas_antes} disponibles")
+
+            usuarios = aplicar_apuesta(self.gestionar_apuesta, usuarios, uid, apuesta, nombre_juego,
+                                       gano, multiplicador, premio)
+
+            premio_bote, cambios_bote = 0, None
+            if bote and self.bote is not None and self.bote.participa(nombre_juego):
+                premio_bote, cambios_bote = self.bote.jugar(uid, nombre_juego, apuesta)
+                if premio_bote:
+                    usuarios[uid]["fichas"] += premio_bote
+                    extra = {**(extra or {}), "bote": premio_bote}
+
+            fichas_despues = usuarios[uid]["fichas"]
+
+            resultado_txt, valor_historial = clasificar_resultado(fichas_antes, fichas_despues)
+
+            registrar_partida(
+                uid, usuarios[uid]["nombre"], nombre_juego,
+                apuesta, detalles, resultado_txt, valor_historial, fichas_antes, fichas_despues,
+                unidad=unidad, extra=extra
+            )
+
+            if unidad is not None:
+                unidad.marcar_usuario(uid, usuarios[uid])
+                if cambios_bote is not None:
+                    # Si la unidad no llega a guardarse el premio vuelve al bote
+                    unidad.marcar_bote(cambios_bote, lambda: self.bote.devolver(cambios_bote))
+                if not en_lote:
+                    unidad.confirmar()
+            else:
+                try:
+                    self.guardar_datos(usuarios)
+                except Exception:
+                    if cambios_bote is not None:
+                        self.bote.devolver(cambios_bote)
+                    raise
+                if cambios_bote is not None and self.bote.almacen is not None:
+                    self.bote.almacen.confirmar({}, [], bote=cambios_bote)
+        return usuarios, premio_bote
+
+    @staticmethod
+    def _azar(apuesta, posicion):
+        """Campos que permiten recalcular la partida (vacio sin posicion del flujo)."""
+        extra = {}
+        if posicion is not None:
+            extra["azar"] = posicion
+            opciones = {k: v for k, v in apuesta._asdict().items() if k != "monto" and v is not None}
+            if opciones:
+                extra["opciones"] = opciones
+        return extra
+
+    def jugar(self, motor, uid, apuesta, usuarios=None, unidad=None, rng=random):
+        """Resuelve `apuesta` (una motores.Apuesta) con el motor y la liquida.
+        Devuelve (usuarios, respuesta).
+
+        Si `rng` es un flujo reproducible (aleatoriedad.FlujoPCG) la partida
+        guarda su posicion y las opciones de la apuesta para poder recalcularla."""
+        posicion = rng.posicion() if hasattr(rng, "posicion") else None
+        resultado = motor.resolver(apuesta, rng)
+        usuarios, premio_bote = self.liquidar_con_bote(usuarios, uid, motor.nombre, apuesta.monto,
+                                                       resultado.gano, resultado.multiplicador, resultado.detalles,
+                                                       unidad, self._azar(apuesta, posicion))
+        respuesta = respuesta_jugada(motor.nombre, resultado, usuarios[str(uid)]["fichas"])
+        if premio_bote:
+            respuesta["bote"] = premio_bote
+        return usuarios, respuesta
+
+    def jugar_varias(self, motor, uid, apuestas, usuarios, unidad, rng=random):
+        """Resuelve todas las apuestas con un solo sorteo (motor.resolver_varias)
+        y las liquida dentro de un lote(). Cada apuesta se registra como una
+        partida con la misma posicion del flujo. Devuelve (usuarios, resultados)."""
+        posicion = rng.posicion() if hasattr(rng, "posicion") else None
+        resultados = motor.resolver_varias(apuestas, rng)
+        for apuesta, resultado in zip(apuestas, resultados):
+            usuarios = self.liquidar(usuarios, uid, motor.nombre, apuesta.monto,
+                                     resultado.gano, resultado.multiplicador, resultado.detalles, unidad,
+                                     self._azar(apuesta, posicion))
+        return usuarios, resultados
+
+    def jugar_ronda(self, motor, jugadas, usuarios, unidad, rng=random, extra=None):
+        """Resuelve con un solo sorteo las apuestas de varios usuarios
+        (`jugadas`: lista de (uid, Apuesta)) y las liquida dentro de un
+        lote_usuarios(). La apuesta que el saldo del usuario ya no cubre se
+        anula sin cobrarla. Devuelve (usuarios, resultados, liquidadas), con
+        liquidadas[i] a False en las anuladas."""
+        posicion = rng.posicion() if hasattr(rng, "posicion") else None
+        resultados = motor.resolver_varias([apuesta for _, apuesta in jugadas], rng)
+        liquidadas = []
+        for (uid, apuesta), resultado in zip(jugadas, resultados):
+            uid = str(uid)
+            cubierta = uid in usuarios and apuesta.monto <= usuarios[uid]["fichas"]
+            if cubierta:
+                usuarios = self.liquidar(usuarios, uid, motor.nombre, apuesta.monto,
+                                         resultado.gano, resultado.multiplicador, resultado.detalles, unidad,
+                                         {**self._azar(apuesta, posicion), **(extra or {})})
+            liquidadas.append(cubierta)
+        return usuarios, resultados, liquidadas
+
+    @contextmanager
+    def lote(self, uid, usuarios=None):
+        """Agrupa varias apuestas seguidas del mismo usuario: se liquidan bajo
+        un unico bloqueo y saldo y partidas se guardan una sola vez al salir.
+        Devuelve (usuarios, unidad); la unidad se pasa a liquidar()/jugar().
+        Requiere confirmar_datos."""
+        if self.confirmar_datos is None:
+            raise ValueError("lote() necesita confirmar_datos")
+        with bloqueo_usuario(str(uid)):
+            if self.cargar_datos is not None:
+                usuarios = self.cargar_datos(str(uid))
+            unidad = UnidadDeTrabajo(self.confirmar_datos)
+            try:
+                yield usuarios, unidad
+            finally:
+                # Lo ya liquidado se guarda aunque una apuesta posterior falle
+                unidad.confirmar()
+
+    @contextmanager
+    def lote_usuarios(self, uids):
+        """Como lote() pero para varios usuarios: se bloquean todos, se leen
+        y al salir se guardan juntos en una sola confirmacion."""
+        if self.confirmar_datos is None or self.cargar_datos is None:
+            raise ValueError("lote_usuarios() necesita cargar_datos y confirmar_datos")
+        uids = {str(uid) for uid in uids}
+        with bloqueo_usuarios(uids):
+            usuarios = {}
+            for uid in uids:
+                usuarios.update(self.cargar_datos(uid))
+            unidad = UnidadDeTrabajo(self.confirmar_datos)
+            try:
+                yield usuarios, unidad
+            finally:
+                unidad.confirmar()
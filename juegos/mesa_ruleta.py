@@ -0,0 +1,139 @@
+"""Mesa de ruleta compartida: rondas con un solo giro para todos los jugadores.
+
+Las apuestas de todos los usuarios se acumulan en la ronda abierta. Al
+cerrarla se gira una vez y se liquidan todas juntas: una pasada por las
+apuestas (una comprobacion de bit por apuesta, ver MotorRuleta) y una sola
+confirmacion de saldos y partidas para todos los usuarios de la ronda.
+
+Nada se cobra al apostar, solo se comprueba que el saldo cubre lo apostado
+en la ronda. Si al girar el saldo ya no alcanza (porque el usuario ha jugado
+en otra parte entretanto) la apuesta se anula.
+
+El ritmo de las rondas lo marca un planificador.PlanificadorRondas que la
+API arranca al iniciar.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from Funciones.aleatoriedad import obtener_aleatoriedad
+from Funciones.identificadores import nuevo_id_ronda
+from juegos.liquidacion import FichasInsuficientes
+from juegos.motores import MOTORES, color_ruleta
+
+
+class MesaLlena(Exception):
+    """La ronda abierta ya tiene el maximo de apuestas."""
+
+
+class Ronda:
+    def __init__(self, segundos):
+        self.id = nuevo_id_ronda()
+        self.estado = "abierta"  # abierta -> girando -> liquidada (o fallida)
+        self.abierta_en = time.time()
+        self.cierra_en = self.abierta_en + segundos
+        self.jugadas = []        # (uid, Apuesta)
+        self.comprometido = {}   # uid -> fichas apostadas en la ronda
+        self.numero_ganador = None
+        self.resultados = []     # motores.Resultado, o None si se anulo
+
+    def resumen(self, uid=None):
+        datos = {
+            "ronda": self.id,
+            "estado": self.estado,
+            "abierta_en": self.abierta_en,
+            "cierra_en": self.cierra_en,
+            "apuestas": len(self.jugadas),
+            "jugadores": len(self.comprometido),
+            "total_apostado": sum(self.comprometido.values()),
+        }
+        if self.numero_ganador is not None:
+            datos["numero_ganador"] = self.numero_ganador
+            datos["color_ganador"] = color_ruleta(self.numero_ganador)
+        if uid is not None:
+            datos["mis_apuestas"] = [self._apuesta(i) for i, (u, _) in enumerate(self.jugadas) if u == uid]
+        return datos
+
+    def _apuesta(self, i):
+        _, apuesta = self.jugadas[i]
+        datos = {"tipo_apuesta": apuesta.tipo_apuesta, "numeros": list(MOTORES["ruleta"].clave(apuesta)[1]),
+                 "monto": apuesta.monto}
+        if self.estado == "liquidada":
+            resultado = self.resultados[i]
+            datos["resultado"] = resultado.resultado if resultado else "anulada"
+            datos["fichas_ganadas"] = resultado.datos["fichas_ganadas"] if resultado else 0
+        return datos
+
+
+class MesaRuleta:
+    def __init__(self, liquidacion, segundos_ronda=30, max_apuestas=10000, rondas_guardadas=50,
+                 servicio=obtener_aleatoriedad):
+        self.liquidacion = liquidacion
+        self.segundos_ronda = segundos_ronda
+        self.max_apuestas = max_apuestas
+        self.rondas_guardadas = rondas_guardadas
+        self.servicio = servicio
+        self._lock = threading.Lock()
+        self._ronda = Ronda(segundos_ronda)
+        self._rondas = OrderedDict()  # ultimas rondas cerradas, por id
+
+    @property
+    def ronda_actual(self):
+        return self._ronda
+
+    def ronda(self, ronda_id):
+        """La ronda abierta o una de las ultimas cerradas (None si no se conoce)."""
+        with self._lock:
+            if ronda_id == self._ronda.id:
+                return self._ronda
+            return self._rondas.get(ronda_id)
+
+    def apostar(self, uid, apuestas, fichas):
+        """Añade las apuestas (ya validadas) de `uid` a la ronda abierta si su
+        saldo `fichas` cubre todo lo que lleva apostado en ella."""
+        uid = str(uid)
+        with self._lock:
+            ronda = self._ronda
+            if len(ronda.jugadas) + len(apuestas) > self.max_apuestas:
+                raise MesaLlena("La ronda está completa, espera a la siguiente")
+            comprometido = ronda.comprometido.get(uid, 0) + sum(a.monto for a in apuestas)
+            if comprometido > fichas:
+                raise FichasInsuficientes(f"Fichas insuficientes: {fichas} disponibles")
+            ronda.jugadas.extend((uid, apuesta) for apuesta in apuestas)
+            ronda.comprometido[uid] = comprometido
+            return ronda
+
+    def girar(self):
+        """Cierra la ronda abierta, abre la siguiente y liquida la cerrada con un giro."""
+        with self._lock:
+            ronda = self._ronda
+            self._ronda = Ronda(self.segundos_ronda)
+            ronda.estado = "girando"
+            self._rondas[ronda.id] = ronda
+            while len(self._rondas) > self.rondas_guardadas:
+                self._rondas.popitem(last=False)
+
+        motor = MOTORES["ruleta"]
+        rng = self.servicio().flujo()
+        try:
+            if ronda.jugadas:
+                with self.liquidacion.lote_usuarios(ronda.comprometido) as (usuarios, unidad):
+                    _, resultados, liquidadas = self.liquidacion.jugar_ronda(
+                        motor, ronda.jugadas, usuarios, unidad, rng, extra={"ronda": ronda.id})
+                ronda.resultados = [r if ok else None for r, ok in zip(resultados, liquidadas)]
+                ronda.numero_ganador = resultados[0].datos["numero_ganador"]
+            else:
+                ronda.numero_ganador = motor.girar(rng)
+        except Exception:
+            ronda.estado = "fallida"
+            raise
+        ronda.estado = "liquidada"
+        return ronda
+
+    cerrar_ronda = girar  # lo que llama el planificador
+
+    def ultimos_numeros(self, n=10):
+        """Numeros ganadores de las ultimas rondas, el mas reciente primero."""
+        with self._lock:
+            rondas = list(self._rondas.values())
+        return [r.numero_ganador for r in reversed(rondas) if r.numero_ganador is not None][:n]
@@ -0,0 +1,404 @@
+"""Motores de juego: las reglas de cada juego, sin estado.
+
+Cada motor se crea una sola vez al importar el modulo y se comparte entre
+peticiones, lotes, la simulacion y el calculo de probabilidades. No guarda
+usuarios ni saldos: resolver(apuesta, rng) solo decide el resultado y el
+multiplicador. Aplicar ese resultado al saldo y al historial es cosa de la
+liquidacion (juegos/liquidacion.py).
+
+Los motores no se modifican: para cambiar una tabla de pagos se crea un
+motor nuevo y se sustituye en MOTORES.
+"""
+import random
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+from Funciones.configuracion import obtener_seccion
+from juegos.muestreo import MuestreoPonderado
+from juegos.rodillos import MAQUINAS, TablaRodillos
+
+
+class Apuesta(NamedTuple):
+    monto: int
+    tipo_apuesta: Optional[str] = None  # ruleta: "1" pleno, "2" pares, "3" impares o un tipo de PAGOS_RULETA
+    numero: Optional[int] = None        # ruleta, pleno ("1")
+    eleccion: Optional[str] = None      # carreras: caballo
+    numeros: Optional[tuple] = None     # ruleta: numeros cubiertos (docena/columna: 1-3)
+
+
+class Resultado(NamedTuple):
+    gano: bool          # True tambien en empate (se devuelve la apuesta)
+    multiplicador: int
+    resultado: str      # "gano", "perdio" o "empate"
+    detalles: str
+    datos: dict         # campos propios del juego para la respuesta
+
+
+class Motor:
+    nombre = ""
+
+    def __setattr__(self, nombre, valor):
+        if getattr(self, "_congelado", False):
+            raise AttributeError("Los motores no se modifican: crea uno nuevo")
+        object.__setattr__(self, nombre, valor)
+
+    def configuracion(self):
+        """Tupla con todo lo que determina probabilidades y pagos."""
+        raise NotImplementedError
+
+    def validar(self, apuesta):
+        """Mensaje de error si la apuesta no es valida para este juego, o None."""
+        return None
+
+    def resolver(self, apuesta, rng=random):
+        raise NotImplementedError
+
+# ══════════════════════════════════════════════════════════════
+# DADOS
+# ══════════════════════════════════════════════════════════════
+
+class MotorDados(Motor):
+    """Duelo de un dado contra la banca: gana el mayor, el empate devuelve la apuesta."""
+    nombre = "dados"
+
+    def __init__(self, caras=6, pagos=(("gano", 2), ("empate", 1), ("perdio", 0))):
+        self.caras = caras
+        self.pagos = MappingProxyType(dict(pagos))
+        self._congelado = True
+
+    def configuracion(self):
+        return (self.caras, tuple(sorted(self.pagos.items())))
+
+    @staticmethod
+    def resolver_duelo(tiro_jugador, tiro_banca):
+        if tiro_jugador > tiro_banca:
+            return "gano"
+        elif tiro_banca > tiro_jugador:
+            return "perdio"
+        return "empate"
+
+    def resolver(self, apuesta, rng=random):
+        tiro_jugador = rng.randint(1, self.caras)
+        tiro_banca = rng.randint(1, self.caras)
+        resultado = self.resolver_duelo(tiro_jugador, tiro_banca)
+        return Resultado(
+            gano=resultado != "perdio",
+            multiplicador=self.pagos[resultado],
+            resultado=resultado,
+            detalles=f"Jugador: {tiro_jugador} vs Banca: {tiro_banca}",
+            datos={"tiro_jugador": tiro_jugador, "tiro_banca": tiro_banca},
+        )
+
+# ══════════════════════════════════════════════════════════════
+# RULETA
+# ══════════════════════════════════════════════════════════════
+
+ROJOS = frozenset({1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36})
+
+# Lo que devuelve cada ficha ganadora, incluida la apostada (ruleta europea)
+PAGOS_RULETA = {
+    "pleno": 36, "caballo": 18, "calle": 12, "cuadro": 9, "seisena": 6,
+    "docena": 3, "columna": 3,
+    "rojo": 2, "negro": 2, "par": 2, "impar": 2, "falta": 2, "pasa": 2,
+}
+
+# Tipos antiguos de la API: "1" pleno, "2" pares y "3" impares
+TIPOS_HEREDADOS = {"1": "pleno", "2": "par", "3": "impar"}
+
+
+def _mascara(numeros):
+    mascara = 0
+    for n in numeros:
+        mascara |= 1 << n
+    return mascara
+
+
+def _catalogo_ruleta():
+    """{(tipo, numeros): mascara de 37 bits} con todas las apuestas del tapete.
+
+    En las apuestas interiores `numeros` son los numeros cubiertos, ordenados;
+    en docena y columna, su indice (1-3); en las sencillas, una tupla vacia."""
+    catalogo = {}
+
+    def añadir(tipo, numeros, clave=None):
+        catalogo[(tipo, tuple(sorted(numeros)) if clave is None else clave)] = _mascara(numeros)
+
+    # El tapete tiene 12 filas de 3: el n esta en la fila (n-1)//3, columna (n-1)%3
+    for n in range(37):
+        añadir("pleno", [n])
+    for n in range(1, 37):
+        if (n - 1) % 3 < 2:
+            añadir("caballo", [n, n + 1])
+            if n <= 32:
+                añadir("cuadro", [n, n + 1, n + 3, n + 4])
+        if n <= 33:
+            añadir("caballo", [n, n + 3])
+    for n in (1, 2, 3):
+        añadir("caballo", [0, n])
+    for fila in range(12):
+        añadir("calle", range(3 * fila + 1, 3 * fila + 4))
+        if fila < 11:
+            añadir("seisena", range(3 * fila + 1, 3 * fila + 7))
+    añadir("calle", [0, 1, 2])
+    añadir("calle", [0, 2, 3])
+    for i in (1, 2, 3):
+        añadir("docena", range(12 * i - 11, 12 * i + 1), (i,))
+        añadir("columna", range(i, 37, 3), (i,))
+
+    sencillas = {
+        "rojo": ROJOS,
+        "negro": set(range(1, 37)) - ROJOS,
+        "par": range(2, 37, 2),
+        "impar": range(1, 37, 2),
+        "falta": range(1, 19),
+        "pasa": range(19, 37),
+    }
+    for tipo, numeros in sencillas.items():
+        añadir(tipo, numeros, ())
+    return MappingProxyType(catalogo)
+
+
+CATALOGO_RULETA = _catalogo_ruleta()
+
+
+def color_ruleta(numero):
+    if numero == 0:
+        return "verde"
+    return "rojo" if numero in ROJOS else "negro"
+
+
+class MotorRuleta(Motor):
+    """Ruleta europea (0-36). Cada apuesta del tapete es una mascara de 37 bits
+    precalculada: gana si el bit del numero que sale esta a 1, asi que un giro
+    liquida cualquier numero de apuestas con una operacion por apuesta."""
+    nombre = "ruleta"
+    casillas = 37
+    TIPOS = tuple(TIPOS_HEREDADOS) + tuple(PAGOS_RULETA)
+
+    def __init__(self, pago_pleno=36, pago_paridad=2, pagos=None):
+        pagos = {**PAGOS_RULETA, **(pagos or {})}
+        pagos["pleno"] = pago_pleno
+        pagos["par"] = pagos["impar"] = pago_paridad
+        self.numeros = range(self.casillas)
+        self.pagos = MappingProxyType(pagos)
+        self.catalogo = CATALOGO_RULETA
+        self._congelado = True
+
+    def configuracion(self):
+        return (self.casillas, tuple(sorted(self.pagos.items())))
+
+    @staticmethod
+    def clave(apuesta):
+        """(tipo, numeros) con el que se busca la apuesta en el catalogo."""
+        tipo = TIPOS_HEREDADOS.get(apuesta.tipo_apuesta, apuesta.tipo_apuesta)
+        if apuesta.tipo_apuesta == "1":
+            return tipo, (apuesta.numero,)
+        return tipo, tuple(sorted(apuesta.numeros or ()))
+
+    def ejemplo(self, tipo):
+        """Una apuesta valida del tipo dado (todas las de un tipo pagan igual)."""
+        if tipo in TIPOS_HEREDADOS:
+            return Apuesta(1, tipo, 17 if tipo == "1" else None)
+        numeros = next(n for t, n in self.catalogo if t == tipo)
+        return Apuesta(1, tipo, numeros=numeros)
+
+    def validar(self, apuesta):
+        if apuesta.tipo_apuesta not in self.TIPOS:
+            return "Tipo de apuesta inválido"
+        # Los tipos heredados aceptan cualquier numero (un pleno fuera del tapete pierde)
+        if apuesta.tipo_apuesta not in TIPOS_HEREDADOS and self.clave(apuesta) not in self.catalogo:
+            return f"Números no válidos para {apuesta.tipo_apuesta}"
+        return None
+
+    def calcular_multiplicador(self, apuesta, bola):
+        """Multiplicador que paga la apuesta si sale `bola` (0 si pierde)."""
+        clave = self.clave(apuesta)
+        if self.catalogo.get(clave, 0) >> bola & 1:
+            return self.pagos[clave[0]]
+        return 0
+
+    def girar(self, rng=random):
+        return rng.randint(0, self.casillas - 1)
+
+    def resolver(self, apuesta, rng=random):
+        return self.resolver_giro(apuesta, self.girar(rng))
+
+    def resolver_varias(self, apuestas, rng=random):
+        """Un solo giro para todas las apuestas. Consume del rng lo mismo que
+        resolver(), asi que cada apuesta se reproduce por separado."""
+        bola = self.girar(rng)
+        return [self.resolver_giro(apuesta, bola) for apuesta in apuestas]
+
+    def resolver_giro(self, apuesta, bola):
+        multiplicador = self.calcular_multiplicador(apuesta, bola)
+        gana = multiplicador > 0
+
+        if apuesta.tipo_apuesta == "1":
+            detalles = f"Apostó al número {apuesta.numero}. Salió el {bola}."
+        elif apuesta.tipo_apuesta == "2":
+            detalles = f"Apostó a Rojo (Pares). Salió el {bola}."
+        elif apuesta.tipo_apuesta == "3":
+            detalles = f"Apostó a Negro (Impares). Salió el {bola}."
+        else:
+            _, numeros = self.clave(apuesta)
+            cubiertos = f" {'-'.join(map(str, numeros))}" if numeros else ""
+            detalles = f"Apostó a {apuesta.tipo_apuesta}{cubiertos}. Salió el {bola} ({color_ruleta(bola)})."
+
+        return Resultado(
+            gano=gana,
+            multiplicador=multiplicador,
+            resultado="gano" if gana else "perdio",
+            detalles=detalles,
+            datos={
+                "tipo_apuesta": apuesta.tipo_apuesta,
+                "numero_ganador": bola,
+                "color_ganador": color_ruleta(bola),
+                "fichas_ganadas": apuesta.monto * multiplicador if gana else 0,
+            },
+        )
+
+# ══════════════════════════════════════════════════════════════
+# TRAGAMONEDAS
+# ══════════════════════════════════════════════════════════════
+
+CANTIDADES = {1: "Uno", 2: "Dos", 3: "Tres", 4: "Cuatro", 5: "Cinco", 6: "Seis"}
+
+
+class MotorTragamonedas(Motor):
+    """Tragamonedas configurable: tiras de rodillo ponderadas, lineas de pago,
+    comodin y scatter (ver juegos/rodillos.py). Sin argumentos es la maquina
+    clasica: tres rodillos, una linea y tres iguales pagan (simbolo + 2) * 10."""
+    nombre = "tragamonedas"
+
+    def __init__(self, rodillos=None, filas=1, lineas=None, pagos=None, comodin=None, scatter=None,
+                 pagos_scatter=None, apuesta_maxima=10):
+        clasica = MAQUINAS["clasica"]
+        self.tabla = TablaRodillos(
+            rodillos if rodillos is not None else clasica["rodillos"],
+            filas,
+            lineas if lineas is not None else clasica["lineas"],
+            pagos if pagos is not None else clasica["pagos"],
+            comodin, scatter, pagos_scatter,
+        )
+        self.apuesta_maxima = apuesta_maxima
+        self._congelado = True
+
+    @classmethod
+    def maquina(cls, definicion):
+        """Motor a partir del nombre de una maquina de MAQUINAS o de su definicion."""
+        if isinstance(definicion, str):
+            definicion = MAQUINAS[definicion]
+        return cls(**definicion)
+
+    def configuracion(self):
+        t = self.tabla
+        return (t.rodillos, t.filas, t.lineas, tuple(sorted((s, tuple(sorted(p.items()))) for s, p in t.pagos.items())),
+                t.comodin, t.scatter, tuple(sorted(t.pagos_scatter.items())))
+
+    def validar(self, apuesta):
+        if apuesta.monto > self.apuesta_maxima:
+            return f"Apuesta máxima permitida: {self.apuesta_maxima}"
+        return None
+
+    def girar(self, rng=random):
+        return [rng.randint(0, longitud - 1) for longitud in self.tabla.longitudes]
+
+    def resolver(self, apuesta, rng=random):
+        paradas = self.girar(rng)
+        multiplicador, premiadas, scatters = self.tabla.evaluar(paradas)
+        gana = multiplicador > 0
+
+        if gana:
+            premios = [f"{CANTIDADES.get(p['cantidad'], p['cantidad'])} {p['simbolo']} seguidos." for p in premiadas]
+            if self.tabla.pagos_scatter.get(scatters):
+                premios.append(f"{scatters} scatter.")
+            detalles = "¡¡ENHORABUENA HAS GANADO!! " + " ".join(premios)
+        else:
+            detalles = "¡¡HAS PERDIDO LA MANUTENCION DE TUS HIJOS!!"
+
+        # El premio se redondea a la baja: con pocas fichas puede no llegar a la apuesta
+        fichas_ganadas = int(apuesta.monto * multiplicador) if gana else 0
+        if fichas_ganadas > apuesta.monto:
+            resultado = "gano"
+        elif fichas_ganadas == apuesta.monto:
+            resultado = "empate"
+        else:
+            resultado = "perdio"
+
+        ventana = self.tabla.ventana(paradas)
+        return Resultado(
+            gano=gana,
+            multiplicador=multiplicador,
+            resultado=resultado,
+            detalles=detalles,
+            datos={
+                "combinacion": ventana[0] if self.tabla.filas == 1 else ventana,
+                "multiplicador_aplicado": multiplicador if isinstance(multiplicador, int) else float(multiplicador),
+                "lineas_premiadas": premiadas,
+                "fichas_ganadas": fichas_ganadas,
+            },
+        )
+
+# ══════════════════════════════════════════════════════════════
+# CARRERAS
+# ══════════════════════════════════════════════════════════════
+
+CABALLOS = {
+    "1": {"nombre": "Secretariat", "prob": 40, "mult": 2},
+    "2": {"nombre": "Tamamo Cross", "prob": 30, "mult": 3},
+    "3": {"nombre": "Epona", "prob": 20, "mult": 4},
+    "4": {"nombre": "Tormenta China", "prob": 10, "mult": 5}
+}
+
+
+class MotorCarreras(Motor):
+    """Gana un caballo segun su peso "prob" (en %) y paga su multiplicador.
+    Para añadir caballos o cambiar las cuotas basta con cambiar la tabla."""
+    nombre = "carreras"
+
+    def __init__(self, caballos=CABALLOS):
+        self.caballos = MappingProxyType({k: MappingProxyType(dict(v)) for k, v in caballos.items()})
+        self.muestreo = MuestreoPonderado({k: v["prob"] for k, v in self.caballos.items()})
+        self._congelado = True
+
+    def configuracion(self):
+        return tuple((k, v["prob"], v["mult"]) for k, v in self.caballos.items())
+
+    def validar(self, apuesta):
+        if apuesta.eleccion not in self.caballos:
+            return "Ese caballo no existe"
+        return None
+
+    def sortear_ganador(self, rng=random):
+        return self.muestreo.muestrear(rng)
+
+    def sortear_ganadores(self, n, rng=random):
+        return self.muestreo.muestrear_lote(n, rng)
+
+    def resolver(self, apuesta, rng=random):
+        ganador_id = self.sortear_ganador(rng)
+        elegido = self.caballos[apuesta.eleccion]
+        gano = apuesta.eleccion == ganador_id
+        ganador_nombre = self.caballos[ganador_id]["nombre"]
+
+        return Resultado(
+            gano=gano,
+            multiplicador=elegido["mult"],
+            resultado="gano" if gano else "perdio",
+            detalles=f"Aposto por {elegido['nombre']}. Ganador: {ganador_nombre}",
+            datos={
+                "caballo_elegido": elegido["nombre"],
+                "ganador": ganador_id,
+                "nombre_ganador": ganador_nombre,
+                "fichas_ganadas": apuesta.monto * elegido["mult"] if gano else 0,
+            },
+        )
+
+
+MOTORES = {
+    "dados": MotorDados(),
+    "ruleta": MotorRuleta(),
+    # config.json: tragamonedas.maquina es el nombre de una de MAQUINAS o una definicion completa
+    "tragamonedas": MotorTragamonedas.maquina(obtener_seccion("tragamonedas").get("maquina", "clasica")),
+    "carreras": MotorCarreras(),
+}
@@ -0,0 +1,62 @@
+"""Muestreo ponderado por el metodo alias.
+
+Se construye una vez a partir de una tabla {valor: peso} y cada sorteo cuesta
+O(1) sea cual sea el numero de opciones: un solo randint elige columna y
+umbral. Con pesos enteros las probabilidades son exactamente peso / total.
+"""
+import random
+
+
+class MuestreoPonderado:
+    def __init__(self, pesos):
+        """`pesos` es un diccionario {valor: peso entero >= 0}, con algun peso positivo."""
+        if any(not isinstance(p, int) or p < 0 for p in pesos.values()):
+            raise ValueError("Los pesos deben ser enteros no negativos")
+        self.valores = tuple(pesos)
+        self.pesos = tuple(pesos.values())
+        self.total = sum(self.pesos)
+        if not self.valores or self.total == 0:
+            raise ValueError("Hace falta al menos un peso positivo")
+
+        # Metodo alias (Vose) en aritmetica entera: cada columna tiene
+        # capacidad `total`; la columna i se queda `umbral[i]` y el resto
+        # se lo cede a alias[i].
+        n = len(self.pesos)
+        escalados = [p * n for p in self.pesos]
+        self.umbral = [self.total] * n
+        self.alias = list(range(n))
+        pequenos = [i for i, p in enumerate(escalados) if p < self.total]
+        grandes = [i for i, p in enumerate(escalados) if p >= self.total]
+        while pequenos and grandes:
+            s, g = pequenos.pop(), grandes.pop()
+            self.umbral[s] = escalados[s]
+            self.alias[s] = g
+            escalados[g] -= self.total - escalados[s]
+            (pequenos if escalados[g] < self.total else grandes).append(g)
+        self.umbral = tuple(self.umbral)
+        self.alias = tuple(self.alias)
+
+    def probabilidad(self, valor):
+        return self.pesos[self.valores.index(valor)] / self.total
+
+    def _indice(self, x):
+        columna, resto = divmod(x, self.total)
+        return columna if resto < self.umbral[columna] else self.alias[columna]
+
+    def muestrear(self, rng=random):
+        return self.valores[self._indice(rng.randint(0, len(self.valores) * self.total - 1))]
+
+    def muestrear_lote(self, n, rng=random):
+        limite = len(self.valores) * self.total - 1
+        return [self.valores[self._indice(rng.randint(0, limite))] for _ in range(n)]
+
+    def indices_numpy(self, generador, n):
+        """`n` sorteos vectorizados con un numpy.random.Generator. Devuelve
+        posiciones en self.valores (array de enteros)."""
+        import numpy as np
+
+        x = generador.integers(0, len(self.valores) * self.total, n)
+        columna, resto = np.divmod(x, self.total)
+        umbral = np.asarray(self.umbral)
+        alias = np.asarray(self.alias)
+        return np.where(resto < umbral[columna], columna, alias[columna])
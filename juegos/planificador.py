@@ -0,0 +1,43 @@
+"""Planificador de rondas para las mesas compartidas (ruleta, apuestas mutuas)."""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PlanificadorRondas:
+    """Cierra la ronda de `mesa` cuando llega su hora desde el bucle de asyncio.
+
+    `mesa` es cualquier objeto con `ronda_actual.cierra_en` (marca de tiempo)
+    y un metodo `cerrar_ronda()`, que se ejecuta en un hilo aparte para no
+    parar el bucle de eventos mientras se guarda."""
+
+    def __init__(self, mesa):
+        self.mesa = mesa
+        self._tarea = None
+
+    async def _bucle(self):
+        bucle = asyncio.get_running_loop()
+        while True:
+            espera = self.mesa.ronda_actual.cierra_en - time.time()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            try:
+                await bucle.run_in_executor(None, self.mesa.cerrar_ronda)
+            except Exception:
+                # La ronda queda como "fallida"; la mesa sigue con la siguiente
+                logger.exception("No se pudo liquidar la ronda")
+
+    def iniciar(self):
+        if self._tarea is None:
+            self._tarea = asyncio.get_running_loop().create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
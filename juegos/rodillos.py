@@ -0,0 +1,179 @@
+"""Tablas precalculadas de una tragamonedas: tiras, lineas de pago y premios.
+
+Una maquina se describe con:
+
+* rodillos: una tira de simbolos (enteros 0..S-1) por rodillo. Cada posicion
+  de la tira es una parada equiprobable, asi que repetir un simbolo en la
+  tira lo hace mas probable.
+* filas: simbolos visibles de cada rodillo a partir de la parada.
+* lineas: para cada linea de pago, la fila que toma de cada rodillo.
+* pagos: {simbolo: {cantidad: pago}} por linea, en apuestas por linea, para
+  `cantidad` simbolos seguidos desde el primer rodillo.
+* comodin: simbolo que sustituye a cualquier otro en las lineas (opcional).
+* scatter: simbolo que paga en cualquier posicion de la ventana segun
+  pagos_scatter {cantidad: pago}, en apuestas totales (opcional).
+
+Al crear la tabla se calcula el premio de cada combinacion posible de una
+linea (S^rodillos entradas) y, para cada parada, lo que aporta cada fila al
+indice de esa tabla. Evaluar una tirada es entonces una suma y una consulta
+por linea, y lo mismo se hace con NumPy para millones de tiradas a la vez.
+"""
+from fractions import Fraction
+from itertools import product
+
+MAX_COMBINACIONES = 4_000_000
+
+
+class TablaRodillos:
+    def __init__(self, rodillos, filas, lineas, pagos, comodin=None, scatter=None, pagos_scatter=None):
+        self.rodillos = tuple(tuple(int(s) for s in tira) for tira in rodillos)
+        self.filas = int(filas)
+        self.lineas = tuple(tuple(int(f) for f in linea) for linea in lineas)
+        self.pagos = {int(s): {int(n): int(p) for n, p in tabla.items()} for s, tabla in pagos.items()}
+        self.comodin = comodin
+        self.scatter = scatter
+        self.pagos_scatter = {int(n): int(p) for n, p in (pagos_scatter or {}).items()}
+
+        if not self.rodillos or any(not tira for tira in self.rodillos):
+            raise ValueError("Cada rodillo necesita al menos un simbolo")
+        if not self.lineas:
+            raise ValueError("La maquina necesita al menos una linea de pago")
+        for linea in self.lineas:
+            if len(linea) != len(self.rodillos) or not all(0 <= f < self.filas for f in linea):
+                raise ValueError(f"Linea no valida: {linea}")
+        self.simbolos = 1 + max(max(tira) for tira in self.rodillos)
+        combinaciones = self.simbolos ** len(self.rodillos)
+        if combinaciones > MAX_COMBINACIONES:
+            raise ValueError(f"Demasiadas combinaciones por linea: {combinaciones}")
+
+        # Premio y (simbolo, cantidad) de cada combinacion de una linea, por indice
+        self.pago_linea = []
+        self.premio_linea = []
+        for combinacion in product(range(self.simbolos), repeat=len(self.rodillos)):
+            pago, simbolo, cantidad = self._evaluar_linea(combinacion)
+            self.pago_linea.append(pago)
+            self.premio_linea.append((simbolo, cantidad))
+
+        # aporte[r][parada][fila]: lo que suma el simbolo de esa fila al indice de la linea
+        self.ventanas = []
+        self.aporte = []
+        self.scatters = []
+        for r, tira in enumerate(self.rodillos):
+            peso = self.simbolos ** (len(self.rodillos) - 1 - r)
+            ventanas = [tuple(tira[(parada + f) % len(tira)] for f in range(self.filas))
+                        for parada in range(len(tira))]
+            self.ventanas.append(ventanas)
+            self.aporte.append([tuple(s * peso for s in v) for v in ventanas])
+            self.scatters.append([v.count(self.scatter) if self.scatter is not None else 0 for v in ventanas])
+
+    @property
+    def longitudes(self):
+        return tuple(len(tira) for tira in self.rodillos)
+
+    def _evaluar_linea(self, combinacion):
+        """(pago, simbolo, cantidad) de una linea; el comodin sustituye pero
+        tambien puede pagar por si mismo, y se queda el mejor de los dos."""
+        mejor = (0, None, 0)
+        if self.comodin is not None:
+            comodines = 0
+            for s in combinacion:
+                if s != self.comodin:
+                    break
+                comodines += 1
+            pago = self.pagos.get(self.comodin, {}).get(comodines, 0)
+            if pago:
+                mejor = (pago, self.comodin, comodines)
+
+        primero = next((s for s in combinacion if s != self.comodin), None)
+        if primero is not None and primero != self.scatter:
+            cantidad = 0
+            for s in combinacion:
+                if s != primero and s != self.comodin:
+                    break
+                cantidad += 1
+            pago = self.pagos.get(primero, {}).get(cantidad, 0)
+            if pago > mejor[0]:
+                mejor = (pago, primero, cantidad)
+        return mejor
+
+    def ventana(self, paradas):
+        """Simbolos visibles, por filas."""
+        return [[self.ventanas[r][p][f] for r, p in enumerate(paradas)] for f in range(self.filas)]
+
+    def evaluar(self, paradas):
+        """(multiplicador, lineas premiadas, scatters) de una tirada. El
+        multiplicador es sobre la apuesta total (Fraction si no es entero)."""
+        aporte = [self.aporte[r][p] for r, p in enumerate(paradas)]
+        total = 0
+        premiadas = []
+        for i, linea in enumerate(self.lineas):
+            indice = sum(a[f] for a, f in zip(aporte, linea))
+            pago = self.pago_linea[indice]
+            if pago:
+                total += pago
+                simbolo, cantidad = self.premio_linea[indice]
+                premiadas.append({"linea": i, "simbolo": simbolo, "cantidad": cantidad, "pago": pago})
+        scatters = sum(self.scatters[r][p] for r, p in enumerate(paradas))
+        total += self.pagos_scatter.get(scatters, 0) * len(self.lineas)
+        multiplicador = Fraction(total, len(self.lineas))
+        if multiplicador.denominator == 1:
+            multiplicador = int(multiplicador)
+        return multiplicador, premiadas, scatters
+
+    def evaluar_numpy(self, paradas):
+        """Multiplicadores (float) de muchas tiradas a la vez; `paradas` es un
+        array de NumPy de forma (n, rodillos)."""
+        import numpy as np
+        paradas = np.asarray(paradas)
+        pago_linea = np.asarray(self.pago_linea, dtype=np.int64)
+        aporte = [np.asarray(a, dtype=np.int64) for a in self.aporte]
+        total = np.zeros(len(paradas), dtype=np.int64)
+        for linea in self.lineas:
+            indice = sum(aporte[r][paradas[:, r], f] for r, f in enumerate(linea))
+            total += pago_linea[indice]
+        if self.pagos_scatter:
+            scatters = sum(np.asarray(self.scatters[r])[paradas[:, r]] for r in range(len(self.rodillos)))
+            tabla_scatter = np.zeros(int(scatters.max(initial=0)) + 1, dtype=np.int64)
+            for cantidad, pago in self.pagos_scatter.items():
+                if cantidad < len(tabla_scatter):
+                    tabla_scatter[cantidad] = pago
+            total += tabla_scatter[scatters] * len(self.lineas)
+        # Una sola division por tirada: mismo redondeo que float(Fraction)
+        return total / len(self.lineas)
+
+
+# ══════════════════════════════════════════════════════════════
+# MAQUINAS
+# ══════════════════════════════════════════════════════════════
+
+MAQUINAS = {
+    # La de siempre: tres rodillos de 8 simbolos, una linea, tres iguales
+    # pagan (simbolo + 2) * 10
+    "clasica": {
+        "rodillos": [list(range(8))] * 3,
+        "filas": 1,
+        "lineas": [[0, 0, 0]],
+        "pagos": {s: {3: (s + 2) * 10} for s in range(8)},
+        "apuesta_maxima": 10,
+    },
+    # 3x3 con 5 lineas (3 horizontales y 2 diagonales), RTP 95 %. 0 cereza,
+    # 1 limon, 2 naranja, 3 ciruela, 4 campana, 5 bar, 6 siete, 7 comodin,
+    # 8 estrella (scatter)
+    "frutas": {
+        "rodillos": [
+            [0, 1, 2, 0, 3, 1, 4, 0, 2, 5, 1, 8, 3, 0, 6, 2, 1, 7, 4, 0, 3, 1],
+            [1, 0, 3, 2, 0, 1, 5, 4, 0, 2, 8, 1, 3, 0, 7, 2, 1, 6, 0, 4, 2, 3],
+            [2, 1, 0, 4, 3, 0, 1, 2, 6, 0, 3, 8, 1, 5, 2, 0, 4, 1, 7, 3, 0, 2],
+        ],
+        "filas": 3,
+        "lineas": [[1, 1, 1], [0, 0, 0], [2, 2, 2], [0, 1, 2], [2, 1, 0]],
+        "pagos": {
+            0: {2: 1, 3: 6}, 1: {3: 12}, 2: {3: 15}, 3: {3: 20},
+            4: {3: 40}, 5: {3: 80}, 6: {3: 150}, 7: {3: 300},
+        },
+        "comodin": 7,
+        "scatter": 8,
+        "pagos_scatter": {2: 1, 3: 10},
+        "apuesta_maxima": 100,
+    },
+}
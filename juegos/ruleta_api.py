@@ -1,43 +1,13 @@
 import random
 from juegos.base_juegos import *
+from juegos.liquidacion import respuesta_jugada
+from juegos.motores import MOTORES, Apuesta
 
 class JuegoRuletaAPI(Juego):
-    def __init__(self, usuarios, uid, gestionar_apuesta, guardar_datos):
-        super().__init__("ruleta", usuarios, uid, gestionar_apuesta, guardar_datos)
-        self.numeros = list(range(0, 37))
+    def __init__(self, usuarios, uid, gestionar_apuesta, guardar_datos, cargar_datos=None, confirmar_datos=None):
+        super().__init__("ruleta", usuarios, uid, gestionar_apuesta, guardar_datos, cargar_datos, confirmar_datos)
 
     def ejecutar_logica(self, apuesta, tipo_apuesta, numero_elegido=None):
-        ruleta = random.randint(0, 36)
-        gana = False
-        multiplicador = 0
-        detalles = ""
-
-        if tipo_apuesta == "1":
-            if numero_elegido is not None and int(numero_elegido) == ruleta:
-                gana = True
-                multiplicador = 36 
-            detalles = f"Apostó al número {numero_elegido}. Salió el {ruleta}."
-
-        elif tipo_apuesta == "2":
-            if ruleta != 0 and ruleta % 2 == 0:
-                gana = True
-                multiplicador = 2
-            detalles = f"Apostó a Rojo (Pares). Salió el {ruleta}."
-
-        elif tipo_apuesta == "3":
-            if ruleta % 2 != 0:
-                gana = True
-                multiplicador = 2
-            detalles = f"Apostó a Negro (Impares). Salió el {ruleta}."
-
-        self.procesar_resultado(apuesta, gana, multiplicador, detalles)
-
-        return {
-            "juego": "ruleta",
-            "tipo_apuesta": tipo_apuesta,
-            "numero_ganador": ruleta,
-            "resultado": "gano" if gana else "perdio",
-            "fichas_ganadas": apuesta * multiplicador if gana else 0,
-            "fichas_finales": self.usuarios[self.uid]['fichas'],
-            "detalles": detalles
-        }
+        resultado = MOTORES["ruleta"].resolver(Apuesta(apuesta, tipo_apuesta, numero_elegido), random)
+        self.procesar_resultado(apuesta, resultado.gano, resultado.multiplicador, resultado.detalles)
+        return respuesta_jugada("ruleta", resultado, self.usuarios[self.uid]['fichas'])
@@ -1,19 +1,34 @@
 import os
 from Funciones.funciones import crear_usuario, iniciar_sesion, gestionar_apuesta
-from Funciones.historial import cargar_json, guardar_json, obtener_historial_usuario
+from Funciones.historial import obtener_historial_usuario
+from Funciones.identificadores import generador_ids
+from Funciones.almacenamiento import obtener_almacen
 from Funciones.banco import ejecutar_banco
 from juegos.carreras import JuegoCarreras 
 from juegos.dados import JuegoDados
 from juegos.ruleta import JuegoRuleta
 from juegos.traga_monedas import JuegoTraga_monedas
 
-DB_PATH = "base_data/users.json"
-
 def guardar_datos_casino(datos_actualizados):
-    guardar_json(DB_PATH, datos_actualizados)
+    obtener_almacen().guardar_usuarios(datos_actualizados)
+
+def crear_usuarios_casino(nuevos):
+    """Inserta los usuarios nuevos sin pisar ninguna cuenta existente."""
+    for uid, datos in nuevos.items():
+        if obtener_almacen().crear_usuario(uid, datos) is None:
+            print(f"Error: el ID {uid} ya existe, vuelve a crear la cuenta.")
+
+def guardar_datos_sesion(uid):
+    """Guarda solo el usuario de la sesion para no pisar cambios de la API en otros usuarios."""
+    return lambda usuarios: guardar_datos_casino({uid: usuarios[uid]})
+
+def confirmar_datos_casino(usuarios, partidas, bote=None):
+    """Saldo, partidas y bote de una jugada en una sola escritura."""
+    obtener_almacen().confirmar(usuarios, partidas, bote=bote)
 
 def menu_seleccion_juegos(usuarios, uid):
     """SubmenÃº exclusivo para los juegos"""
+    guardar = guardar_datos_sesion(uid)
     while True:
         print("\n" + "-"*30)
         print("      ZONA DE JUEGOS")
@@ -27,16 +42,16 @@ def menu_seleccion_juegos(usuarios, uid):
         op_juego = input("Selecciona un juego: ")
 
         if op_juego == "1":
-            juego = JuegoDados(usuarios, uid, gestionar_apuesta, guardar_datos_casino)
+            juego = JuegoDados(usuarios, uid, gestionar_apuesta, guardar, confirmar_datos=confirmar_datos_casino)
             juego.jugar()
         elif op_juego == "2":
-            juego = JuegoCarreras(usuarios, uid, gestionar_apuesta, guardar_datos_casino)
+            juego = JuegoCarreras(usuarios, uid, gestionar_apuesta, guardar, confirmar_datos=confirmar_datos_casino)
             juego.jugar()
         elif op_juego == "3":
-            juego = JuegoRuleta(usuarios, uid, gestionar_apuesta, guardar_datos_casino)
+            juego = JuegoRuleta(usuarios, uid, gestionar_apuesta, guardar, confirmar_datos=confirmar_datos_casino)
             juego.jugar()
         elif op_juego =="4":
-            juego = JuegoTraga_monedas(usuarios, uid, gestionar_apuesta, guardar_datos_casino)
+            juego = JuegoTraga_monedas(usuarios, uid, gestionar_apuesta, guardar, confirmar_datos=confirmar_datos_casino)
             juego.jugar()
         elif op_juego =="5":
             break
@@ -69,7 +84,7 @@ def menu_principal_sesion(usuarios, uid):
             menu_seleccion_juegos(usuarios, uid)
         
         elif op == "2":
-            ejecutar_banco(usuarios, uid, guardar_datos_casino)
+            ejecutar_banco(usuarios, uid, guardar_datos_sesion(uid))
 
         elif op == "3":
             print("\n[INFO] La Gacha de Chistes esta en mantenimiento.")
@@ -92,10 +107,11 @@ def menu_principal_sesion(usuarios, uid):
             print("Opcion no valida. Intenta de nuevo.")
 
 def main():
+    generador_ids.reservar_nodo()
     ejecutando_programa = True
     
     while ejecutando_programa:
-        usuarios = cargar_json(DB_PATH)
+        usuarios = obtener_almacen().cargar_usuarios()
         
         print("\n" + "="*30)
         print("CANCIN-HUB - Casino Virtual")
@@ -108,14 +124,15 @@ def main():
         if op == "1":
             nombre = input("Nombre de usuario: ")
             password = input("Contrasena: ")
+            existentes = set(usuarios)
             usuarios = crear_usuario(usuarios, nombre, password)
-            guardar_json(DB_PATH, usuarios)
+            crear_usuarios_casino({k: v for k, v in usuarios.items() if k not in existentes})
             
         elif op == "2":
             uid = input("Introduce tu ID: ")
             password = input("Introduce tu contrasena: ")
             
-            if iniciar_sesion(usuarios, uid, password):
+            if iniciar_sesion(usuarios, uid, password, guardar_datos_sesion(uid)):
                 menu_principal_sesion(usuarios, uid)
                 
         elif op == "3":
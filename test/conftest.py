@@ -0,0 +1,52 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from Funciones.configuracion import cargar_config
+
+# api crea al importarse el almacen, el bote y la semilla: con las rutas de
+# config.json apuntando a una carpeta temporal los tests no tocan base_data/
+_DATOS_PRUEBA = tempfile.mkdtemp(prefix="cacinhub-tests-")
+atexit.register(shutil.rmtree, _DATOS_PRUEBA, True)
+for _seccion in cargar_config().values():
+    for _clave, _ruta in list(_seccion.items()):
+        # Los chistes son datos de entrada, no estado
+        if _clave.startswith("ruta") and _clave != "ruta_chistes":
+            _seccion[_clave] = os.path.join(_DATOS_PRUEBA, os.path.basename(_ruta))
+
+import api  # noqa: E402
+from Funciones.almacenamiento import AlmacenSQLite
+from Funciones.estado import EstadoCasino
+
+
+@pytest.fixture()
+def almacen_api(monkeypatch, tmp_path):
+    """Crea un AlmacenSQLite temporal con `usuarios` y lo pone detras de
+    api.estado. Devuelve el almacen; se cierra al terminar el test."""
+    creados = []
+
+    def crear(usuarios):
+        almacen = AlmacenSQLite(str(tmp_path / "casino.db"))
+        almacen.guardar_usuarios(usuarios)
+        monkeypatch.setattr(api, "estado", EstadoCasino(almacen, intervalo_verificacion=60))
+        creados.append(almacen)
+        return almacen
+
+    yield crear
+    for almacen in creados:
+        almacen.cerrar()
+
+
+@pytest.fixture()
+def espiar_confirmaciones(monkeypatch):
+    """Anota (usuarios, partidas) de cada almacen.confirmar sin cambiar lo que hace."""
+    def espiar(almacen):
+        confirmaciones = []
+        original = almacen.confirmar
+        monkeypatch.setattr(almacen, "confirmar", lambda u, p, sincronizar=False, bote=None:
+                            confirmaciones.append((len(u), len(p))) or original(u, p, sincronizar, bote))
+        return confirmaciones
+    return espiar
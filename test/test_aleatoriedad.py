@@ -0,0 +1,72 @@
+import threading
+import pytest
+import api
+from fastapi.testclient import TestClient
+from Funciones import aleatoriedad
+from Funciones.aleatoriedad import FlujoPCG, ServicioAleatorio, reproducir_resultado
+
+client = TestClient(api.app)
+
+
+def test_pcg32_vector_de_referencia(monkeypatch):
+    # pcg32-demo de la implementacion de referencia: semilla 42, secuencia 54
+    monkeypatch.setattr(aleatoriedad, "_estado_inicial", lambda semilla, flujo: 42)
+    flujo = FlujoPCG("x", 54)
+    assert [flujo.getrandbits(32) for _ in range(3)] == [0xa15c02b7, 0x7b47f409, 0xba1d3330]
+
+
+def test_bloques_con_y_sin_numpy_dan_la_misma_secuencia(monkeypatch):
+    pytest.importorskip("numpy")
+    con_numpy = FlujoPCG("semilla", 7)
+    monkeypatch.setattr(aleatoriedad, "np", None)
+    sin_numpy = FlujoPCG("semilla", 7)
+    # Varios bloques, saltos dentro y fuera del bloque pregenerado
+    for pasos in (0, 3, aleatoriedad.TAMANO_BLOQUE, 1, 5 * aleatoriedad.TAMANO_BLOQUE + 9):
+        con_numpy.avanzar(pasos)
+        sin_numpy.avanzar(pasos)
+        assert [con_numpy.getrandbits(32) for _ in range(300)] == [sin_numpy.getrandbits(32) for _ in range(300)]
+        assert con_numpy.contador == sin_numpy.contador
+
+
+def test_avanzar_equivale_a_generar():
+    a = FlujoPCG("semilla", 7)
+    numeros = [a.randint(0, 36) for _ in range(50)]
+
+    b = FlujoPCG("semilla", 7)
+    b.randint(0, 36)
+    posicion = b.posicion()
+    reproducido = FlujoPCG("semilla", posicion["flujo"], posicion["contador"])
+    assert [reproducido.randint(0, 36) for _ in range(49)] == numeros[1:]
+    assert reproducido.contador == a.contador
+
+
+def test_flujos_distintos_por_hilo():
+    servicio = ServicioAleatorio("semilla")
+    flujos = []
+    hilo = threading.Thread(target=lambda: flujos.append(servicio.flujo()))
+    hilo.start()
+    hilo.join()
+    assert servicio.flujo() is servicio.flujo()
+    assert servicio.flujo().flujo != flujos[0].flujo
+
+
+@pytest.fixture()
+def estado_temporal(almacen_api):
+    return almacen_api({"USR001": {"nombre": "Ana", "fichas": 1000, "stats": {"partidas_totales": 0}}})
+
+
+def test_partidas_del_historial_se_reproducen(estado_temporal):
+    client.post("/jugar/ruleta", json={"user_id": "USR001", "monto": 5, "tipo_apuesta": "1", "numero": 7})
+    client.post("/jugar/carreras", json={"user_id": "USR001", "monto": 5, "eleccion": "3"})
+    client.post("/jugar/dados/lote", json={"user_id": "USR001", "apuestas": [{"monto": 5}] * 3})
+    client.post("/jugar/ruleta/boleto", json={"user_id": "USR001", "apuestas": [
+        {"monto": 5, "tipo_apuesta": "calle", "numeros": [4, 5, 6]}, {"monto": 5, "tipo_apuesta": "negro"}]})
+
+    partidas = estado_temporal.obtener_partidas("USR001")["partidas"]
+    assert len(partidas) == 7
+    for partida in partidas:
+        resultado = reproducir_resultado(partida)
+        assert resultado.detalles == partida["detalles"]
+    # Las jugadas del lote consumen el mismo flujo una detras de otra
+    lote = sorted(p["azar"]["contador"] for p in partidas if p["juego"] == "dados")
+    assert lote[0] < lote[1] < lote[2]
@@ -0,0 +1,305 @@
+import json
+import sqlite3
+from datetime import datetime
+import pytest
+from Funciones.almacenamiento import AlmacenJSON, AlmacenSQLite, migrar
+from Funciones.diario import DiarioPartidas
+
+# ══════════════════════════════════════════════════════════════
+# FIXTURES
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture(params=["json", "sqlite"])
+def almacen(request, tmp_path):
+    if request.param == "json":
+        a = AlmacenJSON(str(tmp_path / "users.json"), str(tmp_path / "historial.json"),
+                        str(tmp_path / "historial.jsonl"))
+    else:
+        a = AlmacenSQLite(str(tmp_path / "casino.db"))
+    yield a
+    a.cerrar()
+
+
+def usuario(nombre, fichas=100):
+    return {"nombre": nombre, "contrasena": "pass123", "fichas": fichas, "stats": {"partidas_totales": 0}}
+
+
+def partida(juego, ganancia):
+    return {"fecha": "01/01/2026 10:00:00", "juego": juego, "apuesta": 10, "ganancia": ganancia}
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE USUARIOS
+# ══════════════════════════════════════════════════════════════
+
+def test_guardar_y_cargar_usuarios(almacen):
+    almacen.guardar_usuarios({"1234": usuario("Ana"), "5678": usuario("Luis")})
+    usuarios = almacen.cargar_usuarios()
+    assert set(usuarios) == {"1234", "5678"}
+    assert usuarios["1234"]["nombre"] == "Ana"
+
+
+def test_guardar_usuario_no_borra_al_resto(almacen):
+    almacen.guardar_usuarios({"1234": usuario("Ana"), "5678": usuario("Luis")})
+    almacen.guardar_usuario("1234", usuario("Ana", fichas=50))
+    assert almacen.obtener_usuario("1234")["fichas"] == 50
+    assert almacen.obtener_usuario("5678")["fichas"] == 100
+
+
+def test_obtener_usuario_inexistente(almacen):
+    assert almacen.obtener_usuario("9999") is None
+
+
+def test_crear_usuario_no_sobrescribe(almacen):
+    assert almacen.crear_usuario("1234", usuario("Ana", fichas=70)) is not None
+    assert almacen.crear_usuario("1234", usuario("Otro")) is None
+    assert almacen.obtener_usuario("1234")["fichas"] == 70
+
+
+def test_asignar_nodo_no_repite(almacen):
+    nodos = [almacen.asignar_nodo() for _ in range(3)]
+    assert nodos == sorted(set(nodos))
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE HISTORIAL
+# ══════════════════════════════════════════════════════════════
+
+def test_partidas_mas_recientes_primero(almacen):
+    almacen.registrar_partida("1234", "Ana", partida("dados", 10))
+    almacen.registrar_partida("1234", "Ana", partida("ruleta", -10))
+    info = almacen.obtener_partidas("1234")
+    assert info["usuario"] == "Ana"
+    assert [p["juego"] for p in info["partidas"]] == ["ruleta", "dados"]
+
+
+def test_registrar_partidas_con_sincronizar(almacen):
+    """Los dos backends aceptan la misma firma."""
+    almacen.registrar_partidas([("1234", "Ana", partida("dados", 10))], sincronizar=True)
+    assert almacen.contar_partidas("1234") == 1
+
+
+def test_bote_se_suma_en_la_confirmacion(almacen):
+    assert almacen.iniciar_bote({"sembrado": 500, "aportado": 0, "pagado": 0, "apuestas": 0, "premios": []})["sembrado"] == 500
+    # Solo se inicia una vez
+    assert almacen.iniciar_bote({"sembrado": 900, "aportado": 0, "pagado": 0, "apuestas": 0, "premios": []})["sembrado"] == 500
+
+    almacen.confirmar({"1234": usuario("Ana", 600)}, [("1234", "Ana", partida("tragamonedas", 500))],
+                      bote={"sembrado": 500, "pagado": 500, "premios": [{"uid": "1234", "fichas": 500}]})
+    almacen.confirmar({}, [], bote={"aportado": 7, "apuestas": 2})
+    bote = almacen.iniciar_bote({})
+    assert (bote["sembrado"], bote["aportado"], bote["pagado"], bote["apuestas"]) == (1000, 7, 500, 2)
+    assert bote["premios"] == [{"uid": "1234", "fichas": 500}]
+    assert almacen.obtener_usuario("1234")["fichas"] == 600
+
+
+def test_sesiones_revocadas_hasta_que_caducan(almacen):
+    almacen.revocar_sesion("a1", 1060, ahora=1000)
+    assert almacen.sesion_revocada("a1") and not almacen.sesion_revocada("b2")
+    # Al revocar otra se borran las que ya caducaron
+    almacen.revocar_sesion("b2", 1200, ahora=1100)
+    assert not almacen.sesion_revocada("a1") and almacen.sesion_revocada("b2")
+    assert almacen.sesiones_revocadas(1100) == {"b2": 1200}
+    assert almacen.sesiones_revocadas(1200) == {}
+
+
+def test_limite_de_partidas(almacen):
+    for i in range(4):
+        almacen.registrar_partida("1234", "Ana", partida("dados", i))
+    assert len(almacen.obtener_partidas("1234", limite=2)["partidas"]) == 2
+
+
+def test_historial_usuario_sin_partidas(almacen):
+    assert almacen.obtener_partidas("9999") is None
+
+
+def test_no_se_descartan_partidas_antiguas(almacen):
+    for i in range(8):
+        almacen.registrar_partida("1234", "Ana", partida("dados", i))
+    assert almacen.contar_partidas("1234") == 8
+    assert almacen.obtener_partidas("1234")["partidas"][-1]["ganancia"] == 0
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE MIGRACION
+# ══════════════════════════════════════════════════════════════
+
+def test_migrar_json_a_sqlite(tmp_path):
+    origen = AlmacenJSON(str(tmp_path / "users.json"), str(tmp_path / "historial.json"),
+                         str(tmp_path / "historial.jsonl"))
+    origen.guardar_usuarios({"1234": usuario("Ana")})
+    origen.registrar_partida("1234", "Ana", partida("dados", 10))
+    origen.registrar_partida("1234", "Ana", partida("ruleta", -10))
+
+    origen.iniciar_bote({"sembrado": 500, "aportado": 7, "pagado": 0, "apuestas": 2, "premios": []})
+    origen.asignar_nodo()
+    origen.asignar_nodo()
+    origen.revocar_sesion("a1", 2_000_000_000, ahora=1000)
+
+    destino = AlmacenSQLite(str(tmp_path / "casino.db"))
+    resumen = migrar(origen, destino)
+
+    assert resumen == {"usuarios": 1, "partidas": 2, "ya_migrado": False}
+    assert destino.obtener_usuario("1234")["nombre"] == "Ana"
+    assert destino.obtener_partidas("1234") == origen.obtener_partidas("1234")
+    assert destino.cargar_bote()["aportado"] == 7
+    assert destino.asignar_nodo() == 2
+    assert destino.sesion_revocada("a1")
+    # Repetirla sobre lo ya migrado no copia nada
+    assert migrar(origen, destino)["ya_migrado"]
+    assert destino.contar_partidas("1234") == 2
+    destino.cerrar()
+
+
+def test_cli_de_migracion_tras_la_importacion_automatica(tmp_path, monkeypatch, capsys):
+    from Funciones import configuracion, migracion
+    from Funciones.almacenamiento import crear_almacen
+    config = {"almacenamiento": {"ruta_sqlite": str(tmp_path / "casino.db"),
+                                 "ruta_usuarios": str(tmp_path / "users.json"),
+                                 "ruta_historial": str(tmp_path / "historial.json"),
+                                 "ruta_diario": str(tmp_path / "historial.jsonl")},
+              "retencion": {"ruta_archivo": str(tmp_path / "archivo")}}
+    monkeypatch.setattr(configuracion, "_config", config)
+    legado = crear_almacen("json")
+    legado.guardar_usuarios({"1234": usuario("Ana")})
+    legado.cerrar()
+
+    # En una instalacion nueva la CLI migra ella misma
+    assert migracion.main(["json", "sqlite"]) == 0
+    assert "Migrados 1 usuarios" in capsys.readouterr().out
+    # Y no falla si la base ya tiene lo importado
+    assert migracion.main(["json", "sqlite"]) == 0
+    assert "no hay nada que migrar" in capsys.readouterr().out
+
+
+def test_migrar_rechaza_destino_con_datos(tmp_path):
+    origen = AlmacenJSON(str(tmp_path / "users.json"), str(tmp_path / "historial.json"),
+                         str(tmp_path / "historial.jsonl"))
+    destino = AlmacenSQLite(str(tmp_path / "casino.db"))
+    destino.guardar_usuarios({"1234": usuario("Ana")})
+    with pytest.raises(ValueError):
+        migrar(origen, destino)
+    destino.cerrar()
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DEL DIARIO DE PARTIDAS
+# ══════════════════════════════════════════════════════════════
+
+def test_diario_reconstruye_indice_tras_caida(tmp_path):
+    ruta = str(tmp_path / "historial.jsonl")
+    diario = DiarioPartidas(ruta)
+    diario.registrar([("1234", "Ana", partida("dados", 10))])
+
+    # Simula una caida entre el append al diario y el append al indice
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"uid": "1234", "usuario": "Ana", "partida": partida("ruleta", -10)}) + "\n")
+        f.write('{"uid": "1234", "usu')
+
+    recuperado = DiarioPartidas(ruta)
+    assert recuperado.contar("1234") == 2
+    assert recuperado.leer("1234", limite=1)["partidas"][0]["juego"] == "ruleta"
+
+
+def test_diario_lectura_concurrente_con_compactacion(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "historial.jsonl")
+    diario = DiarioPartidas(ruta)
+    diario.registrar([("1", "Ana", partida(f"juego{i}", i)) for i in range(5)]
+                     + [("2", "Luis", partida("dados", 1))])
+    abrir = diario._abrir
+
+    class CompactaAlLeer:
+        """Lanza compactar() justo despues de soltar el lock, antes de leer."""
+        def __init__(self):
+            self.f = abrir()
+            self.primera = True
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+        def seek(self, offset):
+            if self.primera:
+                self.primera = False
+                diario.compactar(1, 1, lambda filas: None)
+            return self.f.seek(offset)
+
+        def read(self, n):
+            return self.f.read(n)
+
+    monkeypatch.setattr(diario, "_abrir", CompactaAlLeer)
+    assert [p["juego"] for p in diario.leer("1", limite=2)["partidas"]] == ["juego4", "juego3"]
+    assert [f[0] for f in diario.buscar(juego="dados")] == ["2"]
+
+
+def test_diario_importa_historial_json_heredado(tmp_path):
+    legado = {"1234": {"usuario": "Ana", "partidas": [
+        {**partida("ruleta", -10), "fecha": "02/01/2026 10:00:00"},
+        {**partida("dados", 10), "fecha": "01/01/2026 10:00:00"},
+    ]}}
+    with open(tmp_path / "historial.json", "w", encoding="utf-8") as f:
+        json.dump(legado, f)
+
+    almacen = AlmacenJSON(str(tmp_path / "users.json"), str(tmp_path / "historial.json"),
+                          str(tmp_path / "historial.jsonl"))
+    almacen.registrar_partida("1234", "Ana", partida("tragamonedas", -5))
+
+    juegos = [p["juego"] for p in almacen.obtener_partidas("1234")["partidas"]]
+    assert juegos == ["tragamonedas", "ruleta", "dados"]
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE CONSULTAS POR FECHA Y JUEGO
+# ══════════════════════════════════════════════════════════════
+
+def partida_en(ts, juego, resultado="gano"):
+    return {"fecha": "", "ts": ts, "juego": juego, "resultado": resultado, "apuesta": 10, "ganancia": 0}
+
+
+def test_buscar_partidas_por_rango(almacen):
+    for ts in (100, 200, 300, 400):
+        almacen.registrar_partida("1234", "Ana", partida_en(ts, "dados"))
+    filas = almacen.buscar_partidas(desde=200, hasta=400)
+    assert [p["ts"] for _, _, p in filas] == [200, 300]
+
+
+def test_buscar_partidas_por_juego_y_resultado(almacen):
+    almacen.registrar_partida("1234", "Ana", partida_en(100, "dados", "gano"))
+    almacen.registrar_partida("5678", "Luis", partida_en(150, "ruleta", "gano"))
+    almacen.registrar_partida("5678", "Luis", partida_en(200, "dados", "perdio"))
+
+    assert [uid for uid, _, _ in almacen.buscar_partidas(juego="dados")] == ["1234", "5678"]
+    assert [uid for uid, _, _ in almacen.buscar_partidas(resultado="gano")] == ["1234", "5678"]
+    assert almacen.buscar_partidas(juego="dados", resultado="perdio")[0][1] == "Luis"
+
+
+def test_partidas_antiguas_sin_ts_usan_la_fecha(almacen):
+    almacen.registrar_partida("1234", "Ana", {**partida("dados", 10), "fecha": "02/01/2026 10:00:00"})
+    desde = datetime(2026, 1, 2).timestamp()
+    assert len(almacen.buscar_partidas(desde=desde, hasta=desde + 86400)) == 1
+    assert almacen.buscar_partidas(hasta=desde) == []
+
+
+def test_sqlite_actualiza_esquema_antiguo(tmp_path):
+    ruta = str(tmp_path / "casino.db")
+    con = sqlite3.connect(ruta)
+    con.execute("CREATE TABLE partidas (id INTEGER PRIMARY KEY AUTOINCREMENT, usuario_id TEXT NOT NULL, "
+                "nombre TEXT NOT NULL, datos TEXT NOT NULL)")
+    con.execute("INSERT INTO partidas (usuario_id, nombre, datos) VALUES (?, ?, ?)",
+                ("1234", "Ana", json.dumps(partida_en(100, "ruleta"))))
+    con.commit()
+    con.close()
+
+    almacen = AlmacenSQLite(ruta)
+    assert [p["juego"] for _, _, p in almacen.buscar_partidas(desde=50, juego="ruleta")] == ["ruleta"]
+    almacen.cerrar()
+
+
+def test_diario_lee_indice_antiguo_sin_fechas(tmp_path):
+    ruta = str(tmp_path / "historial.jsonl")
+    linea = json.dumps({"uid": "1234", "usuario": "Ana", "partida": partida_en(100, "dados")}) + "\n"
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(linea)
+    with open(ruta + ".idx", "w", encoding="utf-8") as f:
+        f.write(f"1234\t0\t{len(linea.encode('utf-8'))}\n")
+
+    diario = DiarioPartidas(ruta)
+    assert diario.contar("1234") == 1
+    assert len(diario.buscar(desde=100, juego="dados")) == 1
@@ -1,5 +1,10 @@
 import pytest
 import api
+import json
+import itertools
+from datetime import datetime
+from Funciones.aleatoriedad import FlujoPCG
+from Funciones.almacenamiento import AlmacenSQLite
 from fastapi.testclient import TestClient
 
 client = TestClient(api.app)
@@ -26,7 +31,7 @@ def un_usuario():
 
 @pytest.fixture()
 def sin_disco(monkeypatch):
-    for func in ["guardar_json", "guardar_db_usuarios", "registrar_partida"]:
+    for func in ["guardar_json", "guardar_db_usuarios", "confirmar_db", "registrar_partida"]:
         if hasattr(api, func):
             monkeypatch.setattr(api, func, lambda *a, **k: None)
 
@@ -60,6 +65,12 @@ class TestEndpointsJuego:
         r = client.post("/gacha/chiste", params={"user_id": "USR001"})
         assert r.status_code in [200, 400] # 400 si no tiene fichas suf.
 
+    def test_odds_juego(self):
+        r = client.get("/juegos/ruleta/odds")
+        assert r.status_code == 200
+        assert r.json()["apuestas"]["1"]["rtp_exacto"] == "36/37"
+        assert client.get("/juegos/bingo/odds").status_code == 404
+
 class TestGestionUsuarios:
     def test_obtener_info_usuario(self, monkeypatch, un_usuario):
         usar_db(monkeypatch, un_usuario)
@@ -73,4 +84,114 @@ class TestBanco:
         payload = {"user_id": "USR001", "contrasena": "pass123", "cantidad": 100}
         r = client.post("/api/banco/agregar-fichas", json=payload)
         assert r.status_code == 200
-        assert r.json()["fichas_actuales"] == 600
\ No newline at end of file
+        assert r.json()["fichas_actuales"] == 600
+class TestHistorialPorFecha:
+    def test_rango_filtra_por_juego(self, monkeypatch, tmp_path):
+        almacen = AlmacenSQLite(str(tmp_path / "casino.db"))
+        dia = datetime(2026, 3, 15, 12).timestamp()
+        almacen.registrar_partida("USR001", "Juan Test", {"fecha": "15/03/2026 12:00:00", "ts": dia,
+                                                           "juego": "dados", "resultado": "gano"})
+        almacen.registrar_partida("USR001", "Juan Test", {"fecha": "15/03/2026 12:00:00", "ts": dia,
+                                                           "juego": "ruleta", "resultado": "perdio"})
+        monkeypatch.setattr(api, "almacen", almacen)
+
+        r = client.get("/jugadas/rango", params={"desde": "15/03/2026", "hasta": "16/03/2026", "juego": "dados"})
+        assert r.status_code == 200
+        assert [p["juego"] for p in r.json()[0]["partidas"]] == ["dados"]
+
+        r = client.get("/jugadas/fecha", params={"fecha": "15/03/2026"})
+        assert len(r.json()[0]["partidas"]) == 2
+        assert client.get("/jugadas/fecha", params={"fecha": "16/03/2026"}).status_code == 404
+        almacen.cerrar()
+
+class TestPaginacion:
+    def test_usuarios_por_paginas(self, monkeypatch):
+        db = {f"U{i}": {**USUARIO_REAL, "nombre": f"User{i}"} for i in range(5)}
+        usar_db(monkeypatch, db)
+
+        r = client.get("/api/usuarios", params={"limite": 2})
+        assert [u["id"] for u in r.json()["data"]] == ["U0", "U1"]
+        r = client.get("/api/usuarios", params={"limite": 2, "cursor": r.json()["siguiente_cursor"]})
+        assert [u["id"] for u in r.json()["data"]] == ["U2", "U3"]
+        r = client.get("/api/usuarios", params={"limite": 2, "cursor": r.headers["X-Siguiente-Cursor"]})
+        assert [u["id"] for u in r.json()["data"]] == ["U4"]
+        assert r.json()["siguiente_cursor"] is None
+
+    def test_cursor_no_valido(self, monkeypatch, un_usuario):
+        usar_db(monkeypatch, un_usuario)
+        assert client.get("/api/usuarios", params={"cursor": "xx"}).status_code == 400
+
+    def test_jugadas_ndjson_comprimido(self, monkeypatch, tmp_path):
+        almacen = AlmacenSQLite(str(tmp_path / "casino.db"))
+        for uid in ("A", "B", "C"):
+            almacen.registrar_partida(uid, f"User{uid}", {"juego": "dados", "ts": 1.0})
+        monkeypatch.setattr(api, "almacen", almacen)
+
+        r = client.get("/jugadas", params={"formato": "ndjson", "comprimir": True})
+        assert r.headers["content-encoding"] == "gzip"
+        lineas = [json.loads(l) for l in r.text.splitlines()]
+        assert [l["id"] for l in lineas] == ["A", "B", "C"]
+
+        r = client.get("/jugadas", params={"limite": 2})
+        assert [u["id"] for u in r.json()] == ["A", "B"]
+        r = client.get("/jugadas", params={"limite": 2, "cursor": r.headers["X-Siguiente-Cursor"]})
+        assert [u["id"] for u in r.json()] == ["C"]
+        assert "X-Siguiente-Cursor" not in r.headers
+        almacen.cerrar()
+
+class TestLote:
+    @pytest.fixture()
+    def estado_temporal(self, almacen_api):
+        return almacen_api({"USR001": {**USUARIO_REAL, "fichas": 25}})
+
+    def test_lote_para_sin_fichas_y_guarda_una_vez(self, monkeypatch, estado_temporal, espiar_confirmaciones):
+        tiros = itertools.cycle([1, 6])  # el jugador siempre pierde
+        monkeypatch.setattr(FlujoPCG, "randint", lambda self, a, b: next(tiros))
+        confirmaciones = espiar_confirmaciones(estado_temporal)
+
+        r = client.post("/jugar/dados/lote", json={"user_id": "USR001", "apuestas": [{"monto": 10}] * 5})
+        datos = r.json()
+        assert r.status_code == 200
+        assert (datos["jugadas"], datos["pendientes"], datos["fichas_finales"]) == (2, 3, 5)
+        assert datos["detenido"] == "Fichas insuficientes"
+        assert confirmaciones == [(1, 2)]
+        assert estado_temporal.obtener_usuario("USR001")["fichas"] == 5
+        assert estado_temporal.contar_partidas("USR001") == 2
+
+    def test_lote_valida_antes_de_jugar(self, estado_temporal):
+        r = client.post("/jugar/tragamonedas/lote",
+                        json={"user_id": "USR001", "apuestas": [{"monto": 5}, {"monto": 50}]})
+        assert r.status_code == 400
+        assert estado_temporal.contar_partidas("USR001") == 0
+        assert client.post("/jugar/poker/lote", json={"user_id": "USR001", "apuestas": [{"monto": 5}]}).status_code == 404
+
+class TestBoletoRuleta:
+    @pytest.fixture()
+    def estado_temporal(self, almacen_api):
+        return almacen_api({"USR001": {**USUARIO_REAL, "fichas": 100}})
+
+    def test_un_giro_y_un_guardado(self, monkeypatch, estado_temporal, espiar_confirmaciones):
+        monkeypatch.setattr(FlujoPCG, "randint", lambda self, a, b: 19)
+        confirmaciones = espiar_confirmaciones(estado_temporal)
+
+        r = client.post("/jugar/ruleta/boleto", json={"user_id": "USR001", "apuestas": [
+            {"monto": 10, "tipo_apuesta": "rojo"},
+            {"monto": 5, "tipo_apuesta": "caballo", "numeros": [19, 20]},
+            {"monto": 5, "tipo_apuesta": "docena", "numeros": [1]},
+        ]})
+        datos = r.json()
+        assert r.status_code == 200
+        assert (datos["numero_ganador"], datos["color_ganador"]) == (19, "rojo")
+        assert [x["fichas_ganadas"] for x in datos["resultados"]] == [20, 90, 0]
+        assert (datos["total_apostado"], datos["total_ganado"], datos["fichas_finales"]) == (20, 110, 190)
+        assert confirmaciones == [(1, 3)]
+        assert estado_temporal.contar_partidas("USR001") == 3
+
+    def test_boleto_se_juega_entero_o_no_se_juega(self, estado_temporal):
+        r = client.post("/jugar/ruleta/boleto", json={"user_id": "USR001", "apuestas": [
+            {"monto": 60, "tipo_apuesta": "par"}, {"monto": 60, "tipo_apuesta": "impar"}]})
+        assert r.status_code == 400
+        r = client.post("/jugar/ruleta/boleto", json={"user_id": "USR001", "apuestas": [
+            {"monto": 5, "tipo_apuesta": "cuadro", "numeros": [1, 2, 3, 4]}]})
+        assert r.status_code == 400
+        assert estado_temporal.contar_partidas("USR001") == 0
@@ -0,0 +1,113 @@
+from fractions import Fraction
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from Funciones.bote import BoteProgresivo
+from Funciones.verificacion import verificar_partida
+from juegos.apuestas_mutuas import Bolsa, HipodromoMutuo
+from juegos.motores import MotorCarreras
+
+client = TestClient(api.app)
+
+USUARIOS = {
+    uid: {"nombre": uid, "fichas": 100, "stats": {"partidas_totales": 0, "carreras": 0}}
+    for uid in ("USR001", "USR002", "USR003")
+}
+
+
+@pytest.fixture()
+def almacen(monkeypatch, almacen_api):
+    monkeypatch.setattr(api, "hipodromo", HipodromoMutuo(api.liquidacion, comision=0.2, segundos_carrera=60))
+    return almacen_api(USUARIOS)
+
+
+def gana(monkeypatch, caballo):
+    monkeypatch.setattr(MotorCarreras, "sortear_ganador", lambda self, rng=None: caballo)
+
+
+def apostar(uid, *apuestas):
+    return client.post("/carreras/mutuas/apuestas",
+                       json={"user_id": uid, "apuestas": [{"eleccion": c, "monto": m} for c, m in apuestas]})
+
+
+def test_bolsa_incremental():
+    bolsa = Bolsa(["1", "2", "3"], comision=0.2)
+    bolsa.añadir("1", 30)
+    bolsa.añadir("2", 10)
+    assert bolsa.dividendo("1") == Fraction(32, 30)
+    assert bolsa.dividendo("2") == Fraction(32, 10)
+    assert bolsa.dividendo("3") is None
+    bolsa.añadir("2", 300)
+    # Si el favorito se lleva casi toda la bolsa se paga al menos lo apostado
+    assert bolsa.dividendo("2") == 1
+    bolsa.quitar("2", 300)
+    assert bolsa.cuotas() == {"1": 1.07, "2": 3.2, "3": None}
+
+
+def test_carrera_paga_a_los_ganadores_con_una_confirmacion(monkeypatch, almacen, espiar_confirmaciones):
+    gana(monkeypatch, "2")
+    confirmaciones = espiar_confirmaciones(almacen)
+
+    carrera_id = apostar("USR001", ("1", 50)).json()["carrera"]
+    apostar("USR002", ("2", 20))
+    datos = apostar("USR003", ("2", 10), ("3", 20)).json()
+    # bolsa 100, neto 80, 30 al caballo 2
+    assert datos["bolsa"]["cuotas"]["2"] == pytest.approx(2.67)
+
+    api.hipodromo.correr()
+
+    assert confirmaciones == [(3, 4)]
+    fichas = {uid: almacen.obtener_usuario(uid)["fichas"] for uid in USUARIOS}
+    # Premios a la baja: 20 * 8/3 = 53, 10 * 8/3 = 26
+    assert fichas == {"USR001": 50, "USR002": 133, "USR003": 96}
+    resultado = client.get(f"/carreras/mutuas/{carrera_id}", params={"user_id": "USR003"}).json()
+    assert (resultado["estado"], resultado["ganador"]) == ("liquidada", "2")
+    assert [a["resultado"] for a in resultado["mis_apuestas"]] == ["gano", "perdio"]
+    for uid in USUARIOS:
+        for partida in almacen.obtener_partidas(uid)["partidas"]:
+            assert verificar_partida(partida, None) == ([], False)
+
+
+def test_sin_acertantes_se_devuelve_todo(monkeypatch, almacen):
+    gana(monkeypatch, "4")
+    apostar("USR001", ("1", 40))
+    carrera = api.hipodromo.correr()
+    assert carrera.dividendo is None
+    assert almacen.obtener_usuario("USR001")["fichas"] == 100
+    assert almacen.obtener_partidas("USR001")["partidas"][0]["resultado"] == "empate"
+
+
+def test_apuesta_sin_saldo_se_anula_y_sale_de_la_bolsa(monkeypatch, almacen):
+    gana(monkeypatch, "1")
+    apostar("USR001", ("1", 10))
+    apostar("USR002", ("2", 90))
+    api.estado.confirmar({"USR002": {**USUARIOS["USR002"], "fichas": 5}}, [])
+    carrera = api.hipodromo.correr()
+    assert carrera.premios == [10, None]
+    assert carrera.bolsa.total == 10
+    assert almacen.obtener_usuario("USR002")["fichas"] == 5
+
+
+def test_la_bolsa_no_toca_el_bote(monkeypatch, almacen):
+    class Siempre:
+        def random(self):
+            return 0
+
+    bote = BoteProgresivo(juegos=["carreras"], semilla=300, azar=Siempre())
+    monkeypatch.setattr(api.liquidacion, "bote", bote)
+    gana(monkeypatch, "1")
+    apostar("USR001", ("1", 10))
+    apostar("USR002", ("2", 30))
+    carrera = api.hipodromo.correr()
+    assert carrera.premios == [32, 0]
+    assert bote.estado()["apuestas"] == 0
+    assert bote.pagado == 0
+    assert "bote" not in almacen.obtener_partidas("USR001")["partidas"][0]
+
+
+def test_validacion(almacen):
+    assert apostar("USR001", ("9", 10)).status_code == 400
+    assert apostar("USR001", ("1", 500)).status_code == 400
+    assert client.get("/carreras/mutuas/123").status_code == 404
@@ -0,0 +1,100 @@
+import os
+import pytest
+from Funciones.almacenamiento import AlmacenJSON, AlmacenSQLite
+from Funciones.archivo import AlmacenConArchivo, ArchivoPartidas
+
+# ══════════════════════════════════════════════════════════════
+# FIXTURES
+# ══════════════════════════════════════════════════════════════
+
+def crear_caliente(tipo, tmp_path):
+    if tipo == "json":
+        return AlmacenJSON(str(tmp_path / "users.json"), str(tmp_path / "historial.json"),
+                           str(tmp_path / "historial.jsonl"))
+    return AlmacenSQLite(str(tmp_path / "casino.db"))
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def tipo(request):
+    return request.param
+
+
+@pytest.fixture()
+def almacen(tipo, tmp_path):
+    a = AlmacenConArchivo(crear_caliente(tipo, tmp_path), ArchivoPartidas(str(tmp_path / "archivo")), retener=3)
+    yield a
+    a.cerrar()
+
+
+def partida(i, juego="dados"):
+    # Una partida por dia desde el 01/01/2026
+    return {"fecha": "", "ts": 1767225600.0 + i * 86400, "juego": juego, "resultado": "gano", "ganancia": i}
+
+
+def jugar(almacen, uid, n, desde=0):
+    for i in range(desde, desde + n):
+        almacen.registrar_partida(uid, f"User{uid}", partida(i))
+
+# ══════════════════════════════════════════════════════════════
+# TESTS
+# ══════════════════════════════════════════════════════════════
+
+def test_compactar_deja_solo_las_recientes_en_caliente(almacen):
+    jugar(almacen, "1234", 40)
+    jugar(almacen, "5678", 2)
+
+    assert almacen.compactar() == 37
+    assert almacen.almacen.contar_partidas("1234") == 3
+    assert almacen.almacen.contar_partidas("5678") == 2
+    assert almacen.compactar() == 0
+
+
+def test_historial_completo_tras_compactar(almacen):
+    jugar(almacen, "1234", 40)
+    almacen.compactar()
+    jugar(almacen, "1234", 2, desde=40)
+
+    assert almacen.contar_partidas("1234") == 42
+    ganancias = [p["ganancia"] for p in almacen.obtener_partidas("1234")["partidas"]]
+    assert ganancias == list(range(41, -1, -1))
+    # Con un limite que cabe en caliente no se abre el archivo
+    assert [p["ganancia"] for p in almacen.obtener_partidas("1234", limite=2)["partidas"]] == [41, 40]
+
+
+def test_rango_y_exportacion_incluyen_lo_archivado(almacen):
+    jugar(almacen, "1234", 40)
+    almacen.compactar()
+
+    filas = almacen.buscar_partidas(desde=partida(5)["ts"], hasta=partida(8)["ts"])
+    assert [p["ganancia"] for _, _, p in filas] == [5, 6, 7]
+    assert len(list(almacen.iterar_partidas())) == 40
+    assert len(almacen.cargar_historial()["1234"]["partidas"]) == 40
+
+
+def test_segmentos_comprimidos_por_mes(almacen):
+    jugar(almacen, "1234", 40)
+    almacen.compactar()
+    segmentos = sorted(f for f in os.listdir(almacen.archivo.carpeta) if f.endswith(".ndjson.gz"))
+    assert [s.split(".")[0] for s in segmentos] == ["2026-01", "2026-02"]
+
+
+def test_compactacion_sin_confirmar_se_descarta(tipo, tmp_path):
+    caliente = crear_caliente(tipo, tmp_path)
+    almacen = AlmacenConArchivo(caliente, ArchivoPartidas(str(tmp_path / "archivo")), retener=3)
+    jugar(almacen, "1234", 10)
+
+    # Simula una caida despues de escribir el archivo y antes de confirmar en el almacen
+    def caida(filas):
+        almacen.archivo.escribir(1, filas)
+        raise OSError("caida")
+
+    with pytest.raises(OSError):
+        caliente.retirar_partidas(3, 1, caida)
+    caliente.cerrar()
+
+    reabierto = AlmacenConArchivo(crear_caliente(tipo, tmp_path), ArchivoPartidas(str(tmp_path / "archivo")), retener=3)
+    assert reabierto.contar_partidas("1234") == 10
+    assert reabierto.archivo.contar("1234") == 0
+    assert reabierto.compactar() == 7
+    assert reabierto.contar_partidas("1234") == 10
+    reabierto.cerrar()
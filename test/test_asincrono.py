@@ -0,0 +1,67 @@
+import asyncio
+import inspect
+import threading
+import time
+
+import pytest
+
+import api
+from Funciones.asincrono import EjecutorAlmacen, asincrono
+
+
+def test_endpoints_son_corrutinas_con_la_firma_original():
+    for ruta in api.app.routes:
+        if getattr(ruta, "path", "").startswith(("/jugar", "/api", "/jugadas", "/mesa", "/carreras", "/gacha", "/bote")):
+            assert inspect.iscoroutinefunction(ruta.endpoint), ruta.path
+    parametros = api.app.openapi()["paths"]["/jugadas/{user_id}"]["get"]["parameters"]
+    assert {p["name"] for p in parametros} == {"user_id", "limite"}
+
+
+def test_peticiones_en_espera_no_ocupan_hilos():
+    ejecutor = EjecutorAlmacen(hilos=2)
+    activos, maximo, hilos = [0], [0], set()
+    lock = threading.Lock()
+
+    def leer(i):
+        with lock:
+            activos[0] += 1
+            maximo[0] = max(maximo[0], activos[0])
+            hilos.add(threading.get_ident())
+        time.sleep(0.001)
+        with lock:
+            activos[0] -= 1
+        return i
+
+    async def escenario():
+        return await asyncio.gather(*(ejecutor.ejecutar(leer, i) for i in range(500)))
+
+    assert asyncio.run(escenario()) == list(range(500))
+    assert maximo[0] <= 2 and len(hilos) <= 2
+    ejecutor.cerrar()
+
+
+def test_decorador_propaga_excepciones():
+    @asincrono
+    def falla(x: int):
+        raise ValueError(x)
+
+    async def escenario():
+        try:
+            await falla(3)
+        except ValueError as e:
+            return e.args
+
+    assert asyncio.run(escenario()) == (3,)
+
+
+def test_apagado_cierra_el_ejecutor():
+    from fastapi.testclient import TestClient
+    from Funciones import asincrono as modulo
+
+    with TestClient(api.app) as cliente:
+        assert cliente.get("/bote").status_code in (200, 404)
+        ejecutor = modulo.obtener_ejecutor()
+    # Cerrado: no acepta tareas nuevas y la siguiente peticion crea otro
+    with pytest.raises(RuntimeError):
+        asyncio.run(ejecutor.ejecutar(time.time))
+    assert modulo.obtener_ejecutor() is not ejecutor
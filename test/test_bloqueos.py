@@ -0,0 +1,83 @@
+import threading
+import time
+import pytest
+import juegos.liquidacion as liquidacion
+from juegos.base_juegos import Juego, FichasInsuficientes
+from Funciones.bloqueos import BloqueosPorUsuario
+from Funciones.funciones import gestionar_apuesta
+
+# ══════════════════════════════════════════════════════════════
+# FIXTURES
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture()
+def sin_historial(monkeypatch):
+    monkeypatch.setattr(liquidacion, "registrar_partida", lambda *a, **k: None)
+
+
+def usuarios_db(*uids, fichas=1000):
+    return {uid: {"nombre": f"User{uid}", "fichas": fichas, "stats": {"partidas_totales": 0, "dados": 0}}
+            for uid in uids}
+
+# ══════════════════════════════════════════════════════════════
+# TESTS
+# ══════════════════════════════════════════════════════════════
+
+def test_mismo_usuario_misma_franja():
+    bloqueos = BloqueosPorUsuario(franjas=8)
+    assert bloqueos.para("1234") is bloqueos.para(1234)
+
+
+def test_apuestas_concurrentes_mismo_usuario_no_pierden_saldo(sin_historial):
+    db = usuarios_db("1234")
+
+    def guardado_lento(datos):
+        time.sleep(0.001)  # ensancha la ventana en la que se perderia una actualizacion
+
+    def apostar():
+        juego = Juego("dados", db, "1234", gestionar_apuesta, guardado_lento)
+        juego.procesar_resultado(10, False, 0)
+
+    hilos = [threading.Thread(target=apostar) for _ in range(50)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert db["1234"]["fichas"] == 500
+    assert db["1234"]["stats"]["partidas_totales"] == 50
+
+
+def test_usuarios_distintos_no_se_bloquean(sin_historial):
+    db = usuarios_db("1111", "2222")
+    bloqueos = BloqueosPorUsuario(franjas=64)
+    assert bloqueos.franja("1111") != bloqueos.franja("2222")
+
+    dentro = threading.Event()
+    liberar = threading.Event()
+
+    def guardado_bloqueante(datos):
+        dentro.set()
+        liberar.wait(2)
+
+    bloqueado = threading.Thread(
+        target=Juego("dados", db, "1111", gestionar_apuesta, guardado_bloqueante).procesar_resultado,
+        args=(10, False, 0),
+    )
+    bloqueado.start()
+    dentro.wait(2)
+
+    # Mientras 1111 sigue dentro de su seccion critica, 2222 termina
+    Juego("dados", db, "2222", gestionar_apuesta, lambda datos: None).procesar_resultado(10, False, 0)
+    assert db["2222"]["fichas"] == 990
+
+    liberar.set()
+    bloqueado.join()
+
+
+def test_saldo_se_comprueba_dentro_del_bloqueo(sin_historial):
+    db = usuarios_db("1234", fichas=5)
+    juego = Juego("dados", db, "1234", gestionar_apuesta, lambda datos: None)
+    with pytest.raises(FichasInsuficientes):
+        juego.procesar_resultado(10, False, 0)
+    assert db["1234"]["fichas"] == 5
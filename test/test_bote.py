@@ -0,0 +1,165 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from Funciones.almacenamiento import AlmacenSQLite
+from Funciones.bote import UNIDAD, BoteProgresivo
+from Funciones.estado import EstadoCasino
+from Funciones.verificacion import verificar_partida
+from juegos.motores import MOTORES, Apuesta
+
+client = TestClient(api.app)
+
+
+class AzarFijo:
+    def __init__(self, valor):
+        self.valor = valor
+
+    def random(self):
+        return self.valor
+
+
+def cuadra(bote):
+    return bote.bote == bote.sembrado + bote.aportado - bote.pagado
+
+
+def test_aportaciones_de_varios_hilos_se_consolidan_exactas():
+    bote = BoteProgresivo(porcentaje=1.5, semilla=100, azar=AzarFijo(0.99))
+
+    def jugar():
+        for _ in range(1000):
+            bote.jugar("USR001", "tragamonedas", 7)
+
+    hilos = [threading.Thread(target=jugar) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    # Hasta consolidar lo aportado vive en los fragmentos de cada hilo
+    assert bote.aportado == 0
+    bote.consolidar()
+    assert bote.aportado == 8 * 1000 * 7 * 150
+    assert bote.apuestas == 8000
+    assert bote.estado()["bote"] == 100 + 8000 * 7 * 0.015
+    assert cuadra(bote)
+
+
+def test_cobrar_paga_fichas_enteras_y_vuelve_a_sembrar(tmp_path):
+    almacen = AlmacenSQLite(str(tmp_path / "casino.db"))
+    bote = BoteProgresivo(porcentaje=1.0, semilla=50, almacen=almacen, azar=AzarFijo(0.99))
+    bote.aportar(333)  # 3.33 fichas, sin consolidar
+    fichas, cambios = bote.cobrar("USR001", "tragamonedas")
+    assert fichas == 53
+    # El resto fraccionario se queda para el siguiente premio
+    assert bote.bote == 50 * UNIDAD + 3300
+    assert cuadra(bote)
+
+    # Hasta guardar los cambios con el saldo el almacen no sabe nada del premio
+    assert BoteProgresivo(semilla=50, almacen=almacen).pagado == 0
+    almacen.confirmar({}, [], bote=cambios)
+    recargado = BoteProgresivo(semilla=50, almacen=almacen)
+    assert (recargado.bote, recargado.pagado, recargado.apuestas) == (bote.bote, 53 * UNIDAD, 1)
+    assert recargado.premios == [{"uid": "USR001", "juego": "tragamonedas", "fichas": 53}]
+    almacen.cerrar()
+
+
+def test_consolidar_guarda_lo_aportado_y_se_importa_el_bote_heredado(tmp_path):
+    almacen = AlmacenSQLite(str(tmp_path / "casino.db"))
+    heredado = {"bote": 70 * UNIDAD, "sembrado": 60 * UNIDAD, "aportado": 10 * UNIDAD, "pagado": 0,
+                "apuestas": 4, "premios": []}
+    bote = BoteProgresivo(semilla=50, almacen=almacen, heredado=heredado)
+    assert bote.bote == 70 * UNIDAD
+    bote.aportar(200)
+    bote.consolidar()
+    # Ya hay bote en el almacen: el heredado no se vuelve a importar
+    recargado = BoteProgresivo(semilla=50, almacen=almacen, heredado=heredado)
+    assert (recargado.bote, recargado.apuestas) == (72 * UNIDAD, 5)
+    assert cuadra(recargado)
+    almacen.cerrar()
+
+
+def test_premio_del_bote_se_liquida_con_la_apuesta(monkeypatch, almacen_api, espiar_confirmaciones):
+    almacen = almacen_api({"USR001": {"nombre": "Ana", "fichas": 100,
+                                      "stats": {"partidas_totales": 0, "tragamonedas": 0}}})
+    bote = BoteProgresivo(semilla=200, azar=AzarFijo(0))
+    monkeypatch.setattr(api.liquidacion, "bote", bote)
+    confirmaciones = espiar_confirmaciones(almacen)
+
+    usuarios, respuesta = api.liquidacion.jugar(MOTORES["tragamonedas"], "USR001", Apuesta(10),
+                                                rng=api.obtener_aleatoriedad().flujo())
+
+    assert respuesta["bote"] == 200
+    assert confirmaciones == [(1, 1)]
+    assert bote.estado()["ultimos_premios"][0]["fichas"] == 200
+    partida = almacen.obtener_partidas("USR001")["partidas"][0]
+    assert partida["bote"] == 200
+    assert partida["resultado"] == "gano"
+    assert almacen.obtener_usuario("USR001")["fichas"] == partida["fichas_despues"] == usuarios["USR001"]["fichas"]
+    assert verificar_partida(partida, None) == ([], True)
+
+
+def test_juegos_que_no_participan_no_aportan(monkeypatch):
+    bote = BoteProgresivo(juegos=["tragamonedas"], azar=AzarFijo(0))
+    monkeypatch.setattr(api.liquidacion, "bote", bote)
+    assert client.get("/bote").json()["bote"] == 500
+    assert not bote.participa("dados")
+
+
+def test_si_no_se_guarda_el_premio_vuelve_al_bote():
+    def falla(usuarios, partidas, bote):
+        raise OSError("disco lleno")
+
+    from juegos.liquidacion import Liquidacion
+    from Funciones.funciones import gestionar_apuesta
+    bote = BoteProgresivo(semilla=300, azar=AzarFijo(0))
+    liquidacion = Liquidacion(gestionar_apuesta, None, confirmar_datos=falla, bote=bote)
+    usuarios = {"u": {"nombre": "u", "fichas": 50, "stats": {"partidas_totales": 0}}}
+    with pytest.raises(OSError):
+        liquidacion.liquidar(usuarios, "u", "tragamonedas", 10, False, 0)
+    assert bote.pagado == 0
+    assert bote.bote == 300 * UNIDAD + 10 * 100
+    assert cuadra(bote)
+
+
+def test_premio_en_modo_diferido_viaja_en_el_lote_del_saldo(tmp_path):
+    from juegos.liquidacion import Liquidacion
+    from Funciones.funciones import gestionar_apuesta
+    almacen = AlmacenSQLite(str(tmp_path / "casino.db"))
+    almacen.guardar_usuarios({"u": {"nombre": "u", "fichas": 50, "stats": {"partidas_totales": 0}}})
+    estado = EstadoCasino(almacen, intervalo_verificacion=60, modo="diferida", intervalo_vaciado=60)
+    bote = BoteProgresivo(semilla=300, almacen=almacen, azar=AzarFijo(0))
+    liquidacion = Liquidacion(gestionar_apuesta, None, lambda uid: {uid: estado.usuario(uid)},
+                              estado.confirmar, bote=bote)
+
+    with liquidacion.lote("u") as (usuarios, unidad):
+        liquidacion.liquidar(usuarios, "u", "tragamonedas", 10, False, 0, unidad=unidad)
+    # Ni saldo ni bote han llegado al almacen: si el proceso se cae se pierden juntos
+    assert almacen.obtener_usuario("u")["fichas"] == 50
+    assert BoteProgresivo(semilla=300, almacen=almacen).pagado == 0
+
+    estado.cerrar()
+    assert almacen.obtener_usuario("u")["fichas"] == 50 - 10 + 300
+    recargado = BoteProgresivo(semilla=300, almacen=almacen)
+    assert (recargado.pagado, recargado.bote) == (300 * UNIDAD, bote.bote)
+    almacen.cerrar()
+
+
+def test_lote_que_no_se_guarda_devuelve_el_premio():
+    from juegos.liquidacion import Liquidacion
+    from Funciones.funciones import gestionar_apuesta
+
+    def falla(usuarios, partidas, bote):
+        raise OSError("disco lleno")
+
+    bote = BoteProgresivo(semilla=300, azar=AzarFijo(0))
+    liquidacion = Liquidacion(gestionar_apuesta, None, confirmar_datos=falla, bote=bote)
+    usuarios = {"u": {"nombre": "u", "fichas": 50, "stats": {"partidas_totales": 0}}}
+    with pytest.raises(OSError):
+        with liquidacion.lote("u", usuarios) as (usuarios, unidad):
+            for _ in range(2):
+                usuarios = liquidacion.liquidar(usuarios, "u", "tragamonedas", 10, False, 0, unidad=unidad)
+    assert (bote.pagado, bote.premios) == (0, [])
+    assert cuadra(bote)
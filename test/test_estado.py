@@ -0,0 +1,190 @@
+import time
+import pytest
+from Funciones.almacenamiento import AlmacenJSON, AlmacenSQLite
+from Funciones.estado import EstadoCasino, EstadoCerrado
+
+# ══════════════════════════════════════════════════════════════
+# FIXTURES
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture(params=["json", "sqlite"])
+def almacen(request, tmp_path):
+    if request.param == "json":
+        a = AlmacenJSON(str(tmp_path / "users.json"), str(tmp_path / "historial.json"),
+                        str(tmp_path / "historial.jsonl"))
+    else:
+        a = AlmacenSQLite(str(tmp_path / "casino.db"))
+    a.guardar_usuarios({"1234": {"nombre": "Ana", "fichas": 100}})
+    yield a
+    a.cerrar()
+
+# ══════════════════════════════════════════════════════════════
+# TESTS
+# ══════════════════════════════════════════════════════════════
+
+def test_lecturas_no_tocan_el_almacen(almacen, monkeypatch):
+    estado = EstadoCasino(almacen, intervalo_verificacion=60)
+    monkeypatch.setattr(almacen, "cargar_usuarios", lambda: pytest.fail("lectura de disco"))
+    monkeypatch.setattr(almacen, "version", lambda: pytest.fail("lectura de disco"))
+
+    assert estado.usuario("1234")["fichas"] == 100
+    assert list(estado.usuarios()) == ["1234"]
+
+
+def test_escritura_llega_al_almacen(almacen):
+    estado = EstadoCasino(almacen, intervalo_verificacion=60)
+    estado.guardar_usuario("1234", {"nombre": "Ana", "fichas": 40})
+
+    assert estado.usuario("1234")["fichas"] == 40
+    assert almacen.obtener_usuario("1234")["fichas"] == 40
+
+
+def test_confirmacion_fallida_no_deja_saldo_en_memoria(almacen, monkeypatch):
+    from Funciones.funciones import gestionar_apuesta
+    from juegos.liquidacion import Liquidacion
+    estado = EstadoCasino(almacen, intervalo_verificacion=60)
+    almacen.guardar_usuarios({"1234": {"nombre": "Ana", "fichas": 100, "stats": {"partidas_totales": 0}}})
+    estado.recargar()
+
+    def falla(*a, **k):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(almacen, "confirmar", falla)
+    liquidacion = Liquidacion(gestionar_apuesta, None, lambda uid: {uid: estado.usuario(uid)}, estado.confirmar)
+
+    with pytest.raises(OSError):
+        liquidacion.liquidar(None, "1234", "dados", 30, False, 0)
+    assert estado.usuario("1234")["fichas"] == 100
+
+
+def test_detecta_cambios_de_otro_proceso(almacen):
+    estado = EstadoCasino(almacen, intervalo_verificacion=0)
+    # Otro proceso (p. ej. la CLI) escribe directamente en el almacen
+    almacen.guardar_usuarios({"5678": {"nombre": "Luis", "fichas": 70}})
+
+    assert estado.usuario("5678")["fichas"] == 70
+
+
+def test_escritura_propia_no_provoca_recarga(almacen, monkeypatch):
+    estado = EstadoCasino(almacen, intervalo_verificacion=0)
+    estado.guardar_usuario("1234", {"nombre": "Ana", "fichas": 40})
+    monkeypatch.setattr(almacen, "cargar_usuarios", lambda: pytest.fail("recarga innecesaria"))
+
+    assert estado.usuario("1234")["fichas"] == 40
+
+def test_verificacion_durante_una_escritura_propia_no_recarga(almacen, monkeypatch):
+    estado = EstadoCasino(almacen, intervalo_verificacion=0)
+    original = almacen.confirmar
+    leidos = []
+
+    def confirmar(*a, **k):
+        versiones = original(*a, **k)
+        # Otra peticion lee con la escritura ya en el almacen pero sin encadenar
+        leidos.append(estado.usuario("1234")["fichas"])
+        return versiones
+    monkeypatch.setattr(almacen, "confirmar", confirmar)
+    cargas = []
+    cargar = almacen.cargar_usuarios
+    monkeypatch.setattr(almacen, "cargar_usuarios", lambda: cargas.append(1) or cargar())
+
+    estado.confirmar({"1234": {"nombre": "Ana", "fichas": 40}}, [])
+
+    assert leidos == [100] and cargas == []
+    assert estado.usuario("1234")["fichas"] == 40 and cargas == []
+
+
+# ══════════════════════════════════════════════════════════════
+# TESTS DE ESCRITURA DIFERIDA
+# ══════════════════════════════════════════════════════════════
+
+def contar_escrituras(almacen, monkeypatch):
+    llamadas = []
+    original = almacen.confirmar
+
+    def confirmar(usuarios, partidas, sincronizar=False, bote=None):
+        llamadas.append(dict(usuarios))
+        return original(usuarios, partidas, sincronizar, bote)
+
+    monkeypatch.setattr(almacen, "confirmar", confirmar)
+    return llamadas
+
+
+def test_diferida_agrupa_escrituras_en_un_lote(almacen, monkeypatch):
+    estado = EstadoCasino(almacen, modo="diferida", intervalo_vaciado=60, tamano_lote=1000)
+    llamadas = contar_escrituras(almacen, monkeypatch)
+
+    for i in range(50):
+        estado.guardar_usuario(str(i), {"nombre": f"User{i}", "fichas": i})
+    assert llamadas == []
+    assert estado.usuario("49")["fichas"] == 49  # ya visible en memoria
+
+    estado.cerrar()
+    assert len(llamadas) == 1
+    assert len(llamadas[0]) == 50
+    assert almacen.obtener_usuario("49")["fichas"] == 49
+
+
+def test_diferida_vacia_al_llenar_el_lote(almacen):
+    estado = EstadoCasino(almacen, modo="diferida", intervalo_vaciado=60, tamano_lote=5)
+    for i in range(5):
+        estado.guardar_usuario(str(i), {"nombre": f"User{i}", "fichas": i})
+
+    for _ in range(200):
+        if almacen.obtener_usuario("4") is not None:
+            break
+        time.sleep(0.01)
+    assert almacen.obtener_usuario("4")["fichas"] == 4
+    estado.cerrar()
+
+
+def test_durabilidad_commit_espera_al_volcado(almacen):
+    estado = EstadoCasino(almacen, modo="diferida", intervalo_vaciado=60, durabilidad="commit")
+    estado.guardar_usuario("1234", {"nombre": "Ana", "fichas": 7})
+    # Al volver de guardar el cambio ya esta en el almacen
+    assert almacen.obtener_usuario("1234")["fichas"] == 7
+    estado.cerrar()
+
+
+def test_durabilidad_commit_falla_si_se_cierra_sin_guardar(almacen, monkeypatch, caplog):
+    import threading
+    estado = EstadoCasino(almacen, modo="diferida", intervalo_vaciado=0.01, durabilidad="commit")
+
+    def falla(*a, **k):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(almacen, "confirmar", falla)
+    errores = []
+
+    def guardar():
+        try:
+            estado.guardar_usuario("1234", {"nombre": "Ana", "fichas": 7})
+        except EstadoCerrado as e:
+            errores.append(e)
+
+    hilo = threading.Thread(target=guardar)
+    hilo.start()
+    for _ in range(200):
+        if "No se pudo volcar el estado" in caplog.text:
+            break
+        time.sleep(0.01)
+    with pytest.raises(OSError):
+        estado.cerrar()
+    hilo.join(5)
+    assert len(errores) == 1
+    assert "No se pudo volcar el estado" in caplog.text
+
+
+def test_diferida_recarga_que_no_puede_volcar_no_falla_la_lectura(almacen, monkeypatch, caplog):
+    estado = EstadoCasino(almacen, intervalo_verificacion=0, modo="diferida", intervalo_vaciado=60)
+    estado.guardar_usuario("1234", {"nombre": "Ana", "fichas": 40})
+
+    # Otro proceso escribe: la lectura intenta recargar y el volcado previo falla
+    almacen.guardar_usuarios({"5678": {"nombre": "Luis", "fichas": 70}})
+
+    def falla(*a, **k):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(almacen, "confirmar", falla)
+
+    assert estado.usuario("1234")["fichas"] == 40
+    assert "No se pudo recargar el estado" in caplog.text
+    monkeypatch.undo()
+    estado.cerrar()
+    assert almacen.obtener_usuario("1234")["fichas"] == 40
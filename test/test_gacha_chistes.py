@@ -19,8 +19,8 @@ def db_ricardo():
 
 def test_gacha_exito(monkeypatch, db_ricardo):
     """Prueba que puede canjear un chiste y se le descuentan 5 fichas."""
-    monkeypatch.setattr(api, "cargar_json", lambda path: db_ricardo)
-    monkeypatch.setattr(api, "guardar_json", lambda path, data: None)
+    monkeypatch.setattr(api, "cargar_db_usuarios", lambda *a: db_ricardo)
+    monkeypatch.setattr(api, "guardar_db_usuarios", lambda data: None)
 
     chiste_fijo = "¿Qué hace una abeja en el gimnasio? ¡Zumba!"
     monkeypatch.setattr(random, "choice", lambda lista: chiste_fijo)
@@ -37,7 +37,7 @@ def test_gacha_insuficiente(monkeypatch, db_ricardo):
     """Prueba que recibe un error si solo tiene 2 fichas."""
     # Modificamos a Ricardo para que sea pobre
     db_ricardo["1111"]["fichas"] = 2
-    monkeypatch.setattr(api, "cargar_json", lambda path: db_ricardo)
+    monkeypatch.setattr(api, "cargar_db_usuarios", lambda *a: db_ricardo)
 
     response = client.post(f"/gacha/chiste?user_id=1111")
 
@@ -46,9 +46,106 @@ def test_gacha_insuficiente(monkeypatch, db_ricardo):
 
 def test_gacha_usuario_no_existe(monkeypatch):
     """Prueba que la API responde 404 si el ID no existe."""
-    monkeypatch.setattr(api, "cargar_json", lambda path: {})
+    monkeypatch.setattr(api, "cargar_db_usuarios", lambda *a: {})
 
     response = client.post(f"/gacha/chiste?user_id=9999")
 
     assert response.status_code == 404
-    assert "no encontrado" in response.json()["detail"].lower()
\ No newline at end of file
+    assert "no encontrado" in response.json()["detail"].lower()
+
+from collections import Counter
+from Funciones.gacha import MotorChistes
+
+RAREZAS = [
+    {"nombre": "comun", "peso": 90, "chistes": ["c1", "c2", "c3"]},
+    {"nombre": "raro", "peso": 10, "chistes": ["r1", "r2"]},
+]
+
+def test_motor_no_repite_hasta_ver_toda_la_rareza():
+    """Un bit por chiste visto: no se repite ninguno hasta agotar la rareza."""
+    motor = MotorChistes([{"nombre": "comun", "peso": 1, "chistes": ["a", "b", "c", "d"]}], pity=0)
+    tiradas, estado = motor.resolver_varias(4, {}, random.Random(3))
+    assert sorted(t["chiste"] for t in tiradas) == ["a", "b", "c", "d"]
+    assert estado["vistos"] == "f"
+    # Vistos todos, vuelven a salir
+    tirada, estado = motor.resolver(estado, random.Random(3))
+    assert estado["vistos"] == format(1 << motor.indices[tirada["chiste"]], "x")
+
+def test_motor_pity_garantiza_la_rareza_maxima():
+    motor = MotorChistes(RAREZAS, pity=5)
+    estado = {"pity": 0}
+    rng = random.Random(0)
+    rarezas = []
+    seguidas = 0
+    for _ in range(200):
+        tirada, estado = motor.resolver(estado, rng)
+        rarezas.append(tirada["rareza"])
+        seguidas = seguidas + 1 if tirada["rareza"] == "comun" else 0
+        # Nunca pasan 5 tiradas seguidas sin un raro
+        assert seguidas < 5 and estado["pity"] == seguidas
+    assert Counter(rarezas)["raro"] >= 200 // 5
+
+def test_tirada_multiple_cobra_y_guarda_una_vez(monkeypatch, db_ricardo):
+    db_ricardo["1111"]["fichas"] = 60
+    guardados = []
+    monkeypatch.setattr(api, "cargar_db_usuarios", lambda *a: db_ricardo)
+    monkeypatch.setattr(api, "guardar_db_usuarios", lambda data: guardados.append(data))
+
+    response = client.post("/gacha/chiste/multiple?user_id=1111")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["tiradas"]) == 10
+    assert data["fichas_restantes"] == 10
+    assert len(guardados) == 1
+    assert db_ricardo["1111"]["gacha"]["pity"] == data["pity"]
+    # Sin repetidos hasta agotar cada rareza
+    comunes = [t["chiste"] for t in data["tiradas"] if t["rareza"] == "comun"]
+    assert len(set(comunes[:8])) == len(comunes[:8])
+
+    db_ricardo["1111"]["fichas"] = 49
+    assert client.post("/gacha/chiste/multiple?user_id=1111").status_code == 400
+
+def test_tirada_no_pisa_una_apuesta_liquidada_antes_del_bloqueo(monkeypatch, almacen_api):
+    """Una apuesta que se liquida mientras la tirada espera el bloqueo no se pierde."""
+    from contextlib import contextmanager
+    from Funciones import gacha
+    from juegos.motores import Apuesta
+
+    almacen_api({"1111": {"nombre": "Ricardo", "contrasena": "abcd", "fichas": 100,
+                          "stats": {"partidas_totales": 0}}})
+    bloqueo = gacha.bloqueo_usuario
+    saldos = []
+
+    @contextmanager
+    def apuesta_y_bloqueo(uid):
+        api._jugar("dados", uid, Apuesta(50))
+        saldos.append(api.cargar_db_usuarios(uid)[uid]["fichas"])
+        with bloqueo(uid):
+            yield
+    monkeypatch.setattr(gacha, "bloqueo_usuario", apuesta_y_bloqueo)
+
+    response = client.post("/gacha/chiste?user_id=1111")
+
+    assert response.status_code == 200
+    assert response.json()["fichas_restantes"] == saldos[0] - 5
+    assert api.cargar_db_usuarios("1111")["1111"]["fichas"] == saldos[0] - 5
+
+def test_tirada_conserva_pity_y_vistos_de_otra_tirada(monkeypatch, almacen_api):
+    """El pity y los vistos se leen y se escriben en el usuario releido."""
+    from Funciones.gacha import GachaChistes
+
+    almacen_api({"1111": {"nombre": "Ricardo", "contrasena": "abcd", "fichas": 100,
+                          "stats": {"partidas_totales": 0}}})
+    motor = MotorChistes([{"nombre": "comun", "peso": 1, "chistes": ["a", "b"]}], costo=5, pity=0)
+    # La primera se crea con el usuario leido antes de que tire la segunda
+    primera = GachaChistes(api.cargar_db_usuarios("1111"), "1111", api.guardar_db_usuarios,
+                           motor=motor, cargar_datos=api.cargar_db_usuarios)
+    segunda = GachaChistes({}, "1111", api.guardar_db_usuarios, motor=motor, cargar_datos=api.cargar_db_usuarios)
+
+    chistes = [segunda.tirar_gacha()["chiste"], primera.tirar_gacha()["chiste"]]
+
+    usuario = api.cargar_db_usuarios("1111")["1111"]
+    assert sorted(chistes) == ["a", "b"]  # la segunda tirada no repite
+    assert usuario["gacha"]["vistos"] == "3"  # los dos chistes vistos
+    assert usuario["fichas"] == 90
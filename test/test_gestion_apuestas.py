@@ -47,7 +47,7 @@ def sin_usuarios():
 @pytest.fixture()
 def sin_disco(monkeypatch):
     """Evita escritura en archivos reales."""
-    funciones = ["guardar_json", "guardar_db_usuarios", "guardar_usuarios", "registrar_partida"]
+    funciones = ["guardar_json", "guardar_db_usuarios", "confirmar_db", "guardar_usuarios", "registrar_partida"]
     for func in funciones:
         if hasattr(api, func):
             monkeypatch.setattr(api, func, lambda *a, **k: None)
@@ -102,6 +102,17 @@ class TestUsuarios:
         })
         assert r.status_code == 403
 
+    def test_id_repetido_no_pisa_la_cuenta(self, monkeypatch, almacen_api):
+        from Funciones import funciones
+        almacen = almacen_api({"USR001": USUARIO_REAL})
+        monkeypatch.setattr(funciones, "nuevo_id_usuario", lambda: "USR001")
+
+        r = client.post("/api/usuarios", json={
+            "nombre": "Intruso", "contrasena": "123456", "fecha_nacimiento": "01/01/1990"
+        })
+        assert r.status_code == 409
+        assert almacen.obtener_usuario("USR001")["fichas"] == 500
+
 class TestBanco:
     def test_agregar_fichas_usuario_inexistente(self, monkeypatch, sin_usuarios, sin_disco):
         usar_db(monkeypatch, sin_usuarios)
@@ -48,6 +48,20 @@ def test_iniciar_sesion_usuario_inexistente(usuarios_db_limpio):
     assert resultado == False, "No debe permitir inicio de sesión con ID inexistente"
 
 
+def test_iniciar_sesion_guarda_el_hash(usuarios_db_con_usuario):
+    """La contraseña en texto plano pasa a hash y se guarda"""
+    usuarios_db = usuarios_db_con_usuario
+    guardados = []
+
+    assert iniciar_sesion(usuarios_db, "1234", "pass123", guardados.append)
+
+    assert es_hash(usuarios_db["1234"]["contrasena"])
+    assert guardados == [usuarios_db]
+    # Ya tiene hash: no se vuelve a guardar
+    assert iniciar_sesion(usuarios_db, "1234", "pass123", guardados.append)
+    assert len(guardados) == 1
+
+
 # =====================================================
 # TESTS DE GESTIÓN DE FICHAS
 # =====================================================
@@ -157,7 +171,7 @@ def test_clase_usuario_creacion():
     assert user.fecha_nacimiento == "01/01/2000"
     assert user.fichas == 100
     assert user.id is not None
-    assert len(user.id) == 4
+    assert user.id.isdigit()
 
 
 def test_clase_usuario_to_dict():
@@ -185,10 +199,10 @@ def test_clase_usuario_id_unico():
     # Todos los IDs deben ser diferentes
     assert len(ids) == len(set(ids)), "Los IDs deben ser únicos"
     
-    # Todos deben ser de 4 dígitos
+    # Numéricos y ordenados por momento de creación
     for user_id in ids:
-        assert len(user_id) == 4
         assert user_id.isdigit()
+    assert ids == sorted(ids)
 
 
 def test_calcular_edad():
@@ -228,4 +242,30 @@ def test_calcular_edad_menor_18():
     
     edad = calcular_edad(fecha_str)
     
-    assert edad < 18, "Debe ser menor de 18"
\ No newline at end of file
+    assert edad < 18, "Debe ser menor de 18"
+
+def test_generador_ids_sin_colisiones_y_ordenado():
+    """Muchos IDs seguidos del mismo proceso: únicos, de ancho fijo y en orden"""
+    from Funciones.identificadores import GeneradorIds, descomponer_id
+
+    generador = GeneradorIds(nodo=7)
+    ids = [generador.siguiente() for _ in range(20000)]
+
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert descomponer_id(ids[0])[1] == 7
+    assert descomponer_id("1234") is None
+
+
+
+def test_generador_ids_pide_el_nodo_al_almacen():
+    """Sin nodo configurado se asigna uno; si no se puede, no se generan IDs"""
+    from Funciones.identificadores import GeneradorIds, NodoNoDisponible, descomponer_id
+
+    assert descomponer_id(GeneradorIds(asignar=lambda: 1024 + 5).siguiente())[1] == 5
+
+    def sin_almacen():
+        raise OSError("base de datos bloqueada")
+
+    with pytest.raises(NodoNoDisponible):
+        GeneradorIds(asignar=sin_almacen).reservar_nodo()
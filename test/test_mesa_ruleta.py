@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from Funciones.aleatoriedad import FlujoPCG, reproducir_resultado
+from Funciones.bloqueos import bloqueos_usuarios
+from juegos.liquidacion import FichasInsuficientes
+from juegos.mesa_ruleta import MesaLlena, MesaRuleta
+from juegos.motores import Apuesta
+from juegos.planificador import PlanificadorRondas
+
+client = TestClient(api.app)
+
+USUARIOS = {
+    uid: {"nombre": uid, "fichas": 100, "stats": {"partidas_totales": 0, "ruleta": 0}}
+    for uid in ("USR001", "USR002", "USR003")
+}
+
+
+@pytest.fixture()
+def almacen(monkeypatch, almacen_api):
+    monkeypatch.setattr(api, "mesa_ruleta", MesaRuleta(api.liquidacion, segundos_ronda=60))
+    return almacen_api(USUARIOS)
+
+
+def apostar(uid, *apuestas):
+    return client.post("/mesa/ruleta/apuestas", json={"user_id": uid, "apuestas": list(apuestas)})
+
+
+def test_un_giro_liquida_a_todos_con_una_confirmacion(monkeypatch, almacen, espiar_confirmaciones):
+    monkeypatch.setattr(FlujoPCG, "randint", lambda self, a, b: 19)
+    confirmaciones = espiar_confirmaciones(almacen)
+
+    ronda_id = apostar("USR001", {"monto": 10, "tipo_apuesta": "rojo"}).json()["ronda"]
+    apostar("USR002", {"monto": 10, "tipo_apuesta": "negro"}, {"monto": 5, "tipo_apuesta": "pleno", "numeros": [19]})
+    apostar("USR003", {"monto": 20, "tipo_apuesta": "docena", "numeros": [2]})
+    assert client.get("/mesa/ruleta").json()["apuestas"] == 4
+
+    api.mesa_ruleta.girar()
+
+    assert confirmaciones == [(3, 4)]
+    fichas = {uid: almacen.obtener_usuario(uid)["fichas"] for uid in USUARIOS}
+    assert fichas == {"USR001": 110, "USR002": 100 - 15 + 180, "USR003": 140}
+    ronda = client.get(f"/mesa/ruleta/rondas/{ronda_id}", params={"user_id": "USR002"}).json()
+    assert (ronda["estado"], ronda["numero_ganador"], ronda["color_ganador"]) == ("liquidada", 19, "rojo")
+    assert [a["resultado"] for a in ronda["mis_apuestas"]] == ["perdio", "gano"]
+    assert client.get("/mesa/ruleta").json()["ultimos_numeros"] == [19]
+
+
+def test_partidas_de_la_ronda_se_reproducen(almacen):
+    apostar("USR001", {"monto": 5, "tipo_apuesta": "calle", "numeros": [7, 8, 9]})
+    apostar("USR002", {"monto": 5, "tipo_apuesta": "impar"})
+    ronda = api.mesa_ruleta.girar()
+
+    for uid in ("USR001", "USR002"):
+        partida = almacen.obtener_partidas(uid)["partidas"][0]
+        assert partida["ronda"] == ronda.id
+        assert reproducir_resultado(partida).datos["numero_ganador"] == ronda.numero_ganador
+
+
+def test_saldo_y_capacidad_al_apostar(almacen):
+    assert apostar("USR001", {"monto": 60, "tipo_apuesta": "par"}).status_code == 200
+    # Lo ya apostado en la ronda cuenta contra el saldo
+    assert apostar("USR001", {"monto": 60, "tipo_apuesta": "impar"}).status_code == 400
+    assert apostar("USR009", {"monto": 5, "tipo_apuesta": "par"}).status_code == 404
+    assert client.get("/mesa/ruleta/rondas/123").status_code == 404
+
+    mesa = MesaRuleta(api.liquidacion, max_apuestas=1)
+    mesa.apostar("USR001", [Apuesta(5, "par")], 100)
+    with pytest.raises(MesaLlena):
+        mesa.apostar("USR002", [Apuesta(5, "par")], 100)
+    with pytest.raises(FichasInsuficientes):
+        MesaRuleta(api.liquidacion).apostar("USR001", [Apuesta(500, "par")], 100)
+
+
+def test_apuesta_sin_saldo_al_girar_se_anula(almacen):
+    apostar("USR001", {"monto": 80, "tipo_apuesta": "rojo"})
+    # Entretanto el usuario gasta sus fichas en otro juego
+    api.estado.confirmar({"USR001": {**USUARIOS["USR001"], "fichas": 10}}, [])
+    ronda = api.mesa_ruleta.girar()
+    assert ronda.resultados == [None]
+    assert almacen.obtener_usuario("USR001")["fichas"] == 10
+    assert ronda.resumen("USR001")["mis_apuestas"][0]["resultado"] == "anulada"
+
+
+def test_planificador_gira_cada_ronda():
+    giros = []
+
+    class MesaFalsa:
+        def __init__(self):
+            self.ronda_actual = type("R", (), {"cierra_en": 0})()
+
+        def cerrar_ronda(self):
+            giros.append(1)
+
+    async def escenario():
+        planificador = PlanificadorRondas(MesaFalsa())
+        planificador.iniciar()
+        while len(giros) < 3:
+            await asyncio.sleep(0.01)
+        await planificador.detener()
+
+    asyncio.run(asyncio.wait_for(escenario(), 5))
+    assert len(giros) >= 3
+
+
+def test_bloqueo_de_varios_usuarios_en_orden():
+    locks = bloqueos_usuarios.varios(["a", "b", "a", "c"])
+    franjas = sorted({bloqueos_usuarios.franja(u) for u in "abc"})
+    assert locks == [bloqueos_usuarios._franjas[f] for f in franjas]
@@ -0,0 +1,153 @@
+import random
+import pytest
+import juegos.liquidacion as liquidacion
+from Funciones.funciones import gestionar_apuesta
+from juegos.liquidacion import FichasInsuficientes, Liquidacion
+from juegos.motores import MOTORES, CATALOGO_RULETA, ROJOS, Apuesta, MotorRuleta
+
+
+class RngFijo:
+    """Devuelve los valores indicados en orden en cada randint."""
+    def __init__(self, *valores):
+        self.valores = list(valores)
+
+    def randint(self, a, b):
+        return self.valores.pop(0)
+
+
+def usuarios_db(fichas=100):
+    return {"1234": {"nombre": "Ana", "fichas": fichas, "stats": {"partidas_totales": 0, "dados": 0}}}
+
+# ══════════════════════════════════════════════════════════════
+# MOTORES
+# ══════════════════════════════════════════════════════════════
+
+def test_motores_compartidos_e_inmutables():
+    motor = MOTORES["ruleta"]
+    with pytest.raises(AttributeError):
+        motor.pago_pleno = 100
+    with pytest.raises(TypeError):
+        MOTORES["carreras"].caballos["1"]["mult"] = 100
+
+
+@pytest.mark.parametrize("juego, apuesta, tiradas, esperado", [
+    ("dados", Apuesta(10), (5, 2), ("gano", 2)),
+    ("dados", Apuesta(10), (3, 3), ("empate", 1)),
+    ("ruleta", Apuesta(10, "1", 17), (17,), ("gano", 36)),
+    ("ruleta", Apuesta(10, "2"), (0,), ("perdio", 0)),
+    ("tragamonedas", Apuesta(5), (7, 7, 7), ("gano", 90)),
+])
+def test_resolver_es_puro(juego, apuesta, tiradas, esperado):
+    resultado = MOTORES[juego].resolver(apuesta, RngFijo(*tiradas))
+    assert (resultado.resultado, resultado.multiplicador) == esperado
+
+
+def test_carreras_paga_el_caballo_elegido():
+    motor = MOTORES["carreras"]
+    ganadores = set()
+    for x in range(0, 400, 7):
+        r = motor.resolver(Apuesta(10, eleccion="2"), RngFijo(x))
+        assert r.gano == (r.datos["ganador"] == "2")
+        assert r.multiplicador == 3
+        ganadores.add(r.datos["ganador"])
+    assert ganadores == {"1", "2", "3", "4"}
+
+
+def test_validar():
+    assert MOTORES["ruleta"].validar(Apuesta(10, "9")) == "Tipo de apuesta inválido"
+    assert MOTORES["tragamonedas"].validar(Apuesta(11)) == "Apuesta máxima permitida: 10"
+    assert MOTORES["carreras"].validar(Apuesta(10, eleccion="99")) == "Ese caballo no existe"
+    assert MOTORES["dados"].validar(Apuesta(10)) is None
+
+
+def test_mismo_rng_mismo_resultado():
+    motor = MotorRuleta()
+    a = [motor.resolver(Apuesta(1, "1", 5), random.Random(3)) for _ in range(3)]
+    assert a[0] == a[1] == a[2]
+
+# ══════════════════════════════════════════════════════════════
+# CATALOGO DE RULETA
+# ══════════════════════════════════════════════════════════════
+
+def test_catalogo_ruleta_completo():
+    cuenta = {}
+    for (tipo, _), mascara in CATALOGO_RULETA.items():
+        cuenta[tipo] = cuenta.get(tipo, 0) + 1
+        assert 0 < mascara < 1 << 37
+    assert cuenta == {"pleno": 37, "caballo": 60, "calle": 14, "cuadro": 22, "seisena": 11,
+                      "docena": 3, "columna": 3, "rojo": 1, "negro": 1, "par": 1, "impar": 1,
+                      "falta": 1, "pasa": 1}
+    # Cada apuesta cubre tantos numeros como indica su pago: 36 / pago
+    motor = MOTORES["ruleta"]
+    for (tipo, _), mascara in CATALOGO_RULETA.items():
+        assert bin(mascara).count("1") * motor.pagos[tipo] == 36
+
+
+@pytest.mark.parametrize("apuesta, bola, multiplicador", [
+    (Apuesta(1, "caballo", numeros=(20, 17)), 20, 18),
+    (Apuesta(1, "calle", numeros=(0, 2, 3)), 0, 12),
+    (Apuesta(1, "cuadro", numeros=(1, 2, 4, 5)), 3, 0),
+    (Apuesta(1, "columna", numeros=(3,)), 36, 3),
+    (Apuesta(1, "rojo"), 32, 2),
+    (Apuesta(1, "negro"), 0, 0),
+    (Apuesta(1, "2"), 32, 2),   # heredado: pares, no color
+])
+def test_apuestas_del_tapete(apuesta, bola, multiplicador):
+    assert MOTORES["ruleta"].resolver(apuesta, RngFijo(bola)).multiplicador == multiplicador
+
+
+def test_validar_numeros_del_tapete():
+    motor = MOTORES["ruleta"]
+    assert motor.validar(Apuesta(1, "caballo", numeros=(1, 5))) == "Números no válidos para caballo"
+    assert motor.validar(Apuesta(1, "docena", numeros=(4,))) == "Números no válidos para docena"
+    assert motor.validar(Apuesta(1, "seisena", numeros=(31, 32, 33, 34, 35, 36))) is None
+    assert len(ROJOS) == 18
+
+
+def test_un_giro_para_varias_apuestas():
+    apuestas = [Apuesta(10, "rojo"), Apuesta(5, "pleno", numeros=(7,)), Apuesta(5, "par")]
+    resultados = MOTORES["ruleta"].resolver_varias(apuestas, RngFijo(7))
+    assert [r.multiplicador for r in resultados] == [2, 36, 0]
+    assert {r.datos["numero_ganador"] for r in resultados} == {7}
+
+# ══════════════════════════════════════════════════════════════
+# LIQUIDACION
+# ══════════════════════════════════════════════════════════════
+
+def test_liquidacion_aplica_saldo_e_historial(monkeypatch):
+    partidas = []
+    monkeypatch.setattr(liquidacion, "registrar_partida", lambda *a, **k: partidas.append(a))
+    guardados = []
+    liq = Liquidacion(gestionar_apuesta, guardados.append)
+
+    usuarios, respuesta = liq.jugar(MOTORES["dados"], "1234", Apuesta(10), usuarios_db(), rng=RngFijo(6, 1))
+    assert respuesta["fichas_finales"] == 110
+    assert respuesta["resultado"] == "gano"
+    assert (respuesta["tiro_jugador"], respuesta["tiro_banca"]) == (6, 1)
+    assert len(partidas) == 1 and len(guardados) == 1
+
+    with pytest.raises(FichasInsuficientes):
+        liq.jugar(MOTORES["dados"], "1234", Apuesta(500), usuarios, rng=RngFijo(6, 1))
+
+
+def test_lote_confirma_una_vez(monkeypatch):
+    confirmaciones = []
+    liq = Liquidacion(gestionar_apuesta, lambda datos: None,
+                      confirmar_datos=lambda usuarios, partidas, bote: confirmaciones.append(len(partidas)))
+    with liq.lote("1234", usuarios_db()) as (usuarios, unidad):
+        for _ in range(3):
+            usuarios, _ = liq.jugar(MOTORES["dados"], "1234", Apuesta(10), usuarios, unidad, rng=RngFijo(1, 6))
+    assert usuarios["1234"]["fichas"] == 70
+    assert confirmaciones == [3]
+
+
+def test_jugar_varias_liquida_con_un_giro(monkeypatch):
+    partidas = []
+    monkeypatch.setattr(liquidacion, "registrar_partida", lambda *a, **k: partidas.append(a))
+    liq = Liquidacion(gestionar_apuesta, lambda datos: None, confirmar_datos=lambda usuarios, partidas, bote: None)
+    apuestas = [Apuesta(10, "negro"), Apuesta(10, "docena", numeros=(1,))]
+    with liq.lote("1234", usuarios_db()) as (usuarios, unidad):
+        usuarios, resultados = liq.jugar_varias(MOTORES["ruleta"], "1234", apuestas, usuarios, unidad, RngFijo(2))
+    # Sale el 2 (negro, primera docena): 100 - 20 + 20 + 30
+    assert usuarios["1234"]["fichas"] == 130
+    assert len(partidas) == 2
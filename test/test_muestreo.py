@@ -0,0 +1,54 @@
+import random
+from collections import Counter
+
+import pytest
+
+from juegos.motores import CABALLOS, MotorCarreras
+from juegos.muestreo import MuestreoPonderado
+
+
+class RngSecuencial:
+    """randint que recorre todos los valores del rango en orden."""
+    def __init__(self):
+        self.siguiente = 0
+
+    def randint(self, a, b):
+        valor = a + self.siguiente
+        self.siguiente += 1
+        return valor
+
+
+@pytest.mark.parametrize("pesos", [
+    {"1": 40, "2": 30, "3": 20, "4": 10},
+    {"a": 1, "b": 0, "c": 7},
+    {"solo": 3},
+    {i: i * i for i in range(1, 12)},
+])
+def test_probabilidades_exactas(pesos):
+    muestreo = MuestreoPonderado(pesos)
+    n = len(pesos) * muestreo.total
+    # Recorriendo todos los valores posibles del randint cada opcion sale
+    # exactamente peso * len(pesos) veces
+    conteo = Counter(muestreo.muestrear_lote(n, RngSecuencial()))
+    assert {k: conteo.get(k, 0) for k in pesos} == {k: p * len(pesos) for k, p in pesos.items()}
+
+
+def test_pesos_no_validos():
+    for pesos in ({}, {"a": 0}, {"a": -1}, {"a": 0.5}):
+        with pytest.raises(ValueError):
+            MuestreoPonderado(pesos)
+
+
+def test_tabla_de_caballos_nueva_sin_tocar_codigo():
+    caballos = {**CABALLOS, "5": {"nombre": "Babieca", "prob": 100, "mult": 2}}
+    motor = MotorCarreras(caballos)
+    assert motor.muestreo.probabilidad("5") == 0.5
+    assert set(motor.sortear_ganadores(500, random.Random(1))) == set(caballos)
+
+
+def test_lote_numpy():
+    np = pytest.importorskip("numpy")
+    muestreo = MuestreoPonderado({"1": 40, "2": 30, "3": 20, "4": 10})
+    indices = muestreo.indices_numpy(np.random.default_rng(5), 200_000)
+    frecuencias = np.bincount(indices, minlength=4) / len(indices)
+    assert frecuencias == pytest.approx([0.4, 0.3, 0.2, 0.1], abs=0.005)
@@ -0,0 +1,43 @@
+from fractions import Fraction
+
+import pytest
+
+from Funciones.probabilidades import calcular_odds
+from juegos.motores import MOTORES, CABALLOS, MotorCarreras, MotorRuleta
+
+
+def test_rtp_exacto_de_cada_apuesta():
+    assert calcular_odds("dados")["apuestas"]["duelo"]["rtp_exacto"] == "1"
+    assert calcular_odds("tragamonedas")["apuestas"]["tirada"]["rtp_exacto"] == str(Fraction(440, 512))
+    ruleta = calcular_odds("ruleta")["apuestas"]
+    assert {ruleta[t]["rtp_exacto"] for t in ("1", "2", "3")} == {"36/37"}
+    # En la ruleta europea todas las apuestas del tapete tienen la misma ventaja
+    assert {ruleta[t]["rtp_exacto"] for t in MOTORES["ruleta"].TIPOS} == {"36/37"}
+    assert ruleta["calle"]["prob_acierto"] == pytest.approx(3 / 37)
+    carreras = calcular_odds("carreras")["apuestas"]
+    assert [carreras[c]["rtp"] for c in ("1", "2", "3", "4")] == pytest.approx([0.8, 0.9, 0.8, 0.5])
+
+
+def test_distribucion_suma_uno_y_varianza():
+    pleno = calcular_odds("ruleta")["apuestas"]["1"]
+    assert sum(Fraction(d["exacta"]) for d in pleno["distribucion"]) == 1
+    # Bernoulli de 1/37 pagando 36: 36^2 * p - rtp^2
+    assert pleno["varianza"] == pytest.approx(float(Fraction(36 * 36, 37) - Fraction(36, 37) ** 2))
+    dados = calcular_odds("dados")["apuestas"]["duelo"]
+    assert [d["exacta"] for d in dados["distribucion"]] == ["5/12", "1/6", "5/12"]
+
+
+def test_cache_y_recalculo_al_cambiar_pagos(monkeypatch):
+    assert calcular_odds("ruleta") is calcular_odds("ruleta")
+
+    monkeypatch.setitem(MOTORES, "ruleta", MotorRuleta(pago_pleno=35))
+    assert calcular_odds("ruleta")["apuestas"]["1"]["rtp_exacto"] == "35/37"
+
+    caballos = {**CABALLOS, "4": {**CABALLOS["4"], "mult": 10}}
+    monkeypatch.setitem(MOTORES, "carreras", MotorCarreras(caballos))
+    assert calcular_odds("carreras")["apuestas"]["4"]["rtp"] == pytest.approx(1.0)
+
+
+def test_juego_desconocido():
+    with pytest.raises(KeyError):
+        calcular_odds("bingo")
@@ -0,0 +1,125 @@
+import random
+from collections import Counter
+from fractions import Fraction
+from itertools import product
+
+import pytest
+
+from Funciones import probabilidades
+from Funciones.funciones import gestionar_apuesta
+from Funciones.probabilidades import calcular_odds
+from juegos import liquidacion
+from juegos.liquidacion import aplicar_apuesta
+from juegos.motores import MOTORES, Apuesta, MotorTragamonedas
+from juegos.rodillos import MAQUINAS, TablaRodillos
+
+FRUTAS = MotorTragamonedas.maquina("frutas")
+
+
+def test_clasica_mantiene_las_reglas():
+    tabla = MOTORES["tragamonedas"].tabla
+    for paradas in product(range(8), repeat=3):
+        a, b, c = paradas
+        esperado = (a + 2) * 10 if a == b == c else 0
+        assert tabla.evaluar(paradas)[0] == esperado
+
+
+def test_comodin_sustituye_y_paga_el_mejor():
+    tabla = TablaRodillos([[0, 1, 2, 9]] * 3, 1, [[0, 0, 0]],
+                          {1: {3: 10}, 2: {3: 50}, 9: {2: 20, 3: 100}}, comodin=9)
+    assert tabla._evaluar_linea((9, 1, 1)) == (10, 1, 3)
+    # Dos comodines pagan 20 por si solos: mejor que tres 1
+    assert tabla._evaluar_linea((9, 9, 1)) == (20, 9, 2)
+    assert tabla._evaluar_linea((9, 9, 2)) == (50, 2, 3)
+    assert tabla._evaluar_linea((9, 9, 9)) == (100, 9, 3)
+    assert tabla._evaluar_linea((0, 9, 1)) == (0, None, 0)
+
+
+def test_lineas_y_scatter():
+    tabla = FRUTAS.tabla
+    # Tres comodines en la fila central
+    paradas = (16, 13, 17)
+    ventana = tabla.ventana(paradas)
+    assert ventana[1] == [7, 7, 7]
+    multiplicador, premiadas, scatters = tabla.evaluar(paradas)
+    assert {p["linea"] for p in premiadas} >= {0}
+    esperado = sum(p["pago"] for p in premiadas) + 5 * MAQUINAS["frutas"]["pagos_scatter"].get(scatters, 0)
+    assert multiplicador == Fraction(esperado, 5)
+
+
+def test_tabla_coincide_con_evaluar_cada_linea():
+    tabla = FRUTAS.tabla
+    rng = random.Random(5)
+    for _ in range(2000):
+        paradas = [rng.randrange(n) for n in tabla.longitudes]
+        ventana = tabla.ventana(paradas)
+        _, premiadas, _ = tabla.evaluar(paradas)
+        directo = [(i, tabla._evaluar_linea(tuple(ventana[f][r] for r, f in enumerate(linea))))
+                   for i, linea in enumerate(tabla.lineas)]
+        assert [(p["linea"], p["pago"]) for p in premiadas] == [(i, e[0]) for i, e in directo if e[0]]
+
+
+def test_evaluacion_vectorizada():
+    np = pytest.importorskip("numpy")
+    tabla = FRUTAS.tabla
+    paradas = np.random.default_rng(1).integers(0, tabla.longitudes, (5000, 3))
+    vectorizado = tabla.evaluar_numpy(paradas)
+    assert vectorizado.tolist() == [float(tabla.evaluar(p)[0]) for p in paradas.tolist()]
+
+
+def test_rtp_exacto_de_una_maquina_configurada(monkeypatch):
+    monkeypatch.setitem(MOTORES, "tragamonedas", FRUTAS)
+    tirada = calcular_odds("tragamonedas")["apuestas"]["tirada"]
+    assert tirada["rtp"] == pytest.approx(0.95, abs=1e-3)
+
+
+def test_multiplicador_fraccionario_paga_a_la_baja():
+    usuarios = {"1": {"fichas": 100, "stats": {"partidas_totales": 0}}}
+    usuarios = aplicar_apuesta(gestionar_apuesta, usuarios, "1", 7, "tragamonedas", True, Fraction(6, 5))
+    assert usuarios["1"]["fichas"] == 100 - 7 + 8
+    resultado = FRUTAS.resolver(Apuesta(7), random.Random(2))
+    assert isinstance(resultado.datos["fichas_ganadas"], int)
+
+
+def test_premio_por_debajo_de_la_apuesta_se_registra_como_perdida(monkeypatch):
+    partidas = []
+    monkeypatch.setattr(liquidacion, "registrar_partida", lambda *a, **k: partidas.append(a))
+    liq = liquidacion.Liquidacion(gestionar_apuesta, lambda datos: None)
+    usuarios = {"1": {"nombre": "Ana", "fichas": 100, "stats": {"partidas_totales": 0}}}
+    # Dos cerezas en una de cinco lineas: 1/5 de la apuesta, 0 fichas con 4
+    usuarios = liq.liquidar(usuarios, "1", "tragamonedas", 4, True, Fraction(1, 5))
+    usuarios = liq.liquidar(usuarios, "1", "tragamonedas", 10, True, Fraction(1, 5))
+    usuarios = liq.liquidar(usuarios, "1", "tragamonedas", 5, True, Fraction(5, 5))
+    assert [(p[5], p[6]) for p in partidas] == [("perdio", -4), ("perdio", -8), ("empate", 0)]
+    assert usuarios["1"]["fichas"] == 88
+
+
+def test_odds_por_ventanas_y_por_apuesta(monkeypatch):
+    monkeypatch.setitem(MOTORES, "tragamonedas", FRUTAS)
+    tabla = FRUTAS.tabla
+    todas = Counter(tabla.evaluar(p)[0] for p in product(*(range(n) for n in tabla.longitudes)))
+    rtp = sum(m * n for m, n in todas.items()) / Fraction(sum(todas.values()))
+    assert calcular_odds("tragamonedas")["apuestas"]["tirada"]["rtp_exacto"] == str(rtp)
+    # Los pagos son quintos de la apuesta: con 5 fichas no se redondea nada
+    assert calcular_odds("tragamonedas", 5)["apuestas"]["tirada"]["rtp_exacto"] == str(rtp)
+    assert calcular_odds("tragamonedas", 1)["apuestas"]["tirada"]["rtp"] < float(rtp)
+
+
+def test_odds_estimadas_si_hay_demasiadas_tiradas(monkeypatch):
+    monkeypatch.setitem(MOTORES, "tragamonedas", FRUTAS)
+    monkeypatch.setattr(probabilidades, "MAX_TIRADAS", 1)
+    monkeypatch.setattr(probabilidades, "MUESTRAS", 20_000)
+    probabilidades._calcular.cache_clear()
+    try:
+        tirada = calcular_odds("tragamonedas")["apuestas"]["tirada"]
+    finally:
+        probabilidades._calcular.cache_clear()
+    assert (tirada["exacto"], tirada["muestras"]) == (False, 20_000)
+    assert tirada["rtp"] == pytest.approx(0.95, abs=0.1)
+
+
+def test_configuracion_no_valida():
+    with pytest.raises(ValueError):
+        TablaRodillos([[0, 1]] * 3, 1, [[0, 0]], {0: {3: 5}})
+    with pytest.raises(ValueError):
+        TablaRodillos([[0, 1]] * 3, 1, [[0, 0, 3]], {0: {3: 5}})
@@ -0,0 +1,131 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from Funciones.almacenamiento import AlmacenSQLite
+from Funciones.seguridad import Sesiones, es_hash, hashear_contrasena, verificar_contrasena
+
+client = TestClient(api.app)
+
+
+class Reloj:
+    def __init__(self, ahora=1000):
+        self.ahora = ahora
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_hash_con_sal():
+    guardada = hashear_contrasena("pass123", rondas=1)
+    assert es_hash(guardada) and "pass123" not in guardada
+    assert guardada != hashear_contrasena("pass123", rondas=1)  # sal distinta
+    assert verificar_contrasena(guardada, "pass123")
+    assert not verificar_contrasena(guardada, "pass124")
+    # Contraseñas heredadas en texto plano
+    assert verificar_contrasena("pass123", "pass123")
+    assert not verificar_contrasena("pass123", None)
+
+
+def test_token_caduca_y_se_puede_revocar():
+    reloj = Reloj()
+    sesiones = Sesiones("secreto", ttl=60, reloj=reloj)
+    token, caduca = sesiones.emitir("USR001")
+    assert caduca == 1060
+    assert sesiones.verificar(token) == "USR001"
+
+    # Otro proceso con el mismo secreto lo acepta por la firma
+    otro = Sesiones("secreto", ttl=60, reloj=reloj)
+    assert otro.verificar(token) == "USR001" and len(otro) == 1
+    assert Sesiones("otro secreto", reloj=reloj).verificar(token) is None
+    cuerpo, firma = token.split(".")
+    assert sesiones.verificar(cuerpo[:-2] + "xx." + firma) is None
+    assert sesiones.verificar("basura") is None
+
+    sesiones.revocar(token)
+    assert sesiones.verificar(token) is None
+
+    reloj.ahora = 1060
+    assert otro.verificar(token) is None
+
+
+def test_cache_descarta_caducadas_y_sobrantes():
+    reloj = Reloj()
+    sesiones = Sesiones("secreto", ttl=10, max_sesiones=3, reloj=reloj)
+    tokens = [sesiones.emitir(f"U{i}")[0] for i in range(5)]
+    assert len(sesiones) == 3
+    reloj.ahora += 10
+    sesiones.emitir("U9")
+    assert len(sesiones) == 1
+    # Fuera de la cache el token sigue valido por su firma mientras no caduque
+    reloj.ahora -= 5
+    assert sesiones.verificar(tokens[0]) == "U0"
+
+
+def test_revocacion_no_depende_de_la_cache(tmp_path):
+    reloj = Reloj()
+    almacen = AlmacenSQLite(str(tmp_path / "casino.db"))
+    sesiones = Sesiones("secreto", ttl=60, max_sesiones=2, reloj=reloj, almacen=almacen)
+    token, _ = sesiones.emitir("USR001")
+    sesiones.revocar(token)
+    # Llenar la cache no devuelve la vida al token revocado
+    for i in range(5):
+        sesiones.emitir(f"U{i}")
+    assert sesiones.verificar(token) is None
+
+    # Otro proceso (o tras un reinicio) lo ve revocado, este en su cache o no
+    otro = Sesiones("secreto", ttl=60, reloj=reloj, almacen=almacen)
+    assert otro.verificar(token) is None
+    vivo, _ = sesiones.emitir("USR002")
+    assert otro.verificar(vivo) == "USR002"
+
+    # Con el token en la cache no se consulta el almacen...
+    consultas = []
+    for metodo in ("sesion_revocada", "sesiones_revocadas"):
+        original = getattr(almacen, metodo)
+        setattr(almacen, metodo, lambda *a, original=original: consultas.append(a) or original(*a))
+    sesiones.revocar(vivo)
+    assert otro.verificar(vivo) == "USR002" and consultas == []
+    # ...hasta que pasa el intervalo y se recargan las revocaciones
+    reloj.ahora += 5
+    assert otro.verificar(vivo) is None and len(consultas) == 1
+    assert otro.verificar(vivo) is None and len(consultas) == 1
+    almacen.cerrar()
+
+
+@pytest.fixture
+def usuario(monkeypatch):
+    db = {"USR001": {"nombre": "Juan Test", "contrasena": "pass123", "fichas": 500,
+                     "stats": {"partidas_totales": 0}}}
+    guardados = []
+    monkeypatch.setattr(api, "cargar_db_usuarios", lambda *a: db)
+    monkeypatch.setattr(api, "guardar_db_usuarios", lambda datos: guardados.append(datos))
+    monkeypatch.setattr(api, "confirmar_db", lambda usuarios, partidas, bote=None: None)
+    sesiones = Sesiones("secreto")
+    monkeypatch.setattr(api, "obtener_sesiones", lambda: sesiones)
+    return db, guardados
+
+
+def test_login_y_peticiones_con_token(usuario):
+    db, guardados = usuario
+    assert client.post("/api/sesion", json={"user_id": "USR001", "contrasena": "mal"}).status_code == 401
+
+    r = client.post("/api/sesion", json={"user_id": "USR001", "contrasena": "pass123"})
+    assert r.status_code == 200
+    # La contraseña en texto plano se ha pasado a hash al entrar
+    assert es_hash(db["USR001"]["contrasena"]) and len(guardados) == 1
+    cabecera = {"Authorization": f"Bearer {r.json()['token']}"}
+
+    r = client.get("/api/usuarios/USR001/info", headers=cabecera)
+    assert r.status_code == 200
+    assert "contrasena" not in r.json()["data"]
+    r = client.post("/api/banco/agregar-fichas", json={"user_id": "USR001", "cantidad": 100}, headers=cabecera)
+    assert r.json()["fichas_actuales"] == 600
+    # El token es de USR001: no sirve para otro usuario
+    db["USR002"] = {**db["USR001"], "nombre": "Otro"}
+    assert client.get("/api/usuarios/USR002/info", headers=cabecera).status_code == 401
+
+    client.delete("/api/sesion", headers=cabecera)
+    assert client.get("/api/usuarios/USR001/info", headers=cabecera).status_code == 401
+    # Sin token sigue funcionando la contraseña
+    assert client.get("/api/usuarios/USR001/info", params={"contrasena": "pass123"}).status_code == 200
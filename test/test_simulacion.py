@@ -0,0 +1,57 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from Funciones import simulacion
+from Funciones.simulacion import chi2_p_valor, comprobar_kernel, simular
+
+# RTP teorico de cada apuesta con las reglas actuales
+RTP_TEORICO = {
+    ("dados", "duelo"): 1.0,
+    ("ruleta", "1"): 36 / 37,
+    ("ruleta", "2"): 36 / 37,
+    ("ruleta", "3"): 36 / 37,
+    ("tragamonedas", "tirada"): 440 / 512,
+    ("carreras", "1"): 0.8,
+    ("carreras", "4"): 0.5,
+}
+
+
+@pytest.mark.parametrize("juego,apuesta", list(RTP_TEORICO))
+def test_rtp_dentro_del_intervalo(juego, apuesta):
+    r = simular(juego, apuesta, rondas=400_000, procesos=1, tamano_bloque=100_000, semilla=7)
+    assert r["rondas"] == 400_000
+    # Margen de 4 desviaciones para que el test no sea fragil
+    margen = 4 * r["desviacion"] / r["rondas"] ** 0.5
+    assert abs(r["rtp"] - RTP_TEORICO[(juego, apuesta)]) < margen
+
+
+def test_pool_de_procesos_reproducible():
+    a = simular("ruleta", "1", rondas=50_000, procesos=2, tamano_bloque=10_000, semilla=3)
+    b = simular("ruleta", "1", rondas=50_000, procesos=1, tamano_bloque=10_000, semilla=3)
+    assert a == b
+
+
+def test_apuesta_desconocida():
+    with pytest.raises(ValueError):
+        simular("ruleta", "9", rondas=10)
+
+
+def test_chi2_p_valor():
+    assert chi2_p_valor(3.841, 1) == pytest.approx(0.05, abs=1e-3)
+    assert chi2_p_valor(18.307, 10) == pytest.approx(0.05, abs=1e-3)
+
+
+@pytest.mark.parametrize("juego,apuesta", [("dados", "duelo"), ("ruleta", "1"),
+                                           ("tragamonedas", "tirada"), ("carreras", "2")])
+def test_kernel_coincide_con_el_juego(juego, apuesta):
+    assert comprobar_kernel(juego, apuesta, rondas=5_000, semilla=11)["coincide"]
+
+
+def test_kernel_erroneo_se_detecta(monkeypatch):
+    # Un kernel de dados que ignora los empates no pasa la prueba
+    def sesgado(rng, n, apuesta):
+        return np.where(rng.integers(1, 7, n) > rng.integers(1, 7, n), 2.0, 0.0)
+
+    monkeypatch.setitem(simulacion.KERNELS, "dados", (sesgado, ["duelo"]))
+    assert not comprobar_kernel("dados", "duelo", rondas=5_000, semilla=11)["coincide"]
@@ -0,0 +1,65 @@
+import pytest
+from Funciones.almacenamiento import AlmacenJSON, AlmacenSQLite
+from Funciones.estado import EstadoCasino
+from Funciones.funciones import gestionar_apuesta
+from Funciones.unidad_trabajo import UnidadDeTrabajo
+from juegos.base_juegos import Juego
+
+# ══════════════════════════════════════════════════════════════
+# FIXTURES
+# ══════════════════════════════════════════════════════════════
+
+@pytest.fixture(params=["json", "sqlite"])
+def almacen(request, tmp_path):
+    if request.param == "json":
+        a = AlmacenJSON(str(tmp_path / "users.json"), str(tmp_path / "historial.json"),
+                        str(tmp_path / "historial.jsonl"))
+    else:
+        a = AlmacenSQLite(str(tmp_path / "casino.db"))
+    a.guardar_usuarios({"1234": {"nombre": "Ana", "fichas": 100, "stats": {"partidas_totales": 0, "dados": 0}}})
+    yield a
+    a.cerrar()
+
+
+def jugar(estado, apuesta=10, gano=False):
+    juego = Juego("dados", estado.usuarios(), "1234", gestionar_apuesta, estado.guardar_usuarios,
+                  lambda uid: {uid: estado.usuario(uid)}, estado.confirmar)
+    juego.procesar_resultado(apuesta, gano, 2)
+
+# ══════════════════════════════════════════════════════════════
+# TESTS
+# ══════════════════════════════════════════════════════════════
+
+def test_unidad_no_escribe_hasta_confirmar():
+    confirmados = []
+    unidad = UnidadDeTrabajo(lambda usuarios, partidas, bote: confirmados.append((usuarios, partidas, bote)))
+    unidad.marcar_usuario(1234, {"fichas": 90})
+    unidad.registrar_partida(1234, "Ana", {"juego": "dados"})
+    assert confirmados == []
+
+    unidad.confirmar()
+    assert confirmados == [({"1234": {"fichas": 90}}, [("1234", "Ana", {"juego": "dados"})], None)]
+    assert not unidad.pendiente()
+
+
+@pytest.mark.parametrize("modo", ["inmediata", "diferida"])
+def test_saldo_y_partida_se_guardan_juntos(almacen, modo):
+    estado = EstadoCasino(almacen, intervalo_verificacion=60, modo=modo, durabilidad="commit")
+    jugar(estado)
+    estado.cerrar()
+
+    assert almacen.obtener_usuario("1234")["fichas"] == 90
+    partida = almacen.obtener_partidas("1234")["partidas"][0]
+    assert partida["fichas_despues"] == 90
+
+
+def test_fallo_sqlite_no_deja_partida_sin_saldo(tmp_path, monkeypatch):
+    almacen = AlmacenSQLite(str(tmp_path / "casino.db"))
+    # Un usuario que no se puede serializar hace fallar el upsert tras insertar la partida
+    with pytest.raises(TypeError):
+        almacen.confirmar({"1234": {"nombre": "Ana", "fichas": object()}},
+                          [("1234", "Ana", {"juego": "dados"})])
+
+    assert almacen.contar_partidas("1234") == 0
+    assert almacen.obtener_usuario("1234") is None
+    almacen.cerrar()
@@ -0,0 +1,103 @@
+import gzip
+import json
+import pytest
+from Funciones.aleatoriedad import FlujoPCG, ServicioAleatorio
+from Funciones.funciones import gestionar_apuesta
+from Funciones.verificacion import leer_archivo, verificar
+import juegos.liquidacion as modulo
+from juegos.liquidacion import Liquidacion
+from juegos.motores import MOTORES, Apuesta
+
+SERVICIO = ServicioAleatorio("semilla-de-prueba")
+
+
+def jugar_partidas(n_usuarios=3, jugadas=20):
+    """Juega de verdad con la liquidacion y devuelve el historial registrado."""
+    filas = []
+    liquidacion = Liquidacion(gestionar_apuesta, lambda datos: None)
+    original = modulo.registrar_partida
+    modulo.registrar_partida = lambda uid, nombre, *a, unidad=None, extra=None: filas.append(
+        (uid, nombre, {"fecha": "", "juego": a[0], "apuesta": a[1], "detalles": a[2], "resultado": a[3],
+                       "ganancia": a[4], "fichas_antes": a[5], "fichas_despues": a[6], **(extra or {})}))
+    try:
+        apuestas = [("dados", Apuesta(5)), ("ruleta", Apuesta(5, "1", 7)), ("ruleta", Apuesta(5, "3")),
+                    ("tragamonedas", Apuesta(2)), ("carreras", Apuesta(5, eleccion="2"))]
+        for u in range(n_usuarios):
+            uid = f"U{u}"
+            usuarios = {uid: {"nombre": uid, "fichas": 10_000, "stats": {"partidas_totales": 0}}}
+            rng = FlujoPCG(SERVICIO.semilla, 1000 + u)
+            for i in range(jugadas):
+                juego, apuesta = apuestas[i % len(apuestas)]
+                usuarios, _ = liquidacion.jugar(MOTORES[juego], uid, apuesta, usuarios, rng=rng)
+    finally:
+        modulo.registrar_partida = original
+    return filas
+
+
+@pytest.mark.parametrize("procesos", [1, 2])
+def test_historial_correcto(procesos):
+    filas = jugar_partidas()
+    informe = verificar(iter(filas), procesos=procesos, servicio=SERVICIO)
+    assert informe["correcto"]
+    assert (informe["partidas"], informe["reproducidas"], informe["usuarios"]) == (60, 60, 3)
+    assert informe["saltos_saldo"] == 0
+
+
+def test_detecta_manipulaciones():
+    filas = jugar_partidas(n_usuarios=1, jugadas=10)
+    perdida = next(p for _, _, p in filas if p["resultado"] == "perdio")
+    perdida.update(resultado="gano", ganancia=100, fichas_despues=perdida["fichas_antes"] + 100)
+    filas[0][2]["detalles"] = "Jugador: 6 vs Banca: 1"
+
+    informe = verificar(iter(filas), procesos=1, servicio=SERVICIO)
+    assert not informe["correcto"]
+    campos = {d["campo"] for d in informe["discrepancias"]}
+    assert {"resultado", "ganancia", "fichas_despues", "detalles"} <= campos
+    # El saldo manipulado ya no encadena con la partida siguiente
+    assert informe["saltos_saldo"] == 1
+
+
+def test_partidas_sin_flujo_solo_aritmetica():
+    antiguas = [
+        ("1", "Ana", {"juego": "dados", "apuesta": 10, "resultado": "perdio", "ganancia": -10,
+                      "fichas_antes": 100, "fichas_despues": 90}),
+        # Premio fraccionario redondeado por debajo de la apuesta: cobra 2 de 10
+        ("1", "Ana", {"juego": "tragamonedas", "apuesta": 10, "resultado": "perdio", "ganancia": -8,
+                      "fichas_antes": 90, "fichas_despues": 82}),
+        ("1", "Ana", {"juego": "dados", "apuesta": 10, "resultado": "empate", "ganancia": 0,
+                      "fichas_antes": 82, "fichas_despues": 87}),
+    ]
+    informe = verificar(iter(antiguas), procesos=1, servicio=SERVICIO)
+    assert (informe["sin_flujo"], informe["total_discrepancias"]) == (3, 2)
+    assert {d["campo"] for d in informe["discrepancias"]} == {"resultado", "ganancia"}
+
+
+def test_ingresos_del_banco_no_son_apuestas():
+    filas = jugar_partidas(n_usuarios=1, jugadas=2)
+    saldo = filas[-1][2]["fichas_despues"]
+    filas.append(("U0", "U0", {"juego": "banco", "apuesta": 0, "resultado": "gano", "ganancia": 500,
+                               "detalles": "Ingreso desde API Banco", "fichas_antes": saldo,
+                               "fichas_despues": saldo + 500}))
+    assert verificar(iter(filas), procesos=1, servicio=SERVICIO)["correcto"]
+
+    filas[-1][2]["fichas_despues"] += 1
+    filas.append(("U0", "U0", {"juego": "dados", "apuesta": 0, "resultado": "empate", "ganancia": 0,
+                               "fichas_antes": saldo + 501, "fichas_despues": saldo + 501}))
+    informe = verificar(iter(filas), procesos=1, servicio=SERVICIO)
+    assert [(d["campo"], d["esperado"], d["registrado"]) for d in informe["discrepancias"]] == [
+        ("fichas_despues", saldo + 500, saldo + 501),
+        ("apuesta", f"0 < apuesta <= {saldo + 501}", 0),
+    ]
+
+
+def test_leer_archivos(tmp_path):
+    filas = jugar_partidas(n_usuarios=2, jugadas=3)
+    ndjson = tmp_path / "historial.jsonl.gz"
+    with gzip.open(ndjson, "wt", encoding="utf-8") as f:
+        for uid, nombre, partida in filas:
+            f.write(json.dumps({"uid": uid, "usuario": nombre, "partida": partida}) + "\n")
+    assert list(leer_archivo(str(ndjson))) == filas
+
+    heredado = tmp_path / "historial.json"
+    heredado.write_text(json.dumps({"U0": {"usuario": "U0", "partidas": [p for u, _, p in reversed(filas) if u == "U0"]}}))
+    assert [p for _, _, p in leer_archivo(str(heredado))] == [p for u, _, p in filas if u == "U0"]